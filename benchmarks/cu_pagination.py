@@ -0,0 +1,109 @@
+"""
+CU 목록 단계의 소요 시간 비교(가짜 latency, 상세 요청 제외): serial vs speculative
+
+가짜 서버가 목록마다 정해진 수의 page 를 만들고, 모든 요청은 --latency 만큼 걸린다.
+동시 요청 수는 --concurrency(CONCURRENT_REQUESTS_PER_DOMAIN)로 제한한다.
+- serial: 이전 구현(빈 page 를 받을 때까지 pageIndex + 1 을 하나씩 요청한다)
+- speculative: 현재 spider 의 __start_request/parse_list 를 그대로 실행한다(첫 실행, 지난 실행 기록이 있는 실행)
+
+Usage: python benchmarks/cu_pagination.py [--pages 30] [--latency 0.3] [--concurrency 16]
+"""
+import heapq
+import itertools
+import sys
+import tempfile
+from argparse import ArgumentParser
+from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scrapy.http import HtmlResponse  # noqa: E402
+from scrapy.settings import Settings  # noqa: E402
+
+from pyoniverse.pagination.speculative import SpeculativePaginator  # noqa: E402
+from pyoniverse.spiders.cuweb import CUWebSpider  # noqa: E402
+
+
+class FakeServer:
+    def __init__(self, pages: int, latency: float, concurrency: int):
+        self.pages = pages
+        self.latency = latency
+        self.concurrency = concurrency
+        self.requests = 0
+
+    def respond(self, request) -> HtmlResponse:
+        self.requests += 1
+        page = int(request.cb_kwargs["params"]["pageIndex"])
+        items = ""
+        if page <= self.pages:
+            items = "".join(
+                f'<a class="prod_item" href="javascript:view({page * 100 + i})">x</a>'
+                for i in range(40)
+            )
+        return HtmlResponse(request.url, body=items.encode(), request=request)
+
+    def run(self, spider: CUWebSpider, requests) -> float:
+        """
+        :return: 마지막 목록 응답을 받은 시간(sec)
+        """
+        queue, running, now = deque(requests), [], 0.0
+        order = itertools.count()
+        while queue or running:
+            while queue and len(running) < self.concurrency:
+                request = queue.popleft()
+                heapq.heappush(running, (now + self.latency, next(order), request))
+            now, _, request = heapq.heappop(running)
+            for r in spider.parse_list(self.respond(request), **request.cb_kwargs):
+                if r.callback == spider.parse_list:
+                    queue.append(r)
+        return now
+
+
+def serial(server: FakeServer, categories: int) -> float:
+    # 목록마다 page 를 하나씩(이전 page 를 받은 뒤에) 요청하고, 목록들은 동시에 진행한다
+    waves = -(-categories // server.concurrency)
+    server.requests += categories * (server.pages + 1)
+    return waves * (server.pages + 1) * server.latency
+
+
+def speculative(server: FakeServer, state: Path) -> float:
+    spider = CUWebSpider()
+    spider.paginator = SpeculativePaginator.from_settings(
+        Settings({"PAGINATION_STATE": str(state)})
+    )
+    home = HtmlResponse(spider.base_url, body=b"")
+    elapsed = server.run(spider, list(spider._CUWebSpider__start_request(home)))
+    spider.paginator.state.save(
+        {k: w.pages for k, w in spider.paginator.windows.items() if w.end is not None}
+    )
+    return elapsed
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument("--pages", type=int, default=30)
+    arg_parser.add_argument("--latency", type=float, default=0.3)
+    arg_parser.add_argument("--concurrency", type=int, default=16)
+    args = arg_parser.parse_args()
+
+    common = {
+        "pages": args.pages,
+        "latency": args.latency,
+        "concurrency": args.concurrency,
+    }
+    categories = len(CUWebSpider.list_category) + len(CUWebSpider.pb_list_category)
+    state = Path(tempfile.mkdtemp()) / "pagination.json"
+    print(f"{categories} lists x {args.pages} pages, latency {args.latency} sec")
+    for name, strategy in (
+        ("serial", lambda server: serial(server, categories)),
+        ("speculative (first run)", lambda server: speculative(server, state)),
+        ("speculative (with state)", lambda server: speculative(server, state)),
+    ):
+        server = FakeServer(**common)
+        elapsed = strategy(server)
+        print(f"  {name:25} {elapsed:7.1f} sec {server.requests:5} requests")
+
+
+if __name__ == "__main__":
+    main()
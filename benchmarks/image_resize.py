@@ -0,0 +1,105 @@
+"""
+webp 변환의 thumbnail 생성 비교(ms/image, 최대 RSS)
+
+- copy: 이전 구현처럼 thumb 마다 원본을 복사(image.copy)하고 LANCZOS thumbnail 을 만든다
+- pyramid: transcode(원본은 한 번만 decode, 큰 thumb 부터 앞의 thumb 를 reduce + LANCZOS 로 줄인다)
+최대 RSS 는 프로세스 단위이므로 variant 마다 별도 프로세스에서 실행한다.
+
+Usage: python benchmarks/image_resize.py [--images DIR] [--count 60] [--thumbs 1000,400,110]
+"""
+import json
+import resource
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image  # noqa: E402
+
+from image_transcode import load_images, make_images  # noqa: E402
+from pyoniverse.pipelines.transcode import (  # noqa: E402
+    MAX_WEBP_SIZE,
+    to_rgb,
+    to_webp,
+    transcode,
+)
+
+
+def copy_thumbnails(body: bytes, thumbs: Dict[str, Tuple[int, int]]):
+    image = Image.open(BytesIO(body))
+    if image.width > MAX_WEBP_SIZE[0] or image.height > MAX_WEBP_SIZE[1]:
+        image = image.resize(
+            (min(image.width, MAX_WEBP_SIZE[0]), min(image.height, MAX_WEBP_SIZE[1])),
+            reducing_gap=3.0,
+        )
+    image = to_rgb(image)
+    to_webp(image)
+    for size in thumbs.values():
+        thumb = image.copy()
+        thumb.thumbnail(size, Image.Resampling.LANCZOS)
+        to_webp(thumb)
+
+
+VARIANTS = {"copy": copy_thumbnails, "pyramid": transcode}
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss: Linux 는 KB, macOS 는 bytes
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        max_rss *= 1024
+    return round(max_rss / 1024**2, 1)
+
+
+def run_variant(variant: str, images, thumbs) -> dict:
+    baseline = max_rss_mb()
+    start = time.perf_counter()
+    for body in images:
+        VARIANTS[variant](body, thumbs)
+    elapsed = time.perf_counter() - start
+    return {
+        "ms_per_image": round(elapsed / len(images) * 1000, 1),
+        "max_rss_mb": max_rss_mb(),
+        "rss_growth_mb": round(max_rss_mb() - baseline, 1),
+    }
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument("--images", default=None)
+    arg_parser.add_argument("--count", type=int, default=60)
+    arg_parser.add_argument("--thumbs", default="1000,400,110")
+    arg_parser.add_argument("--variant", choices=list(VARIANTS), default=None)
+    args = arg_parser.parse_args()
+
+    if args.variant:
+        if args.images and Path(args.images).is_dir():
+            images = load_images(args.images, args.count)
+        else:
+            images = make_images(args.count)
+        thumbs = {
+            f"thumb{size}": (int(size), int(size)) for size in args.thumbs.split(",")
+        }
+        print(json.dumps(run_variant(args.variant, images, thumbs)))
+        return
+    for variant in VARIANTS:
+        command = [
+            sys.executable,
+            __file__,
+            f"--count={args.count}",
+            f"--thumbs={args.thumbs}",
+            f"--variant={variant}",
+        ]
+        if args.images:
+            command.append(f"--images={args.images}")
+        out = subprocess.run(command, capture_output=True, text=True, check=True)
+        print(variant, json.loads(out.stdout.strip().splitlines()[-1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+S3ImagePipeline 의 webp 변환: inline(이전 구현) vs thread pool vs process pool 비교(images/s, reactor 멈춤)
+
+--images 폴더의 jpg/png 를 변환하면서, 10ms 마다 실행되는 LoopingCall(다운로드 대신)이 늦어진 시간을 잰다.
+폴더가 없으면 상품 이미지와 비슷한 크기의 이미지를 만들어 사용한다.
+Reactor 는 다시 시작할 수 없으므로 variant 마다 별도 프로세스에서 실행한다.
+
+Usage: python benchmarks/image_transcode.py [--images DIR] [--count 200] [--workers 0]
+"""
+import json
+import random
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from io import BytesIO
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageDraw  # noqa: E402
+from twisted.internet import defer, task  # noqa: E402
+
+from mongodb_pipeline import LagMonitor  # noqa: E402
+from pyoniverse.pipelines.transcode import Transcoder, transcode  # noqa: E402
+
+
+VARIANTS = Transcoder.modes
+CONCURRENT_REQUESTS = 16  # Scrapy 기본값
+
+
+def make_images(count: int) -> List[bytes]:
+    """
+    사진처럼 압축이 잘 되지 않는 jpg 와 투명한 png
+    """
+    rnd = random.Random(0)
+    images = []
+    for i in range(count):
+        size = rnd.choice([(800, 800), (1000, 1000), (1200, 1600)])
+        image = Image.effect_noise(size, 64).convert("RGB")
+        draw = ImageDraw.Draw(image)
+        for _ in range(20):
+            x, y = rnd.randrange(size[0]), rnd.randrange(size[1])
+            color = tuple(rnd.randrange(256) for _ in range(3))
+            draw.ellipse((x, y, x + 200, y + 200), fill=color)
+        buf = BytesIO()
+        if i % 4 == 0:
+            image.putalpha(200)
+            image.save(buf, format="PNG")
+        else:
+            image.save(buf, format="JPEG", quality=90)
+        images.append(buf.getvalue())
+    return images
+
+
+def load_images(path: str, count: int) -> List[bytes]:
+    files = sorted(
+        p for p in Path(path).iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png")
+    )
+    return [p.read_bytes() for p in files[:count]]
+
+
+def run_variant(variant: str, images: List[bytes], workers: int, stall_ms: float):
+    @defer.inlineCallbacks
+    def main(reactor):
+        transcoder = Transcoder(mode=variant, workers=workers)
+        transcoder.start()
+        monitor = LagMonitor(stall_ms)
+        monitor.start()
+        semaphore = defer.DeferredSemaphore(CONCURRENT_REQUESTS)
+
+        def produce():
+            for body in images:
+                yield semaphore.run(transcoder.submit, transcode, body, {})
+
+        start = time.monotonic()
+        yield defer.gatherResults(list(produce()))
+        elapsed = time.monotonic() - start
+        monitor.stop()
+        transcoder.stop()
+        print(
+            json.dumps(
+                {
+                    "images_per_sec": round(len(images) / elapsed, 1),
+                    **monitor.summary(),
+                }
+            )
+        )
+
+    task.react(main)
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument("--images", default=None)
+    arg_parser.add_argument("--count", type=int, default=200)
+    arg_parser.add_argument("--workers", type=int, default=0)
+    arg_parser.add_argument("--stall_ms", type=float, default=50)
+    arg_parser.add_argument("--variant", choices=VARIANTS, default=None)
+    args = arg_parser.parse_args()
+
+    if args.images and Path(args.images).is_dir():
+        images = load_images(args.images, args.count)
+    else:
+        images = make_images(args.count)
+
+    if args.variant:
+        run_variant(args.variant, images, args.workers, args.stall_ms)
+        return
+    for variant in VARIANTS:
+        command = [
+            sys.executable,
+            __file__,
+            f"--count={args.count}",
+            f"--workers={args.workers}",
+            f"--stall_ms={args.stall_ms}",
+            f"--variant={variant}",
+        ]
+        if args.images:
+            command.append(f"--images={args.images}")
+        out = subprocess.run(command, capture_output=True, text=True, check=True)
+        print(variant, json.loads(out.stdout.strip().splitlines()[-1]))
+
+
+if __name__ == "__main__":
+    main()
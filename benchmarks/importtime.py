@@ -0,0 +1,79 @@
+"""
+Entry point 별 import 시간(-X importtime)을 재고 importtime_budget.json 의 budget 과 비교한다.
+budget 을 넘거나 forbidden 모듈이 import 되면 exit code 1 을 반환한다.
+
+Usage: python benchmarks/importtime.py [--repeat 5]
+"""
+import json
+import re
+import statistics
+import subprocess
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+ROOT = Path(__file__).resolve().parent.parent
+BUDGET_FILE = Path(__file__).resolve().parent / "importtime_budget.json"
+LINE_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(modules: List[str]) -> Tuple[float, Dict[str, int], set]:
+    """
+    :return: 전체 import 시간(ms), top-level 모듈 별 cumulative 시간(us), import 된 모듈
+    """
+    code = "\n".join(f"import {module}" for module in modules)
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_us = 0
+    top_level = {}
+    imported = set()
+    for line in res.stderr.splitlines():
+        matched = LINE_PATTERN.match(line)
+        if not matched:
+            continue
+        self_us, cumulative_us, indent, name = matched.groups()
+        total_us += int(self_us)
+        imported.add(name)
+        if len(indent) == 1:
+            top_level[name] = int(cumulative_us)
+    return total_us / 1000, top_level, imported
+
+
+def main() -> int:
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    budgets = json.loads(BUDGET_FILE.read_text())
+    failed = False
+    for entry_point, budget in budgets.items():
+        totals = []
+        top_level, imported = {}, set()
+        for _ in range(args.repeat):
+            total_ms, top_level, imported = measure(budget["modules"])
+            totals.append(total_ms)
+        total_ms = statistics.median(totals)
+
+        print(f"{entry_point}: {total_ms:.1f} ms (budget {budget['budget_ms']} ms)")
+        for name, cumulative in sorted(top_level.items(), key=lambda x: -x[1])[:5]:
+            print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+        if total_ms > budget["budget_ms"]:
+            print("  FAIL: over budget")
+            failed = True
+        for module in budget.get("forbidden", []):
+            if module in imported:
+                print(f"  FAIL: {module} is imported")
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
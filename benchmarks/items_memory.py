@@ -0,0 +1,101 @@
+"""
+ProductVO 메모리 비교: slots dataclass(현재) vs __dict__ dataclass(이전)
+
+--items 개의 ProductVO 를 만들어 가지고 있을 때 아이템당 bytes(tracemalloc)와 최대 RSS 를 잰다.
+최대 RSS 는 프로세스 단위이므로 variant 마다 별도 프로세스에서 실행한다.
+
+Usage: python benchmarks/items_memory.py [--items 20000]
+"""
+import dataclasses
+import json
+import resource
+import subprocess
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pyoniverse.items import CrawledInfoVO, EventVO, ImageVO, PriceVO  # noqa: E402
+from pyoniverse.items.product import ProductVO  # noqa: E402
+
+
+def plain(cls):
+    """
+    같은 필드를 가진 __dict__ dataclass
+    """
+    fields = []
+    for f in dataclasses.fields(cls):
+        kwargs = {}
+        if f.default is not dataclasses.MISSING:
+            kwargs["default"] = f.default
+        if f.default_factory is not dataclasses.MISSING:
+            kwargs["default_factory"] = f.default_factory
+        fields.append((f.name, f.type, dataclasses.field(**kwargs)))
+    return dataclasses.make_dataclass(cls.__name__, fields, kw_only=True)
+
+
+VARIANTS = {
+    "slots": (ProductVO, CrawledInfoVO, PriceVO, ImageVO, EventVO),
+    "dict": tuple(map(plain, (ProductVO, CrawledInfoVO, PriceVO, ImageVO, EventVO))),
+}
+
+
+def make_items(variant: str, items: int) -> list:
+    product, crawled_info, price, image, event = VARIANTS[variant]
+    return [
+        product(
+            crawled_info=crawled_info(
+                spider="benchmark", id=str(i), url=f"https://pyoniverse.kr/{i}", brand=1
+            ),
+            name=f"product-{i}",
+            price=price(value=1000 + i, currency=1),
+            image=image(thumb=f"https://pyoniverse.kr/{i}.webp"),
+            events=[event(brand=1, id=i % 8 + 1)],
+            tags=["benchmark"],
+            created_at=0,
+            updated_at=0,
+        )
+        for i in range(items)
+    ]
+
+
+def run_variant(variant: str, items: int) -> dict:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    products = make_items(variant, items)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    # ru_maxrss: Linux 는 KB, macOS 는 bytes
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        max_rss *= 1024
+    return {
+        "items": len(products),
+        "bytes_per_item": round(used / items),
+        "max_rss_mb": round(max_rss / 1024**2, 1),
+    }
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument("--items", type=int, default=20000)
+    arg_parser.add_argument("--variant", choices=list(VARIANTS), default=None)
+    args = arg_parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.items)))
+        return
+    for variant in VARIANTS:
+        out = subprocess.run(
+            [sys.executable, __file__, f"--items={args.items}", f"--variant={variant}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        print(variant, json.loads(out.stdout.strip().splitlines()[-1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+crawled_info.spider + crawled_info.id index 유무에 따른 upsert 실행 시간 비교
+
+로컬 mongod 에 --docs 개의 문서를 저장한 뒤, MongoDBPipeline 과 같은 조건으로 update_one(upsert=True)을 실행한다.
+index 가 없으면 hint 를 사용할 수 없으므로 hint 없이 실행한다.
+
+Usage: python benchmarks/mongodb_index.py [--uri mongodb://localhost:27017] [--docs 50000] [--queries 500]
+"""
+import random
+import statistics
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pymongo import InsertOne, MongoClient  # noqa: E402
+from pymongo.errors import PyMongoError  # noqa: E402
+
+from pyoniverse.db.client import DBClient  # noqa: E402
+from pyoniverse.pipelines.db import MongoDBPipeline  # noqa: E402
+
+
+DB = "benchmark_index"
+
+
+def fill(collection, docs: int):
+    collection.bulk_write(
+        [
+            InsertOne(
+                {
+                    "crawled_info": {"spider": f"spider-{i % 10}", "id": str(i)},
+                    "name": f"product-{i}",
+                    "price": {"value": i, "currency": 1},
+                }
+            )
+            for i in range(docs)
+        ],
+        ordered=False,
+    )
+
+
+def measure(collection, docs: int, queries: int, hint) -> dict:
+    latencies = []
+    for _ in range(queries):
+        i = random.randrange(docs)
+        query = {"crawled_info.spider": f"spider-{i % 10}", "crawled_info.id": str(i)}
+        start = time.perf_counter()
+        collection.update_one(
+            query, {"$set": {"price.value": i + 1}}, upsert=True, hint=hint
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    plan = collection.find(query).explain()["queryPlanner"]["winningPlan"]
+    return {
+        "avg_ms": round(statistics.mean(latencies), 3),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)], 3),
+        "plan": plan.get("inputStage", plan).get("stage"),
+    }
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument("--uri", default="mongodb://localhost:27017")
+    arg_parser.add_argument("--docs", type=int, default=50000)
+    arg_parser.add_argument("--queries", type=int, default=500)
+    args = arg_parser.parse_args()
+
+    client = MongoClient(args.uri, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        sys.exit(f"Cannot connect to {args.uri}: {e}")
+
+    client.drop_database(DB)
+    db = client.get_database(DB)
+    for variant in ["without_index", "with_index"]:
+        collection = db.get_collection(variant)
+        fill(collection, args.docs)
+        hint = None
+        if variant == "with_index":
+            collection.create_indexes(DBClient.indexes["products"])
+            hint = MongoDBPipeline.hint
+        print(variant, measure(collection, args.docs, args.queries, hint))
+    client.drop_database(DB)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+MongoDBPipeline vs AsyncMongoDBPipeline 비교(items/s, reactor 멈춤)
+
+로컬 mongod 에 ProductVO 를 저장하면서, 10ms 마다 실행되는 LoopingCall(다운로드 대신)이 늦어진 시간을 잰다.
+늦어진 시간이 stall_ms 를 넘으면 그동안 다운로드가 처리되지 못한 것으로 본다.
+Reactor 는 다시 시작할 수 없으므로 pipeline 마다 별도 프로세스에서 실행한다.
+
+Usage: python benchmarks/mongodb_pipeline.py [--uri mongodb://localhost:27017] [--items 20000]
+"""
+import json
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pymongo import MongoClient  # noqa: E402
+from pymongo.errors import PyMongoError  # noqa: E402
+from scrapy import Spider  # noqa: E402
+from scrapy.settings import Settings  # noqa: E402
+from scrapy.statscollectors import MemoryStatsCollector  # noqa: E402
+from twisted.internet import defer, task  # noqa: E402
+
+from pyoniverse.items import CrawledInfoVO, EventVO, ImageVO, PriceVO  # noqa: E402
+from pyoniverse.items.product import ProductVO  # noqa: E402
+from pyoniverse.pipelines.db import AsyncMongoDBPipeline, MongoDBPipeline  # noqa: E402
+
+
+PIPELINES = {"sync": MongoDBPipeline, "async": AsyncMongoDBPipeline}
+DB = "benchmark_pipeline"
+TICK_SEC = 0.01
+CONCURRENT_ITEMS = 100  # Scrapy 기본값
+
+
+def make_product(i: int, run: int) -> ProductVO:
+    return ProductVO(
+        crawled_info=CrawledInfoVO(
+            spider="benchmark", id=str(i), url=f"https://a.b/{i}", brand=1
+        ),
+        name=f"product-{i}",
+        price=PriceVO(value=1000 + run, currency=1),
+        image=ImageVO(thumb=f"https://a.b/{i}.webp"),
+        events=[EventVO(brand=1, id=run % 8 + 1)],
+        tags=["benchmark"],
+    )
+
+
+class LagMonitor:
+    def __init__(self, stall_ms: float):
+        self.stall_sec = stall_ms / 1000
+        self.lags = []
+        self.__last = None
+        self.__loop = task.LoopingCall(self.tick)
+
+    def start(self):
+        self.__last = time.monotonic()
+        self.__loop.start(TICK_SEC, now=False)
+
+    def stop(self):
+        self.tick()
+        self.__loop.stop()
+
+    def tick(self):
+        now = time.monotonic()
+        self.lags.append(max(0.0, now - self.__last - TICK_SEC))
+        self.__last = now
+
+    def summary(self) -> dict:
+        stalls = [lag for lag in self.lags if lag > self.stall_sec]
+        return {
+            "max_lag_ms": round(max(self.lags, default=0) * 1000, 1),
+            "stalls": len(stalls),
+            "stalled_sec": round(sum(stalls), 2),
+        }
+
+
+@defer.inlineCallbacks
+def run_round(pipeline_cls, uri: str, items: int, run: int, stall_ms: float):
+    spider = Spider(name="benchmark")
+    stats = MemoryStatsCollector(SimpleNamespace(settings=Settings()))
+    pipeline = pipeline_cls(mongo_uri=uri, mongo_db=DB, stage="benchmark", stats=stats)
+    pipeline.open_spider(spider)
+
+    monitor = LagMonitor(stall_ms)
+    monitor.start()
+    semaphore = defer.DeferredSemaphore(CONCURRENT_ITEMS)
+    processed = []
+
+    def produce():
+        # Cooperator 가 중간중간 reactor 에 제어를 넘긴다(Scrapy 의 item 처리와 비슷하게)
+        for i in range(items):
+            processed.append(
+                semaphore.run(
+                    defer.maybeDeferred,
+                    pipeline.process_item,
+                    make_product(i, run),
+                    spider,
+                )
+            )
+            yield None
+
+    start = time.monotonic()
+    yield task.cooperate(produce()).whenDone()
+    yield defer.gatherResults(processed)
+    yield defer.maybeDeferred(pipeline.close_spider, spider)
+    elapsed = time.monotonic() - start
+    monitor.stop()
+    return {
+        "round": run,
+        "items_per_sec": round(items / elapsed, 1),
+        **monitor.summary(),
+        **{k: v for k, v in stats.get_stats().items() if k.startswith("mongodb/")},
+    }
+
+
+def run_variant(variant: str, uri: str, items: int, rounds: int, stall_ms: float):
+    @defer.inlineCallbacks
+    def main(reactor):
+        results = []
+        for r in range(rounds):
+            results.append(
+                (yield run_round(PIPELINES[variant], uri, items, r, stall_ms))
+            )
+        print(json.dumps(results))
+
+    task.react(main)
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument("--uri", default="mongodb://localhost:27017")
+    arg_parser.add_argument("--items", type=int, default=20000)
+    arg_parser.add_argument("--rounds", type=int, default=2)
+    arg_parser.add_argument("--stall_ms", type=float, default=50)
+    arg_parser.add_argument("--variant", choices=list(PIPELINES), default=None)
+    args = arg_parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.uri, args.items, args.rounds, args.stall_ms)
+        return
+
+    client = MongoClient(args.uri, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        sys.exit(f"Cannot connect to {args.uri}: {e}")
+
+    for variant in PIPELINES:
+        # 첫 round 는 모두 새 아이템, 이후 round 는 갱신
+        client.drop_database(DB)
+        client.get_database(DB).get_collection("products").create_index(
+            MongoDBPipeline.hint
+        )
+        out = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                f"--uri={args.uri}",
+                f"--items={args.items}",
+                f"--rounds={args.rounds}",
+                f"--stall_ms={args.stall_ms}",
+                f"--variant={variant}",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        for result in json.loads(out.stdout.strip().splitlines()[-1]):
+            print(variant, result)
+    client.drop_database(DB)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+ItemVO.to_document 캐시 유무에 따른 pipeline 메모리 할당 비교(tracemalloc)
+
+ValidationPipeline -> MongoDBPipeline 의 쓰기 작업 생성(_enqueue)까지 아이템마다 실행한다.
+--marshmallow 이면 fast path 를 사용하지 않는다(marshmallow 의 할당이 대부분을 차지한다).
+- uncached: to_document 가 매번 asdict 를 실행한다(이전 구현처럼 stage 마다 dict 를 만든다)
+- cached: 아이템마다 한 번만 만든다
+
+peak_kb: 아이템 하나를 처리하는 동안 늘어난 최대 메모리
+retained_kb: 처리가 끝난 아이템이 가지고 있는 메모리(캐시한 document 포함)
+
+Usage: python benchmarks/serialization.py [--items 5000] [--marshmallow]
+"""
+import statistics
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from dataclasses import asdict
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pyoniverse.items import CrawledInfoVO, EventVO, ImageVO, PriceVO  # noqa: E402
+from pyoniverse.items import ItemVO  # noqa: E402
+from pyoniverse.items.product import ProductVO  # noqa: E402
+from pyoniverse.pipelines.db import MongoDBPipeline  # noqa: E402
+from pyoniverse.pipelines.validator import ValidationPipeline  # noqa: E402
+
+
+def make_product(i: int) -> ProductVO:
+    return ProductVO(
+        crawled_info=CrawledInfoVO(
+            spider="benchmark", id=str(i), url=f"https://pyoniverse.kr/{i}", brand=1
+        ),
+        name=f"product-{i}",
+        price=PriceVO(value=1000 + i, currency=1),
+        image=ImageVO(
+            thumb=f"https://pyoniverse.kr/{i}.webp",
+            others=[f"https://pyoniverse.kr/{i}-{j}.webp" for j in range(2)],
+            size={"thumb": {"width": 100, "height": 100}},
+        ),
+        events=[EventVO(brand=1, id=i % 8 + 1)],
+        tags=["benchmark"],
+    )
+
+
+def run(items: int, fast_path: bool) -> dict:
+    spider = SimpleNamespace(name="benchmark")
+    validator = ValidationPipeline(fast_path=fast_path)
+    db = MongoDBPipeline(
+        mongo_uri=None, mongo_db=None, stage="benchmark", bulk_size=items + 1
+    )
+    products = [make_product(i) for i in range(items)]
+    peaks = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for product in products:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        validator.process_item(product, spider)
+        db._enqueue(spider, product.get_collection_name(), product, None)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    elapsed = time.perf_counter() - start
+    db._take_pending()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {
+        "items_per_sec": round(items / elapsed),
+        "peak_kb": round(statistics.mean(peaks) / 1024, 2),
+        "retained_kb": round(retained / items / 1024, 2),
+    }
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument("--items", type=int, default=5000)
+    arg_parser.add_argument("--marshmallow", action="store_true")
+    args = arg_parser.parse_args()
+    fast_path = not args.marshmallow
+
+    cached = ItemVO.to_document
+    ItemVO.to_document = lambda self: asdict(self)
+    print("uncached", run(args.items, fast_path))
+    ItemVO.to_document = cached
+    print("cached  ", run(args.items, fast_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+7-Eleven 목록 요청 비교(요청 수, 받은 bytes): 이전 구현 vs count-first
+
+가짜 서버(FakeServer)가 intPageSize 만큼의 목록을 만들어 응답한다.
+- previous: 이전 구현의 요청 순서(Fresh Food: 100 부터 2배씩, Event: 15 부터 5씩 늘리며 p.complete 까지)
+- count-first: 현재 spider 의 parse_list 를 그대로 실행한다
+  Fresh Food 는 첫 응답의 #listCnt 로 한 번 더 요청하고,
+  Event 는 #listCnt 가 있으면 그 크기로, 없으면 2배씩 늘리고, 끝난 이벤트가 보이면 멈춘다
+
+Usage: python benchmarks/seveneleven_pagination.py [--products 150,400,1200] [--events 40,120,300] [--ongoing 0.3]
+"""
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scrapy import FormRequest  # noqa: E402
+from scrapy.http import HtmlResponse  # noqa: E402
+
+from pyoniverse.spiders.sevenelevenweb import SevenElevenWebSpider  # noqa: E402
+from pyoniverse.spiders.sevenelevenweb_event import (  # noqa: E402
+    SevenElevenWebSpider as SevenElevenWebEventSpider,
+)
+
+
+class FakeServer:
+    def __init__(self, products: int, events: int, ongoing: float, count: bool):
+        self.products = products
+        self.events = events
+        self.ongoing = int(events * ongoing)
+        self.count = count
+        self.requests = 0
+        self.bytes = 0
+
+    def respond(self, url: str, body: str) -> HtmlResponse:
+        self.requests += 1
+        self.bytes += len(body.encode())
+        return HtmlResponse(url, body=body, encoding="utf-8")
+
+    def fresh_food(self, size: int) -> HtmlResponse:
+        items = "".join(
+            f'<li><a href="javascript:fncGoView(\'{i}\')"><div class="pic_product">'
+            f'<img src="/upload/product/{i}.jpg"/><div class="name">상품 {i}</div>'
+            f'<div class="price"><span>{1000 + i}</span></div></div></a></li>'
+            for i in range(min(size, self.products))
+        )
+        body = (
+            f'<input id="listCnt" value="{self.products}"/>'
+            f'<div class="dosirak_list"><ul><li>brand</li>{items}<li>more</li></ul></div>'
+        )
+        return self.respond(
+            "https://www.7-eleven.co.kr/product/dosirakNewMoreAjax.asp", body
+        )
+
+    def event_list(self, size: int, main: bool) -> HtmlResponse:
+        items = "".join(
+            f'<li><p>{"진행중" if i < self.ongoing else "종료"}</p>'
+            f'<a href="javascript:fncGoView({i})"><strong>이벤트 {i}</strong>'
+            f"<span>2023-01-01 ~ 2023-12-31</span></a></li>"
+            for i in range(min(size, self.events))
+        )
+        complete = '<p class="complete">끝</p>' if size >= self.events else ""
+        count = f'<input id="listCnt" value="{self.events}"/>' if self.count else ""
+        if main:
+            body = (
+                f"<html><body>{count}<ul id=listUl>{items}</ul>{complete}</body></html>"
+            )
+        else:
+            body = f"{count}{items}{complete}"
+        return self.respond("https://m.7-eleven.co.kr:444/product/eventList.asp", body)
+
+
+def previous_fresh_food(server: FakeServer):
+    size = 100
+    while size <= server.products:
+        server.fresh_food(size)
+        size *= 2
+    server.fresh_food(size)
+
+
+def count_first_fresh_food(server: FakeServer):
+    spider = SevenElevenWebSpider()
+    kwargs = {"size": "100", "tab": "Fresh Food", "ptab": "noodle"}
+    while True:
+        response = server.fresh_food(int(kwargs["size"]))
+        requests = [
+            r
+            for r in spider.parse_list(response, **kwargs)
+            if r.callback == spider.parse_list
+        ]
+        if not requests:
+            return
+        kwargs = requests[0].cb_kwargs
+
+
+def previous_events(server: FakeServer):
+    if server.event_list(10, main=True).css("p.complete"):
+        return
+    size = 15
+    while size < server.events:
+        server.event_list(size, main=False)
+        size += 5
+    server.event_list(size, main=False)
+
+
+def count_first_events(server: FakeServer):
+    spider = SevenElevenWebEventSpider()
+    response = server.event_list(10, main=True)
+    kwargs = {}
+    while True:
+        requests = [
+            r
+            for r in spider.parse_list(response, **kwargs)
+            if isinstance(r, FormRequest) and r.callback == spider.parse_list
+        ]
+        if not requests:
+            return
+        kwargs = requests[0].cb_kwargs
+        response = server.event_list(kwargs["page_size"], main=False)
+
+
+def run(strategy, **server_kwargs) -> str:
+    server = FakeServer(**server_kwargs)
+    strategy(server)
+    return f"{server.requests:4} requests {server.bytes / 1024:9.1f} KB"
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument("--products", default="150,400,1200")
+    arg_parser.add_argument("--events", default="40,120,300")
+    arg_parser.add_argument("--ongoing", type=float, default=0.3)
+    args = arg_parser.parse_args()
+
+    for products in map(int, args.products.split(",")):
+        common = {"products": products, "events": 0, "ongoing": 0, "count": True}
+        print(f"Fresh Food ({products} products)")
+        print(f"  previous    {run(previous_fresh_food, **common)}")
+        print(f"  count-first {run(count_first_fresh_food, **common)}")
+    for events in map(int, args.events.split(",")):
+        common = {"products": 0, "events": events, "ongoing": args.ongoing}
+        print(f"Event ({events} events, {args.ongoing:.0%} ongoing)")
+        print(f"  previous    {run(previous_events, **common, count=False)}")
+        print(f"  growth      {run(count_first_events, **common, count=False)}")
+        print(f"  count-first {run(count_first_events, **common, count=True)}")
+
+
+if __name__ == "__main__":
+    main()
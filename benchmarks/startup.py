@@ -0,0 +1,92 @@
+"""
+Spider 별 time-to-first-request 비교(subprocess, forkserver, inprocess)
+
+명령 실행 시각부터 각 spider 의 첫 요청이 downloader 에 도달하기까지 걸린 시간을 잰다.
+StartupProbe extension 이 첫 요청 후 spider 를 종료하므로 네트워크가 없어도 동작한다.
+StartupProbe 는 benchmarks/startup_settings.py(SCRAPY_SETTINGS_MODULE)에서만 켠다.
+spider 별 LOG_FILE(*.log)을 덮어쓰므로 프로젝트 루트에서 실행한다.
+
+Usage: python benchmarks/startup.py [--spiders cuweb,gs25web] [--repeat 3]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pyoniverse.parser.log_parser.log_parser import LogParser  # noqa: E402
+from pyoniverse.runners.runner import Runner  # noqa: E402
+
+
+MODES = ["subprocess", "forkserver", "inprocess"]
+
+
+def measure(mode: str, spiders: list) -> tuple:
+    env = {
+        **os.environ,
+        "PYONIVERSE_LAUNCHED_AT": str(time.time()),
+        "SCRAPY_SETTINGS_MODULE": "benchmarks.startup_settings",
+        # stage=test 에서는 DB 에 쓰지 않지만 MongoDBPipeline 이 client 를 만든다
+        "MONGO_URI": os.getenv("MONGO_URI") or "mongodb://localhost:27017",
+        "MONGO_DB": os.getenv("MONGO_DB") or "benchmark",
+    }
+    start = time.monotonic()
+    subprocess.run(
+        [
+            sys.executable,
+            "main.py",
+            "--stage=test",
+            f"--mode={mode}",
+            ",".join(spiders),
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=False,
+    )
+    wall = time.monotonic() - start
+
+    parser = LogParser()
+    res = {}
+    for spider in spiders:
+        stats = parser._parse(Path(f"{spider}.log")) or {}
+        res[spider] = stats.get("startup/first_request_sec")
+    return wall, res
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument("--spiders", type=str, default=None)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    os.chdir(Path(__file__).resolve().parent.parent)
+    spiders = Runner._list_spiders(args.spiders.split(",") if args.spiders else None)
+
+    print(f"{'mode':<12}{'spider':<24}{'ttfr median(s)':>16}{'ttfr max(s)':>14}")
+    for mode in MODES:
+        walls = []
+        samples = {spider: [] for spider in spiders}
+        for _ in range(args.repeat):
+            wall, res = measure(mode, spiders)
+            walls.append(wall)
+            for spider, value in res.items():
+                if value is not None:
+                    samples[spider].append(value)
+        for spider, values in samples.items():
+            if values:
+                print(
+                    f"{mode:<12}{spider:<24}"
+                    f"{statistics.median(values):>16.3f}{max(values):>14.3f}"
+                )
+            else:
+                print(f"{mode:<12}{spider:<24}{'n/a':>16}{'n/a':>14}")
+        print(f"{mode:<12}{'(wall)':<24}{statistics.median(walls):>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
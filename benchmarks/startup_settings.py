@@ -0,0 +1,9 @@
+"""
+benchmarks/startup.py 가 SCRAPY_SETTINGS_MODULE 로 사용하는 settings.
+프로젝트 settings 에 StartupProbe 만 추가한다(기본 settings 에는 넣지 않는다).
+"""
+from pyoniverse.settings import *  # noqa: F401,F403
+from pyoniverse.settings import EXTENSIONS
+
+
+EXTENSIONS = {**EXTENSIONS, "pyoniverse.extensions.startup.StartupProbe": 500}
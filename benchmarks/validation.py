@@ -0,0 +1,70 @@
+"""
+ValidationPipeline: marshmallow(asdict + schema.validate) vs fast path(FastValidator) 비교(items/s)
+
+- uncached: 이전 구현처럼 아이템마다 schema 를 만든다
+- marshmallow: schema 를 item class 마다 한 번만 만든다
+- fast: FastValidator 로 먼저 검사한다
+
+Usage: python benchmarks/validation.py [--items 10000] [--rounds 3]
+"""
+import sys
+import time
+from argparse import ArgumentParser
+from dataclasses import asdict
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pyoniverse.items import CrawledInfoVO, EventVO, ImageVO, PriceVO  # noqa: E402
+from pyoniverse.items.product import ProductVO  # noqa: E402
+from pyoniverse.pipelines.validator import ValidationPipeline  # noqa: E402
+
+
+def make_product(i: int) -> ProductVO:
+    return ProductVO(
+        crawled_info=CrawledInfoVO(
+            spider="benchmark", id=str(i), url=f"https://pyoniverse.kr/{i}", brand=1
+        ),
+        name=f"product-{i}",
+        price=PriceVO(value=1000 + i, currency=1),
+        image=ImageVO(
+            thumb=f"https://pyoniverse.kr/{i}.webp",
+            others=[f"https://pyoniverse.kr/{i}-{j}.webp" for j in range(2)],
+            size={"thumb": {"width": 100, "height": 100}},
+        ),
+        events=[EventVO(brand=1, id=i % 8 + 1)],
+        tags=["benchmark"],
+    )
+
+
+def uncached(item, spider):
+    reason = item.get_schema().validate(asdict(item))
+    assert not reason, reason
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument("--items", type=int, default=10000)
+    arg_parser.add_argument("--rounds", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    items = [make_product(i) for i in range(args.items)]
+    spider = SimpleNamespace(name="benchmark")
+    variants = {
+        "uncached": uncached,
+        "marshmallow": ValidationPipeline(fast_path=False).process_item,
+        "fast": ValidationPipeline(fast_path=True).process_item,
+    }
+    for name, process_item in variants.items():
+        best = float("inf")
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            for item in items:
+                process_item(item, spider)
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:12} {args.items / best:10.0f} items/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import logging
+import os
+from argparse import ArgumentParser
+from pathlib import Path
+
+import dotenv
+
+
+parser = ArgumentParser(
+    prog="Pyoniverse Spool Loader",
+    description="Load spooled items(SPOOL_ENABLED) into MongoDB. "
+    "Run again to resume from the last committed offset",
+)
+parser.add_argument(
+    "--spider",
+    type=str,
+    default=None,
+    help="Comma-separated spider names. 기본값은 spool 의 모든 spider",
+)
+parser.add_argument("--spool_dir", type=str, default=None, help="기본값은 SPOOL_DIR")
+parser.add_argument("--workers", type=int, default=4, help="동시에 실행할 bulk_write 수")
+parser.add_argument(
+    "--batch_size", type=int, default=None, help="bulk_write 크기. 기본값은 MONGO_BULK_SIZE"
+)
+
+dotenv.load_dotenv()
+args = parser.parse_args()
+if __name__ == "__main__":
+    from pymongo import MongoClient, WriteConcern
+    from pymongo.errors import PyMongoError
+    from scrapy.utils.project import get_project_settings
+
+    from pyoniverse.pipelines.spool import SpoolLoader
+
+    logging.basicConfig(level=logging.INFO)
+    settings = get_project_settings()
+    client = MongoClient(os.getenv("MONGO_URI"))
+    db = client.get_database(
+        os.getenv("MONGO_DB"), write_concern=WriteConcern(w="majority")
+    )
+    loader = SpoolLoader(
+        db,
+        workers=args.workers,
+        batch_size=args.batch_size or settings.getint("MONGO_BULK_SIZE"),
+    )
+    try:
+        results = loader.load(
+            Path(args.spool_dir or settings.get("SPOOL_DIR")),
+            spiders=args.spider.split(",") if args.spider else None,
+        )
+    except PyMongoError as e:
+        # 저장하지 못한 record 는 spool 에 남아 있으므로 다시 실행하면 이어서 저장한다
+        logging.error(f"Failed to load spool: {e!r}")
+        exit(1)
+    finally:
+        client.close()
+    if any(result["error"] or result["corrupt"] for result in results.values()):
+        exit(1)  # Failed
+    exit(0)
@@ -1,3 +1,4 @@
+import os
 from argparse import ArgumentParser
 
 import dotenv
@@ -11,7 +12,10 @@ parser = ArgumentParser(
 )
 
 parser.add_argument(
-    "spider", type=str, help="Spider name. If spider==all then Run all spiders"
+    "spider",
+    type=str,
+    help="Spider name. If spider==all then Run all spiders. "
+    "Comma-separated names(a,b) run the given spiders together",
 )
 parser.add_argument(
     "--stage", type=str, default="test", choices=["dev", "prod", "test"], required=True
@@ -19,16 +23,48 @@ parser.add_argument(
 parser.add_argument(
     "--clear_db",
     action="store_true",
-    help="crawling_* DB 데이터 삭제. ETL Pipeline 상에서 동작할 때 사용. " "spider=all 이어야 한다",
+    help="crawling_* DB 데이터를 이번 실행 결과로 교체(staging collection 에 저장한 뒤 성공하면 교체). "
+    "ETL Pipeline 상에서 동작할 때 사용. spider=all 이어야 한다",
+)
+parser.add_argument(
+    "--mode",
+    type=str,
+    default="subprocess",
+    choices=["subprocess", "forkserver", "inprocess"],
+    help="여러 spider 실행 방식. subprocess: spider 별 프로세스, "
+    "forkserver: 미리 import 한 프로세스에서 spider 별로 fork, inprocess: 하나의 프로세스에서 실행",
+)
+
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=None,
+    help="subprocess, forkserver 모드에서 동시에 실행할 spider 수. 기본값은 모든 spider 동시 실행",
+)
+parser.add_argument(
+    "--timeout",
+    type=float,
+    default=None,
+    help="subprocess, forkserver 모드에서 spider 별 제한 시간(초). 넘으면 종료한다",
 )
 
 nest_asyncio.apply()
 dotenv.load_dotenv()
 args = parser.parse_args()
+if args.clear_db and os.getenv("SPOOL_ENABLED", "").lower() in {"1", "true"}:
+    # spool 은 크롤링이 끝난 뒤 load_spool.py 로 저장하므로 collection 을 교체할 수 없다
+    parser.error("--clear_db cannot be used with SPOOL_ENABLED")
 if __name__ == "__main__":
     from pyoniverse.engine import Engine
 
-    engine = Engine(stage=args.stage, spider=args.spider, clear_db=args.clear_db)
+    engine = Engine(
+        stage=args.stage,
+        spider=args.spider,
+        clear_db=args.clear_db,
+        mode=args.mode,
+        workers=args.workers,
+        timeout=args.timeout,
+    )
     res = engine.run()
     if res:
         exit(0)
@@ -1,15 +1,18 @@
 import logging
-from typing import Dict
+from typing import TYPE_CHECKING, Dict
 
 from pyoniverse.out.model.enum.message_enum import MessageTypeEnum
-from pyoniverse.out.model.log_result import LogResult
+
+
+if TYPE_CHECKING:
+    from pyoniverse.out.model.log_result import LogResult
 
 
 class Analyzer:
     def __init__(self, *args, **kwargs):
         self.logger = logging.getLogger("scrapy.analyzer")
 
-    def analyze(self, data: Dict[str, LogResult], *args, **kwargs) -> MessageTypeEnum:
+    def analyze(self, data: Dict[str, "LogResult"], *args, **kwargs) -> MessageTypeEnum:
         """
         stage: debug or test -> return same
         """
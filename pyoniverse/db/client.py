@@ -1,8 +1,10 @@
 import logging
 import os
-from time import sleep
+import time
+from typing import Dict, List
 
-from pymongo import MongoClient, WriteConcern
+from pymongo import ASCENDING, IndexModel, MongoClient, WriteConcern
+from pymongo.database import Database
 from pymongo.errors import ConfigurationError
 
 
@@ -12,6 +14,20 @@ class DBClient:
     """
 
     __instance = None
+    staging_prefix = "_staging_"
+    # collection 별 index. MongoDBPipeline 의 hint 가 사용한다
+    indexes: Dict[str, List[IndexModel]] = {
+        "products": [
+            IndexModel(
+                [("crawled_info.spider", ASCENDING), ("crawled_info.id", ASCENDING)]
+            )
+        ],
+        "events": [
+            IndexModel(
+                [("crawled_info.spider", ASCENDING), ("crawled_info.id", ASCENDING)]
+            )
+        ],
+    }
 
     @classmethod
     def __get_instance(cls, *args, **kwargs) -> "DBClient":
@@ -46,14 +62,42 @@ class DBClient:
             logging.error("Cannot connect to client")
             exit(1)
 
-    def clear(self):
+    def prepare_staging(self) -> str:
         """
-        DB의 모든 컬렉션 데이터 제거
+        이번 실행에서 저장할 staging collection 을 만든다(index 포함).
+        이전 실행에서 남은 staging collection 은 제거한다.
+        :return: collection 이름 뒤에 붙일 suffix
         """
-        write_db = self.__client.get_database(
+        suffix = f"{self.staging_prefix}{int(time.time())}"
+        db = self.__write_db()
+        for name in db.list_collection_names():
+            if self.staging_prefix in name:
+                db.drop_collection(name)
+        for coll, indexes in self.indexes.items():
+            db.create_collection(f"{coll}{suffix}").create_indexes(indexes)
+        logging.info(f"Staging collections are ready: *{suffix}")
+        return suffix
+
+    def swap(self, suffix: str):
+        """
+        staging collection 으로 기존 collection 을 교체한다. collection 마다 원자적으로 교체된다.
+        """
+        for coll in self.indexes:
+            self.__client.admin.command(
+                "renameCollection",
+                f"{self.__db}.{coll}{suffix}",
+                to=f"{self.__db}.{coll}",
+                dropTarget=True,
+            )
+        logging.info(f"Swapped staging collections: *{suffix}")
+
+    def drop_staging(self, suffix: str):
+        db = self.__write_db()
+        for coll in self.indexes:
+            db.drop_collection(f"{coll}{suffix}")
+        logging.info(f"Dropped staging collections: *{suffix}")
+
+    def __write_db(self) -> Database:
+        return self.__client.get_database(
             self.__db, write_concern=WriteConcern(w="majority", wtimeout=60)
         )
-        for col in write_db.list_collection_names():
-            write_db.get_collection(col).delete_many({})
-            sleep(10)
-        return
@@ -1,10 +1,18 @@
-from pyoniverse.analyzer.analyzer import Analyzer
-from pyoniverse.db.client import DBClient
+import logging
+import os
+from typing import TYPE_CHECKING, List, Type
+
 from pyoniverse.out.model.enum.message_enum import MessageTypeEnum
-from pyoniverse.out.sender import Sender
-from pyoniverse.parser.log_parser.log_parser import LogParser
-from pyoniverse.runners.all_runner import AllRunner
-from pyoniverse.runners.single_runner import SingleRunner
+from pyoniverse.out.model.run_result import RunResult
+
+
+if TYPE_CHECKING:
+    from pyoniverse.db.client import DBClient
+    from pyoniverse.runners.runner import Runner
+
+
+# 실행 경로에 필요한 모듈만 import 한다(spider 하나를 실행하는 자식 프로세스는 boto3, pymongo 등을 로드하지 않는다)
+# benchmarks/importtime.py 로 entry point 별 import 시간을 확인한다
 
 
 class Engine:
@@ -24,6 +32,10 @@ class Engine:
         self.__stage = stage
         self.__spider = spider
         self.__clear_db = kwargs.get("clear_db")
+        self.__mode = kwargs.get("mode") or "subprocess"
+        self.__workers = kwargs.get("workers")
+        self.__timeout = kwargs.get("timeout")
+        self.logger = logging.getLogger("scrapy.engine")
 
     def run(self, *args, **kwargs):
         if self.__stage in {"dev", "test"}:
@@ -31,16 +43,44 @@ class Engine:
         else:
             loglevel = "INFO"
 
-        if self.__spider != "all":
-            SingleRunner.run(
+        if self.__spider != "all" and "," not in self.__spider:
+            from pyoniverse.runners.single_runner import SingleRunner
+
+            return SingleRunner.run(
                 spider=self.__spider, loglevel=loglevel, stage=self.__stage
             )
-            return True
+        elif self.__spider != "all":
+            # 일부 spider 만 함께 실행한다
+            results = self.__get_runner().run(
+                loglevel=loglevel,
+                stage=self.__stage,
+                spiders=self.__spider.split(","),
+                workers=self.__workers,
+                timeout=self.__timeout,
+            )
+            return self.__report(results)
         else:
+            from pyoniverse.analyzer.analyzer import Analyzer
+            from pyoniverse.out.sender import Sender
+            from pyoniverse.parser.log_parser.log_parser import LogParser
+
             if self.__clear_db:
+                from pyoniverse.db.client import DBClient
+
+                # spider 는 staging collection 에 저장하고, 성공하면 기존 collection 과 교체한다
                 client = DBClient.instance()
-                client.clear()
-            AllRunner.run(loglevel=loglevel, stage=self.__stage)
+                suffix = client.prepare_staging()
+                os.environ["MONGO_COLLECTION_SUFFIX"] = suffix
+            try:
+                results = self.__get_runner().run(
+                    loglevel=loglevel,
+                    stage=self.__stage,
+                    workers=self.__workers,
+                    timeout=self.__timeout,
+                )
+            finally:
+                os.environ.pop("MONGO_COLLECTION_SUFFIX", None)
+            finished = self.__report(results)
 
             sender = Sender()
             sender.send(target="s3")
@@ -51,4 +91,46 @@ class Engine:
             status = analyzer.analyze(data)
             if self.__stage in {"dev", "prod"}:
                 sender.send(target="slack", message_type=status, data=data)
-            return status == MessageTypeEnum.SUCCESS
+            success = status == MessageTypeEnum.SUCCESS
+            if self.__clear_db:
+                # 모든 spider 가 정상 종료되어야 교체한다
+                success = success and finished
+                self.__publish(client, suffix, success)
+            return success
+
+    def __report(self, results: List[RunResult]) -> bool:
+        """
+        :return: 모든 spider 가 정상 종료되었는지
+        """
+        ok = True
+        for result in results:
+            if result.exit_code == 0 and not result.timed_out:
+                self.logger.info(f"Spider finished: {result}")
+            else:
+                self.logger.error(f"Spider failed: {result}")
+                ok = False
+        return ok
+
+    def __publish(self, client: "DBClient", suffix: str, success: bool):
+        if success:
+            client.swap(suffix)
+        else:
+            self.logger.error("Crawling failed. Keep the current collections")
+            client.drop_staging(suffix)
+
+    def __get_runner(self) -> Type["Runner"]:
+        match self.__mode:
+            case "subprocess":
+                from pyoniverse.runners.all_runner import AllRunner
+
+                return AllRunner
+            case "forkserver":
+                from pyoniverse.runners.fork_runner import ForkRunner
+
+                return ForkRunner
+            case "inprocess":
+                from pyoniverse.runners.inprocess_runner import InProcessRunner
+
+                return InProcessRunner
+            case _:
+                raise NotImplementedError
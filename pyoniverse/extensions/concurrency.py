@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict
+
+from scrapy import Request, Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Response
+
+from pyoniverse.state import JsonState
+
+
+# 차단(또는 과부하) 신호로 보는 응답
+BAN_STATUSES = {403, 429}
+
+
+@dataclass(kw_only=True)
+class DomainState:
+    limit: int
+    good: int  # 마지막으로 문제없이 window 를 마친 limit(다음 실행의 시작 값)
+    responses: int = 0
+    latency: float = 0
+    bans: int = 0  # 현재 window 의 차단 응답
+    banned: int = 0  # 전체 차단 응답
+    increases: int = 0
+    decreases: int = 0
+    peak: int  # 가장 컸던 limit
+
+
+class AdaptiveConcurrency:
+    """
+    도메인(download slot)마다 동시 요청 수를 AIMD 로 조정하는 Extension.
+    - ADAPTIVE_CONCURRENCY_WINDOW 개의 응답마다 평균 latency 가 목표 이하이고 차단 응답이 없으면 1 늘린다
+    - window 에서 처음 403/429/5xx 를 받으면 바로 절반으로 줄인다. 그 뒤에도 차단 응답이 있었으면 window 가 끝날 때 다시 절반으로 줄인다
+    - 차단 응답은 없지만 latency 가 목표를 넘으면 3/4 로 줄인다
+    - 범위는 ADAPTIVE_CONCURRENCY_MIN ~ CONCURRENT_REQUESTS_PER_DOMAIN(spider 의 custom_settings 포함)
+    - 응답은 downloader middleware(재시도)를 거치기 전에 본다(재시도한 응답도 모두 센다)
+    - 학습한 값은 ADAPTIVE_CONCURRENCY_STATE(JSON)에 저장하고 다음 실행에서 시작 값으로 사용한다
+    """
+
+    def __init__(
+        self,
+        crawler: Crawler,
+        path: Path,
+        min_limit: int,
+        max_limit: int,
+        window: int,
+        target_latency: float,
+    ):
+        self.crawler = crawler
+        self.state_file = JsonState(path)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window = window
+        self.target_latency = target_latency
+        self.domains: Dict[str, DomainState] = {}
+        self.learned: Dict[str, int] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_CONCURRENCY_ENABLED"):
+            raise NotConfigured
+        o = cls(
+            crawler,
+            path=Path(settings.get("ADAPTIVE_CONCURRENCY_STATE")),
+            min_limit=settings.getint("ADAPTIVE_CONCURRENCY_MIN", 1),
+            max_limit=settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN"),
+            window=settings.getint("ADAPTIVE_CONCURRENCY_WINDOW", 20),
+            target_latency=settings.getfloat(
+                "ADAPTIVE_CONCURRENCY_TARGET_LATENCY", 1.0
+            ),
+        )
+        crawler.signals.connect(o.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(o.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(
+            o.request_reached_downloader, signal=signals.request_reached_downloader
+        )
+        # 재시도 middleware 보다 먼저 보아야 하므로 downloader 가 보내는 signal 을 사용한다
+        crawler.signals.connect(
+            o.response_downloaded, signal=signals.response_downloaded
+        )
+        return o
+
+    def spider_opened(self, spider: Spider):
+        self.learned = self.state_file.load()
+
+    def spider_closed(self, spider: Spider):
+        for domain, state in self.domains.items():
+            for key in ("limit", "peak", "good", "banned", "increases", "decreases"):
+                self.crawler.stats.set_value(
+                    f"concurrency/{domain}/{key}", getattr(state, key), spider=spider
+                )
+        self.state_file.save({d: s.good for d, s in self.domains.items()})
+
+    def request_reached_downloader(self, request: Request, spider: Spider):
+        self.apply(request.meta.get("download_slot"))
+
+    def response_downloaded(self, response: Response, request: Request, spider: Spider):
+        domain = request.meta.get("download_slot")
+        state = self.state(domain)
+        state.responses += 1
+        state.latency += request.meta.get("download_latency", 0)
+        if response.status in BAN_STATUSES or response.status >= 500:
+            state.bans += 1
+            state.banned += 1
+            if state.bans == 1:
+                self.decrease(domain, state, 0.5)
+        if state.responses >= self.window:
+            if state.bans > 1:
+                # 줄인 뒤에도 차단되었다
+                self.decrease(domain, state, 0.5)
+            elif state.bans == 0:
+                if state.latency / state.responses > self.target_latency:
+                    self.decrease(domain, state, 0.75)
+                else:
+                    state.good = state.limit
+                    self.increase(domain, state)
+            self.reset_window(state)
+        self.apply(domain)
+
+    def state(self, domain: str) -> DomainState:
+        if (state := self.domains.get(domain)) is None:
+            limit = self.clamp(self.learned.get(domain, self.max_limit))
+            state = self.domains[domain] = DomainState(
+                limit=limit, good=limit, peak=limit
+            )
+        return state
+
+    def increase(self, domain: str, state: DomainState):
+        if state.limit < self.max_limit:
+            state.limit += 1
+            state.increases += 1
+            state.peak = max(state.peak, state.limit)
+
+    def decrease(self, domain: str, state: DomainState, factor: float):
+        limit = self.clamp(int(state.limit * factor))
+        if limit < state.limit:
+            state.limit = limit
+            state.decreases += 1
+            self.crawler.spider.logger.info(
+                f"Concurrency of {domain} decreased to {limit}"
+            )
+        state.good = min(state.good, state.limit)
+
+    @staticmethod
+    def reset_window(state: DomainState):
+        state.responses = 0
+        state.latency = 0
+        state.bans = 0
+
+    def clamp(self, limit: int) -> int:
+        return max(self.min_limit, min(self.max_limit, limit))
+
+    def apply(self, domain: str):
+        """
+        download slot 의 동시 요청 수를 바꾼다(slot 은 첫 요청이 도착할 때 만들어진다)
+        """
+        slot = self.crawler.engine.downloader.slots.get(domain)
+        if slot is not None:
+            slot.concurrency = self.state(domain).limit
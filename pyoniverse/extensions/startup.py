@@ -0,0 +1,40 @@
+import os
+import time
+
+from scrapy import Request, Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+
+
+class StartupProbe:
+    """
+    Benchmark 용 Extension.
+    PYONIVERSE_LAUNCHED_AT(epoch sec) 부터 첫 요청이 downloader 에 도달하기까지 걸린 시간을
+    startup/first_request_sec 에 기록하고 spider 를 종료한다.
+    PYONIVERSE_LAUNCHED_AT 이 없으면 동작하지 않는다. 기본 settings 에는 없고 benchmarks/startup_settings.py 에서 켠다.
+    """
+
+    def __init__(self, crawler: Crawler, launched_at: float):
+        self.crawler = crawler
+        self.launched_at = launched_at
+        self.recorded = False
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        launched_at = os.getenv("PYONIVERSE_LAUNCHED_AT")
+        if not launched_at:
+            raise NotConfigured
+        o = cls(crawler, float(launched_at))
+        crawler.signals.connect(
+            o.request_reached_downloader, signal=signals.request_reached_downloader
+        )
+        return o
+
+    def request_reached_downloader(self, request: Request, spider: Spider):
+        if self.recorded:
+            return
+        self.recorded = True
+        self.crawler.stats.set_value(
+            "startup/first_request_sec", time.time() - self.launched_at, spider=spider
+        )
+        self.crawler.engine.close_spider(spider, "startup_probe")
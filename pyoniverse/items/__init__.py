@@ -1,6 +1,8 @@
+import hashlib
+import json
 from abc import ABCMeta, abstractmethod
-from dataclasses import dataclass, field
-from typing import List, Optional, TypeVar
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, TypeVar
 
 from marshmallow import Schema
 
@@ -13,6 +15,14 @@ from pyoniverse.items.schemas import (
 
 
 class ItemVO(metaclass=ABCMeta):
+    """
+    하위 class 는 @dataclass(kw_only=True, slots=True) 로 선언한다(아이템마다 __dict__ 를 만들지 않는다).
+    slots dataclass 는 class 를 새로 만들기 때문에 메서드에서 인자 없는 super() 를 사용할 수 없다.
+    """
+
+    # to_document 가 캐시한 document
+    __slots__ = ("_document",)
+
     @staticmethod
     @abstractmethod
     def get_schema() -> Schema:
@@ -22,11 +32,51 @@ class ItemVO(metaclass=ABCMeta):
     def get_collection_name() -> str:
         raise NotImplementedError
 
+    @staticmethod
+    def get_hash_fields() -> List[str]:
+        """
+        content hash 를 계산할 필드. 비어 있으면 hash 를 계산하지 않는다.
+        """
+        return []
+
+    def to_document(self) -> dict:
+        """
+        asdict(self) 를 한 번만 만들고 pipeline 들이 같이 사용한다. 반환한 dict 는 수정하면 안 된다.
+        필드에 값을 대입하면 다시 만들지만, 하위 객체(image 등)를 직접 수정했다면 invalidate_document 를 호출해야 한다.
+        """
+        doc = getattr(self, "_document", None)
+        if doc is None:
+            doc = asdict(self)
+            object.__setattr__(self, "_document", doc)
+        return doc
+
+    def invalidate_document(self):
+        object.__setattr__(self, "_document", None)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, "_document", None)
+        object.__setattr__(self, name, value)
+
+    def get_content_hash(self) -> Optional[str]:
+        """
+        :return: get_hash_fields 의 값이 같으면 같은 hash
+        """
+        names = self.get_hash_fields()
+        if not names:
+            return None
+        doc = self.to_document()
+        content = json.dumps(
+            {name: doc[name] for name in names}, sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
 
 ItemType = TypeVar("ItemType", bound=ItemVO)
+# EventVO 객체 - {(brand, id): EventVO}
+_events: Dict[tuple, "EventVO"] = {}
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class CrawledInfoVO(ItemVO):
     spider: str = field()
     id: str = field()
@@ -38,7 +88,7 @@ class CrawledInfoVO(ItemVO):
         return CrawledInfoSchema()
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class PriceVO(ItemVO):
     value: float = field()
     currency: int = field()
@@ -49,7 +99,7 @@ class PriceVO(ItemVO):
         return PriceSchema()
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class ImageVO(ItemVO):
     """
     size 는 ImagePipeline 에서 채워집니다.
@@ -66,11 +116,24 @@ class ImageVO(ItemVO):
         return ImageSchema()
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True, frozen=True)
 class EventVO(ItemVO):
+    """
+    수정하지 않으므로 (brand, id) 마다 하나의 객체를 함께 사용한다.
+    """
+
     brand: int = field()
     id: int = field()
 
+    def __new__(cls, *args, **kwargs):
+        if not kwargs:
+            # pickle, copy
+            return object.__new__(cls)
+        key = (kwargs.get("brand"), kwargs.get("id"))
+        if (event := _events.get(key)) is None:
+            event = _events[key] = object.__new__(cls)
+        return event
+
     @staticmethod
     def get_schema() -> Schema:
         return EventSchema()
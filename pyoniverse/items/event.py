@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import List, Optional
 
 from overrides import override
 
@@ -8,7 +8,7 @@ from pyoniverse.items.schemas.event import BrandEventSchema
 from pyoniverse.items.utils import get_timestamp
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class BrandEventVO(ItemVO):
     """
     created_at, updated_at 은 자동으로 생성됩니다.
@@ -33,6 +33,11 @@ class BrandEventVO(ItemVO):
     def get_collection_name() -> str:
         return "events"
 
+    @staticmethod
+    @override
+    def get_hash_fields() -> List[str]:
+        return ["name", "description", "image", "start_at", "end_at"]
+
     @staticmethod
     def get_schema() -> BrandEventSchema:
         return BrandEventSchema()
@@ -8,7 +8,7 @@ from pyoniverse.items.schemas.product import ProductSchema
 from pyoniverse.items.utils import get_timestamp
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class ProductVO(ItemVO):
     """
     created_at, updated_at 은 자동으로 생성됩니다.
@@ -36,6 +36,12 @@ class ProductVO(ItemVO):
     def get_collection_name() -> str:
         return "products"
 
+    @staticmethod
+    @override
+    def get_hash_fields() -> List[str]:
+        # created_at, updated_at, crawled_info 는 실행마다 달라질 수 있다
+        return ["name", "price", "events", "image", "tags", "description"]
+
     @staticmethod
     def get_schema() -> ProductSchema:
         return ProductSchema()
@@ -0,0 +1,92 @@
+import random
+import time
+from collections import defaultdict
+from typing import Dict
+
+from scrapy import Request, Spider
+from scrapy.exceptions import IgnoreRequest
+from scrapy.statscollectors import StatsCollector
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet import task
+
+
+class BackoffMiddleware:
+    """
+    meta["backoff"] 가 있는 요청을 받으면 그 도메인을 잠시 멈춘다(reactor timer 로 기다리고, reactor 를 멈추지 않는다).
+    - 기다리는 시간은 도메인마다 exponential backoff(BACKOFF_BASE * 2^(연속 실패 - 1), 최대 BACKOFF_MAX)에 jitter 를 더한다
+    - 멈춘 동안에는 그 도메인의 다른 요청도 download slot 에 넣기 전에 기다린다
+      (download slot 의 동시 요청 수는 사용하지 않지만, CONCURRENT_REQUESTS 에는 포함된다)
+    - 도메인마다 BACKOFF_RETRY_BUDGET 번까지만 다시 보낸다
+    - 성공한 응답을 받으면 연속 실패 횟수를 초기화한다
+    """
+
+    def __init__(
+        self,
+        base: float = 5,
+        max_delay: float = 60,
+        jitter: float = 0.5,
+        retry_budget: int = 30,
+        stats: StatsCollector = None,
+    ):
+        self.base = base
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_budget = retry_budget
+        self.stats = stats
+        self.failures: Dict[str, int] = defaultdict(int)
+        self.retries: Dict[str, int] = defaultdict(int)
+        self.paused_until: Dict[str, float] = {}  # time.monotonic()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            base=settings.getfloat("BACKOFF_BASE", 5),
+            max_delay=settings.getfloat("BACKOFF_MAX", 60),
+            jitter=settings.getfloat("BACKOFF_JITTER", 0.5),
+            retry_budget=settings.getint("BACKOFF_RETRY_BUDGET", 30),
+            stats=crawler.stats,
+        )
+
+    def delay(self, domain: str) -> float:
+        """
+        :return: 다음 요청까지 기다릴 시간(sec). 연속 실패 횟수를 늘린다
+        """
+        self.failures[domain] += 1
+        delay = min(self.max_delay, self.base * 2 ** (self.failures[domain] - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def process_request(self, request: Request, spider: Spider):
+        domain = urlparse_cached(request).netloc
+        if request.meta.get("backoff"):
+            if self.retries[domain] >= self.retry_budget:
+                self._inc_stats(spider, f"{domain}/gave_up", 1)
+                spider.logger.error(f"Backoff budget exhausted: {request.url}")
+                raise IgnoreRequest(f"Backoff budget exhausted for {domain}")
+            self.retries[domain] += 1
+            delay = self.delay(domain)
+            self._inc_stats(spider, f"{domain}/retries", 1)
+            self._inc_stats(spider, f"{domain}/seconds", round(delay, 3))
+            spider.logger.info(f"Backoff {delay:.1f} sec: {request.url}")
+            self.paused_until[domain] = max(
+                self.paused_until.get(domain, 0), time.monotonic() + delay
+            )
+        wait = self.paused_until.get(domain, 0) - time.monotonic()
+        if wait <= 0:
+            return None
+        if not request.meta.get("backoff"):
+            self._inc_stats(spider, f"{domain}/held", 1)
+
+        from twisted.internet import reactor
+
+        await task.deferLater(reactor, wait, lambda: None)
+        return None
+
+    def process_response(self, request: Request, response, spider: Spider):
+        if response.status < 400:
+            self.failures.pop(urlparse_cached(request).netloc, None)
+        return response
+
+    def _inc_stats(self, spider: Spider, key: str, count):
+        if self.stats is not None:
+            self.stats.inc_value(f"backoff/{key}", count, spider=spider)
@@ -9,11 +9,18 @@ class LogResult:
     collected_count: int = field()
     error_count: int = field()
     elapsed_sec: int = field()
+    # MongoDBPipeline 에서 새로 저장, 변경, content hash 가 같아서 건너뛴 아이템 수
+    new_count: int = field(default=0)
+    changed_count: int = field(default=0)
+    skipped_count: int = field(default=0)
 
     class __LogResultSchema(Schema):
         collected_count: int = fields.Int(required=True)
         error_count: int = fields.Int(required=True)
         elapsed_sec: int = fields.Int(required=True)
+        new_count: int = fields.Int(load_default=0)
+        changed_count: int = fields.Int(load_default=0)
+        skipped_count: int = fields.Int(load_default=0)
 
         def load(
             self,
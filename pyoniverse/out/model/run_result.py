@@ -0,0 +1,16 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass(kw_only=True)
+class RunResult:
+    """
+    Spider 한 개의 실행 결과
+    max_rss: spider 를 실행한 프로세스의 최대 RSS(bytes)
+    """
+
+    spider: str = field()
+    exit_code: int = field()
+    elapsed_sec: float = field()
+    max_rss: Optional[int] = field(default=None)
+    timed_out: bool = field(default=False)
@@ -1,8 +1,10 @@
 import logging
 import os
+from typing import TYPE_CHECKING
 
-import boto3
-from boto3_type_annotations.s3 import Client
+
+if TYPE_CHECKING:
+    from boto3_type_annotations.s3 import Client
 
 
 class S3Sender:
@@ -13,7 +15,9 @@ class S3Sender:
         """
         log files 를 `pyoniverse-log` 로 이동
         """
-        s3: Client = boto3.client("s3")
+        import boto3
+
+        s3: "Client" = boto3.client("s3")
         for f in os.listdir():
             if not f.endswith(".log"):
                 continue
@@ -1,12 +1,10 @@
 import logging
 
-from pyoniverse.out.s3.s3 import S3Sender
-from pyoniverse.out.slack.slack import SlackSender
-
 
 class Sender:
     """
     Facade Pattern
+    target 별 Sender 는 사용할 때 import 한다(boto3 로딩 비용)
     """
 
     def __init__(self, *args, **kwargs):
@@ -20,10 +18,14 @@ class Sender:
     ) -> bool:
         match target:
             case "slack":
+                from pyoniverse.out.slack.slack import SlackSender
+
                 res = SlackSender().send(
                     message_type=kwargs["message_type"], data=kwargs["data"]
                 )
             case "s3":
+                from pyoniverse.out.s3.s3 import S3Sender
+
                 res = S3Sender().send()
             case _:
                 raise NotImplementedError
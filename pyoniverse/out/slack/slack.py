@@ -2,10 +2,7 @@ import json
 import logging
 import os
 from dataclasses import asdict
-from typing import Dict
-
-import boto3
-from boto3_type_annotations.sqs import Client
+from typing import TYPE_CHECKING, Dict
 
 from pyoniverse.out.converter.type_to_message import TypeToMessageConverter
 from pyoniverse.out.model.enum.message_enum import MessageTypeEnum
@@ -13,6 +10,10 @@ from pyoniverse.out.model.log_result import LogResult
 from pyoniverse.out.model.message import Message
 
 
+if TYPE_CHECKING:
+    from boto3_type_annotations.sqs import Client
+
+
 class SlackSender:
     def __init__(self, *args, **kwargs):
         self.logger = logging.getLogger("scrapy.sender")
@@ -20,7 +21,9 @@ class SlackSender:
     def send(self, message_type: MessageTypeEnum, data: Dict[str, LogResult]) -> bool:
         res: Message = self._convert(message_type, data)
         try:
-            sqs_client: Client = boto3.client("sqs")
+            import boto3
+
+            sqs_client: "Client" = boto3.client("sqs")
             sqs_queue_url: str = sqs_client.get_queue_url(
                 QueueName=os.getenv("QUEUE_NAME")
             )["QueueUrl"]
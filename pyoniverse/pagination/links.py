@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, Optional
+
+from bs4 import BeautifulSoup
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from w3lib.url import add_or_replace_parameter, url_query_cleaner, url_query_parameter
+
+
+@dataclass(frozen=True, kw_only=True)
+class PageLinks:
+    """
+    pager 의 page 링크로 pagination 하는 목록(spider 의 class attribute 로 선언한다)
+    """
+
+    pager: str  # pager 의 page 링크(a) css selector
+    param: str = "page"  # page 번호 query parameter
+    next_link: Optional[str] = None  # page 번호를 알 수 없을 때 따라갈 다음 page 링크(a) css selector
+
+
+class LinkPaginator:
+    """
+    pager 에 보이는 page 번호 중 가장 큰 page 까지 한 번에 요청한다.
+    - 목록(page parameter 를 뺀 URL)마다 요청한 page 를 기억하고, 뒤쪽 page 의 pager 에 새 번호가 보이면 이어서 요청한다
+    - page 번호를 알 수 없으면 next_link 를 따라간다
+    """
+
+    def __init__(self, style: PageLinks):
+        self.style = style
+        self.requested: Dict[str, int] = {}
+
+    def follow(
+        self, response: HtmlResponse, callback: Callable, cb_kwargs: dict = None
+    ) -> Iterator[Request]:
+        soup = BeautifulSoup(response.text, "html.parser")
+        links = {}
+        for href in self.hrefs(soup, self.style.pager):
+            url = response.urljoin(href)
+            if (page := self.page(url)) is not None:
+                links[page] = url
+        if not links:
+            if self.style.next_link is not None:
+                for href in self.hrefs(soup, self.style.next_link)[:1]:
+                    yield Request(
+                        url=response.urljoin(href),
+                        callback=callback,
+                        cb_kwargs=dict(cb_kwargs or {}),
+                    )
+            return
+        # 다른 query parameter 는 마지막 page 링크를 따른다
+        last = max(links)
+        key = url_query_cleaner(links[last], [self.style.param], remove=True)
+        requested = self.requested.setdefault(key, self.page(response.url) or 1)
+        for page in range(requested + 1, last + 1):
+            yield Request(
+                url=add_or_replace_parameter(links[last], self.style.param, str(page)),
+                callback=callback,
+                cb_kwargs=dict(cb_kwargs or {}),
+            )
+        self.requested[key] = max(requested, last)
+
+    def page(self, url: str) -> Optional[int]:
+        page = url_query_parameter(url, self.style.param)
+        return int(page) if page and page.isdigit() else None
+
+    @staticmethod
+    def hrefs(soup: BeautifulSoup, selector: str) -> list:
+        return [
+            a["href"]
+            for a in soup.select(selector)
+            if a.get("href") and not a["href"].startswith(("#", "javascript:"))
+        ]
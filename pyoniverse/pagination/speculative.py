@@ -0,0 +1,116 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from scrapy import Spider
+from scrapy.settings import BaseSettings
+
+from pyoniverse.state import JsonState
+
+
+@dataclass(kw_only=True)
+class PageWindow:
+    size: int
+    next_page: int = 1  # 다음에 요청할 page
+    end: Optional[int] = None  # 처음 발견한 빈 page
+    last: Optional[int] = None  # 이 page 까지만 미리 요청한다(지난 실행의 page 수 + 1)
+    in_flight: Set[int] = field(default_factory=set)
+    pages: int = 0  # 상품이 있던 page 수
+    requested: int = 0
+    failed: int = 0
+
+
+class SpeculativePaginator:
+    """
+    목록(key)마다 다음 page 들을 미리 요청해서 window 개의 page 를 동시에 받는다.
+    - 처음 빈 page 를 받으면 더 요청하지 않고, 그 뒤의 page 는 무시한다
+    - window 는 지난 실행에서 본 page 수 + 1(빈 page)로 시작한다. 기록이 없으면 PAGINATION_WINDOW
+      기록이 있으면 그 page 까지만 요청하고, 목록이 더 길어졌으면(마지막 page 에 상품이 있으면) PAGINATION_WINDOW 개씩 더 요청한다
+    - 실패한 page 는 failed 로 알려주면 건너뛰고 다음 page 를 요청한다
+    - 실행이 끝나면 page 수를 PAGINATION_STATE 에 저장한다
+    """
+
+    def __init__(self, state: JsonState, window: int = 4, max_window: int = 32):
+        self.state = state
+        self.history: Dict[str, int] = state.load()
+        self.window = window
+        self.max_window = max_window
+        self.windows: Dict[str, PageWindow] = {}
+
+    @classmethod
+    def from_settings(cls, settings: BaseSettings):
+        return cls(
+            JsonState(Path(settings.get("PAGINATION_STATE"))),
+            window=settings.getint("PAGINATION_WINDOW", 4),
+            max_window=settings.getint("PAGINATION_MAX_WINDOW", 32),
+        )
+
+    def start(self, key: str) -> List[int]:
+        """
+        :return: 처음 요청할 page 들. 이미 시작한 key 면 []
+        """
+        if key in self.windows:
+            return []
+        pages = self.history.get(key)
+        if pages is None:
+            self.windows[key] = PageWindow(size=self.window)
+        else:
+            size = max(1, min(self.max_window, pages + 1))
+            self.windows[key] = PageWindow(size=size, last=pages + 1)
+        return self.__fill(self.windows[key])
+
+    def is_past_end(self, key: str, page: int) -> bool:
+        window = self.windows[key]
+        return window.end is not None and page > window.end
+
+    def done(self, key: str, page: int, empty: bool) -> List[int]:
+        """
+        :return: 이어서 요청할 page 들
+        """
+        window = self.windows[key]
+        window.in_flight.discard(page)
+        if empty:
+            window.end = page if window.end is None else min(window.end, page)
+            # 먼저 받은 뒤쪽 page 는 세지 않는다
+            window.pages = min(window.pages, window.end - 1)
+            return []
+        if window.end is None or page < window.end:
+            window.pages = max(window.pages, page)
+        if window.last is not None and page >= window.last:
+            window.last = page + self.window
+        return self.__fill(window)
+
+    def failed(self, key: str, page: int) -> List[int]:
+        """
+        응답을 받지 못했거나 parse 하지 못한 page 를 window 에서 뺀다
+        :return: 이어서 요청할 page 들
+        """
+        window = self.windows[key]
+        window.in_flight.discard(page)
+        window.failed += 1
+        return self.__fill(window)
+
+    def close(self, spider: Spider):
+        for key, window in self.windows.items():
+            for name in ("pages", "requested", "failed"):
+                spider.crawler.stats.set_value(
+                    f"pagination/{key}/{name}", getattr(window, name), spider=spider
+                )
+        # 끝까지 본 목록만 기록한다
+        self.state.save(
+            {key: w.pages for key, w in self.windows.items() if w.end is not None}
+        )
+
+    @staticmethod
+    def __fill(window: PageWindow) -> List[int]:
+        pages = []
+        while (
+            window.end is None
+            and len(window.in_flight) < window.size
+            and (window.last is None or window.next_page <= window.last)
+        ):
+            window.in_flight.add(window.next_page)
+            pages.append(window.next_page)
+            window.next_page += 1
+        window.requested += len(pages)
+        return pages
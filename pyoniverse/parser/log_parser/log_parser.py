@@ -36,10 +36,14 @@ class LogParser:
                 return res
 
     def _convert(self, data: dict) -> LogResult:
+        # 실패하거나 강제 종료된 spider 는 item_scraped_count, elapsed_time_seconds 가 없을 수 있다
         res = LogResult(
-            collected_count=data["item_scraped_count"],
+            collected_count=data.get("item_scraped_count", 0),
             error_count=data.get("log_count/ERROR", 0),
-            elapsed_sec=int(data["elapsed_time_seconds"]),
+            elapsed_sec=int(data.get("elapsed_time_seconds", 0)),
+            new_count=data.get("mongodb/new", 0),
+            changed_count=data.get("mongodb/changed", 0),
+            skipped_count=data.get("mongodb/skipped", 0),
         )
         return res
 
@@ -47,12 +51,21 @@ class LogParser:
         collected_count = 0
         error_count = 0
         elapsed_sec = 0
+        new_count = 0
+        changed_count = 0
+        skipped_count = 0
         for v in res.values():
             collected_count += v.collected_count
             error_count += v.error_count
             elapsed_sec = max(elapsed_sec, v.elapsed_sec)
+            new_count += v.new_count
+            changed_count += v.changed_count
+            skipped_count += v.skipped_count
         return LogResult(
             collected_count=collected_count,
             error_count=error_count,
             elapsed_sec=elapsed_sec,
+            new_count=new_count,
+            changed_count=changed_count,
+            skipped_count=skipped_count,
         )
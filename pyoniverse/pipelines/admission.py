@@ -0,0 +1,133 @@
+import time
+import warnings
+from collections import deque
+from io import BytesIO
+from typing import Callable, Deque, Dict, List, Tuple
+
+from PIL import Image
+from twisted.internet import defer
+
+
+class ImageRejected(Exception):
+    pass
+
+
+def read_size(body: bytes, max_pixels: int) -> Tuple[int, int]:
+    """
+    header 만 읽어서 크기를 확인한다(decode 하지 않는다).
+    :raise ImageRejected: 이미지가 아니거나 max_pixels 보다 크면(decompression bomb)
+    """
+    try:
+        with warnings.catch_warnings():
+            # max_pixels 로 직접 확인한다
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            width, height = Image.open(BytesIO(body)).size
+    except Image.DecompressionBombError as e:
+        raise ImageRejected(f"decompression-bomb: {e}")
+    except Exception as e:
+        raise ImageRejected(f"invalid-image: {e!r}")
+    if width * height > max_pixels:
+        raise ImageRejected(
+            f"decompression-bomb: {width}x{height} > {max_pixels} pixels"
+        )
+    return width, height
+
+
+def decoded_bytes(size: Tuple[int, int], body: bytes) -> int:
+    """
+    변환하는 동안 필요한 메모리(RGBA 로 decode 한 원본 + 받은 bytes)
+    """
+    return size[0] * size[1] * 4 + len(body)
+
+
+class PixelBudget:
+    """
+    동시에 변환하는 이미지의 메모리(bytes)를 limit 이하로 제한하는 weighted semaphore.
+    limit 을 넘으면 요청 순서(FIFO)대로 기다린다. limit 보다 큰 이미지는 혼자 실행한다.
+    reactor thread 에서만 사용한다.
+    같은 process 의 spider(InProcessRunner)는 acquire_shared 로 budget 하나를 같이 사용한다.
+    """
+
+    # {limit: (budget, 사용 중인 pipeline 수)}
+    __shared: Dict[int, Tuple["PixelBudget", int]] = {}
+
+    @classmethod
+    def acquire_shared(cls, limit: int, parallel: int = 1) -> "PixelBudget":
+        """
+        process 의 budget 을 얻는다. limit 을 동시에 실행하는 spider process 수(parallel)로 나눈다
+        """
+        limit = max(1, limit // max(1, parallel))
+        budget, users = cls.__shared.get(limit, (None, 0))
+        if budget is None:
+            budget = cls(limit)
+        cls.__shared[limit] = (budget, users + 1)
+        return budget
+
+    @classmethod
+    def release_shared(cls, budget: "PixelBudget"):
+        """
+        마지막으로 사용하던 pipeline 이 반환하면 버린다(기다리는 변환은 그대로 실행된다)
+        """
+        budget, users = cls.__shared[budget.limit]
+        if users <= 1:
+            del cls.__shared[budget.limit]
+        else:
+            cls.__shared[budget.limit] = (budget, users - 1)
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.__waiting: Deque[Tuple[int, defer.Deferred, float]] = deque()
+        self.queued = 0
+        self.max_queue_depth = 0
+        self.waits: List[float] = []
+
+    def acquire(self, weight: int) -> defer.Deferred:
+        weight = min(weight, self.limit)
+        d = defer.Deferred()
+        if not self.__waiting and self.used + weight <= self.limit:
+            self.used += weight
+            d.callback(weight)
+            return d
+        self.__waiting.append((weight, d, time.monotonic()))
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self.__waiting))
+        return d
+
+    def release(self, weight: int):
+        self.used -= weight
+        while self.__waiting and self.used + self.__waiting[0][0] <= self.limit:
+            weight, d, queued_at = self.__waiting.popleft()
+            self.used += weight
+            self.waits.append(time.monotonic() - queued_at)
+            d.callback(weight)
+
+    def run(self, weight: int, func: Callable, *args) -> defer.Deferred:
+        """
+        budget 을 얻은 뒤 func 를 실행하고, 끝나면(실패해도) 돌려준다
+        """
+
+        def acquired(weight: int):
+            d = defer.maybeDeferred(func, *args)
+            d.addBoth(released, weight)
+            return d
+
+        def released(result, weight: int):
+            self.release(weight)
+            return result
+
+        return self.acquire(weight).addCallback(acquired)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.__waiting)
+
+    def summary(self) -> dict:
+        return {
+            "queued": self.queued,
+            "max_queue_depth": self.max_queue_depth,
+            "wait_avg_ms": round(sum(self.waits) / len(self.waits) * 1000, 2)
+            if self.waits
+            else 0,
+            "wait_max_ms": round(max(self.waits, default=0) * 1000, 2),
+        }
@@ -1,48 +1,279 @@
-from dataclasses import asdict, fields
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import fields
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
 
+import bson
+from bson import CodecOptions
+from bson.raw_bson import RawBSONDocument
 from overrides import override
-from pymongo import MongoClient, WriteConcern
+from pymongo import MongoClient, ReplaceOne, UpdateOne, WriteConcern
 from pymongo.database import Database
+from pymongo.errors import BulkWriteError, OperationFailure
 from pymongo.read_preferences import SecondaryPreferred
-from pymongo.results import UpdateResult
 from scrapy import Spider
+from scrapy.exceptions import NotConfigured
+from scrapy.statscollectors import StatsCollector
+from twisted.internet import defer, task, threads
+from twisted.python.threadpool import ThreadPool
 
-from pyoniverse.items import EventVO, ItemType
+from pyoniverse.db.client import DBClient
+from pyoniverse.items import CrawledInfoVO, EventVO, ItemType
+from pyoniverse.items.schemas.product import ProductSchema
+from pyoniverse.items.utils import get_timestamp
 from pyoniverse.pipelines import BasePipeline
 
 
+WriteOperation = Union[UpdateOne, ReplaceOne]
+# (쓰기 작업, crawled_info, last_seen_at 만 수정하는지)
+PendingWrite = Tuple[WriteOperation, dict, bool]
+
+
+class QueryLatency:
+    """
+    쿼리 종류별 실행 시간을 모은다. AsyncMongoDBPipeline 의 thread 에서도 기록하므로 lock 을 사용한다.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        # {query: [count, total_sec, max_sec]}
+        self.__latency: Dict[str, List[float]] = {}
+
+    @contextmanager
+    def measure(self, query: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.__lock:
+                latency = self.__latency.setdefault(query, [0, 0.0, 0.0])
+                latency[0] += 1
+                latency[1] += elapsed
+                latency[2] = max(latency[2], elapsed)
+
+    def summary(self) -> Dict[str, dict]:
+        with self.__lock:
+            return {
+                query: {
+                    "count": count,
+                    "avg_ms": round(total / count * 1000, 2),
+                    "max_ms": round(peak * 1000, 2),
+                }
+                for query, (count, total, peak) in self.__latency.items()
+            }
+
+
 class MongoDBPipeline(BasePipeline):
     """
     MongoDB에 아이템을 저장한다
+    쓰기 작업은 MONGO_BULK_SIZE 개가 모이거나 MONGO_BULK_INTERVAL 초가 지나면 bulk_write 로 한 번에 저장한다.
+    MONGO_BULK_SIZE <= 1 이면 아이템마다 저장한다.
+    MONGO_SERVER_MERGE 이면 이전 아이템과 합치는 작업을 update pipeline 으로 DB 에서 실행한다(MongoDB 4.2 이상).
+    이때 이전 아이템은 content hash 만 읽는다.
+    아니면 open_spider 에서 spider 의 이전 아이템을 미리 읽어두고(merge 에 필요한 필드만), 아이템마다 조회하지 않는다.
+    이전 아이템이 MONGO_PRELOAD_LIMIT 개보다 많으면(0 이하면 항상) 아이템마다 조회한다.
+    아이템의 content hash 를 함께 저장하고, 이전 아이템과 hash 가 같으면 저장하지 않는다.
+    MONGO_TOUCH_UNCHANGED 이면 대신 last_seen_at 만 수정한다.
+    MONGO_COLLECTION_SUFFIX 가 있으면 collection 이름 뒤에 붙인다(--clear_db 의 staging collection).
+    SPOOL_ENABLED 이면 사용하지 않는다(SpoolPipeline 이 저장한다).
+    MONGO_ENSURE_INDEXES 이면 open_spider 에서 hint 에 필요한 index(DBClient.indexes)를 만들고,
+    조회가 index 를 사용하는지(IXSCAN) explain 으로 확인한다. 쿼리별 실행 시간은 mongodb/latency/* 에 남긴다.
     """
 
+    # 같은 프로세스의 spider 들은 MongoClient 를 공유한다(inprocess 모드) - {uri: (client, ref count)}
+    __clients: Dict[str, Tuple[MongoClient, int]] = {}
+    hint = [("crawled_info.spider", 1), ("crawled_info.id", 1)]
+    # 이전 아이템과 합칠 때 필요한 필드 - {collection: [field]}
+    merge_fields: Dict[str, List[str]] = {
+        "products": [name for name, f in ProductSchema().fields.items() if f.allow_none]
+        + ["events", "created_at"],
+        "events": ["created_at"],
+    }
+
     @classmethod
     def from_crawler(cls, crawler):
+        if crawler.settings.getbool("SPOOL_ENABLED"):
+            raise NotConfigured("SPOOL_ENABLED: SpoolPipeline saves items")
         return cls(
             mongo_uri=crawler.settings.get("MONGO_URI"),
             mongo_db=crawler.settings.get("MONGO_DB"),
             stage=crawler.settings.get("STAGE"),
+            bulk_size=crawler.settings.getint("MONGO_BULK_SIZE", 500),
+            bulk_interval=crawler.settings.getfloat("MONGO_BULK_INTERVAL", 5),
+            preload_limit=crawler.settings.getint("MONGO_PRELOAD_LIMIT", 200000),
+            server_merge=crawler.settings.getbool("MONGO_SERVER_MERGE", True),
+            touch_unchanged=crawler.settings.getbool("MONGO_TOUCH_UNCHANGED", True),
+            collection_suffix=crawler.settings.get("MONGO_COLLECTION_SUFFIX", ""),
+            ensure_indexes=crawler.settings.getbool("MONGO_ENSURE_INDEXES", True),
+            stats=crawler.stats,
         )
 
-    def __init__(self, mongo_uri, mongo_db, stage):
+    def __init__(
+        self,
+        mongo_uri,
+        mongo_db,
+        stage,
+        bulk_size: int = 500,
+        bulk_interval: float = 5,
+        preload_limit: int = 200000,
+        server_merge: bool = True,
+        touch_unchanged: bool = True,
+        collection_suffix: str = "",
+        ensure_indexes: bool = True,
+        stats: StatsCollector = None,
+    ):
         self.mongo_uri = mongo_uri
         self.mongo_db = mongo_db
         self.stage = stage
+        self.bulk_size = bulk_size
+        self.bulk_interval = bulk_interval
+        self.preload_limit = preload_limit
+        self.server_merge = server_merge
+        self.touch_unchanged = touch_unchanged
+        self.collection_suffix = collection_suffix
+        self.ensure_indexes = ensure_indexes
+        self.stats = stats
+        self.latency = QueryLatency()
         self.__client: MongoClient = None
         self.read_db: Database = None
         self.write_db: Database = None
+        # {collection: [PendingWrite]}
+        self.__pending: Dict[str, List[PendingWrite]] = {}
+        self.__pending_keys: Set[Tuple[str, str, str]] = set()
+        self.__flusher: task.LoopingCall = None
+        # 미리 읽어둔 이전 아이템 - {collection: {crawled_info.id: BSON}}
+        self.__previous: Dict[str, Dict[str, bytes]] = {}
+
+    @classmethod
+    def __acquire_client(cls, uri: str) -> MongoClient:
+        client, count = cls.__clients.get(uri, (None, 0))
+        if client is None:
+            client = MongoClient(uri)
+        cls.__clients[uri] = (client, count + 1)
+        return client
+
+    @classmethod
+    def __release_client(cls, uri: str):
+        client, count = cls.__clients[uri]
+        if count <= 1:
+            del cls.__clients[uri]
+            client.close()
+        else:
+            cls.__clients[uri] = (client, count - 1)
 
     def open_spider(self, spider: Spider):
-        self.__client = MongoClient(self.mongo_uri)
+        self.__client = self.__acquire_client(self.mongo_uri)
         self.read_db = self.__client.get_database(
             self.mongo_db, read_preference=SecondaryPreferred()
         )
         self.write_db = self.__client.get_database(
             self.mongo_db, write_concern=WriteConcern(w="majority")
         )
+        if self.stage == "test":
+            return
+        if self.ensure_indexes:
+            for coll in DBClient.indexes:
+                self.__ensure_index(spider, coll)
+        if self.preload_limit > 0:
+            for coll in self.merge_fields:
+                self.__preload(spider, coll)
+        if self.bulk_size > 1:
+            self.__flusher = task.LoopingCall(self.flush, spider)
+            self.__flusher.start(self.bulk_interval, now=False)
+
+    def __ensure_index(self, spider: Spider, coll: str):
+        """
+        index 가 없으면 만든다(이미 있으면 아무것도 하지 않는다).
+        hint 없이 실행한 조회가 index 를 사용하지 않으면(COLLSCAN) 경고한다.
+        """
+        name = coll + self.collection_suffix
+        try:
+            self.write_db.get_collection(name).create_indexes(DBClient.indexes[coll])
+        except OperationFailure as e:
+            # 권한이 없으면 index 가 이미 있다고 보고 계속한다
+            spider.logger.error(f"Failed to create indexes on {name}: {e!r}")
+        queries = {
+            "preload": {"crawled_info.spider": spider.name},
+            "find_one": {"crawled_info.spider": spider.name, "crawled_info.id": ""},
+        }
+        for query, condition in queries.items():
+            plan = self.read_db.get_collection(name).find(condition).explain()
+            stages = self.__stages(plan.get("queryPlanner", {}))
+            if "IXSCAN" not in stages:
+                spider.logger.warning(f"{query} on {name} does not use index: {stages}")
+            self._set_stats(spider, f"index/{coll}/{query}", "/".join(stages))
 
-    def close_spider(self, spider):
-        self.__client.close()
+    @classmethod
+    def __stages(cls, plan) -> List[str]:
+        """
+        :return: explain 결과의 실행 계획에 있는 stage(상위 stage 부터)
+        """
+        if isinstance(plan, list):
+            return [stage for p in plan for stage in cls.__stages(p)]
+        if not isinstance(plan, dict):
+            return []
+        stages = [plan["stage"]] if "stage" in plan else []
+        for key, value in plan.items():
+            if key in {"winningPlan", "queryPlan", "inputStage", "inputStages"}:
+                stages += cls.__stages(value)
+        return stages
+
+    def __preload(self, spider: Spider, coll: str):
+        """
+        spider 의 이전 아이템을 BSON 그대로 저장한다. DB 에서 합친다면 content hash 만 읽는다.
+        MONGO_PRELOAD_LIMIT 개보다 많으면 저장하지 않고, _find_previous 가 아이템마다 조회한다.
+        """
+        collection = self.read_db.get_collection(
+            coll + self.collection_suffix,
+            codec_options=CodecOptions(document_class=RawBSONDocument),
+        )
+        query = {"crawled_info.spider": spider.name}
+        with self.latency.measure("count"):
+            count = collection.count_documents(query, hint=self.hint)
+        if count > self.preload_limit:
+            spider.logger.info(
+                f"Too many {coll} to preload({count} > {self.preload_limit}). Find one by one"
+            )
+            self._set_stats(spider, f"preload/{coll}/fallback", count)
+            return
+
+        projection = {"_id": False, "crawled_info.id": True, "content_hash": True}
+        if not self.server_merge:
+            projection.update({name: True for name in self.merge_fields[coll]})
+        with self.latency.measure("preload"):
+            previous = {
+                doc["crawled_info"]["id"]: doc.raw
+                for doc in collection.find(query, projection, hint=self.hint)
+            }
+        self.__previous[coll] = previous
+        size = sys.getsizeof(previous) + sum(
+            sys.getsizeof(key) + sys.getsizeof(raw) for key, raw in previous.items()
+        )
+        spider.logger.info(f"Preload {len(previous)} {coll}({size} bytes)")
+        self._set_stats(spider, f"preload/{coll}/count", len(previous))
+        self._set_stats(spider, f"preload/{coll}/bytes", size)
+
+    def close_spider(self, spider: Spider):
+        self._stop_flusher()
+        self.flush(spider)
+        self._release(spider)
+
+    def _stop_flusher(self):
+        if self.__flusher and self.__flusher.running:
+            self.__flusher.stop()
+
+    def _release(self, spider: Spider):
+        """
+        쌓인 쓰기 작업을 모두 저장한 뒤 호출한다
+        """
+        self.__previous.clear()
+        self.__release_client(self.mongo_uri)
+        for query, latency in self.latency.summary().items():
+            for key, value in latency.items():
+                self._set_stats(spider, f"latency/{query}/{key}", value)
 
     @override
     def process_item(self, item: ItemType, spider: Spider) -> ItemType:
@@ -56,49 +287,335 @@ class MongoDBPipeline(BasePipeline):
             return item
         else:
             coll: str = item.get_collection_name()
-            query = {
-                "crawled_info.spider": item.crawled_info.spider,
-                "crawled_info.id": item.crawled_info.id,
-            }
-            hint = [("crawled_info.spider", 1), ("crawled_info.id", 1)]
-            prv_item = self.read_db.get_collection(coll).find_one(
-                query, {"_id": False}, hint=hint
+            if not self._is_preloaded(spider, coll, item.crawled_info):
+                if self._is_pending(coll, item.crawled_info):
+                    # 같은 아이템이 아직 저장되지 않았다면 먼저 저장해야 이전 값과 합칠 수 있다
+                    self.flush(spider, coll)
+            prv_item = self._find_previous(spider, coll, item.crawled_info)
+            if self._enqueue(spider, coll, item, prv_item) >= self.bulk_size:
+                self.flush(spider, coll)
+            return item
+
+    def _query(self, crawled_info: CrawledInfoVO) -> dict:
+        return {
+            "crawled_info.spider": crawled_info.spider,
+            "crawled_info.id": crawled_info.id,
+        }
+
+    def _is_preloaded(
+        self, spider: Spider, coll: str, crawled_info: CrawledInfoVO
+    ) -> bool:
+        return coll in self.__previous and crawled_info.spider == spider.name
+
+    def _is_pending(self, coll: str, crawled_info: CrawledInfoVO) -> bool:
+        return (coll, crawled_info.spider, crawled_info.id) in self.__pending_keys
+
+    def _find_previous(
+        self, spider: Spider, coll: str, crawled_info: CrawledInfoVO
+    ) -> Optional[dict]:
+        """
+        미리 읽어둔 이전 아이템이 없으면 DB 에서 조회한다. DB 에서 합친다면 content hash 만 읽는다.
+        """
+        if self._is_preloaded(spider, coll, crawled_info):
+            raw = self.__previous[coll].get(crawled_info.id)
+            return bson.decode(raw) if raw else None
+        projection = {"_id": False}
+        if self.server_merge:
+            projection["content_hash"] = True
+        with self.latency.measure("find_one"):
+            return self.read_db.get_collection(coll + self.collection_suffix).find_one(
+                self._query(crawled_info), projection, hint=self.hint
             )
 
+    def _merge(self, coll: str, item: ItemType, prv_item: Optional[dict]):
+        if prv_item:
+            if coll == "products":
+                # item 에서 null 인 값은 이전 값으로 대체 && events 는 합친다.
+                for _field in fields(item):
+                    if _field.name == "events":
+                        continue
+                    if prv_val := prv_item.get(_field.name):
+                        if getattr(item, _field.name) is None:
+                            setattr(item, _field.name, prv_val)
+                cur_events = item.to_document()["events"]
+                prv_events = prv_item.get("events", [])
+                events = cur_events + prv_events
+                events = set(map(lambda x: (x["brand"], x["id"]), events))
+                events = list(map(lambda x: {"brand": x[0], "id": x[1]}, events))
+                item.events = [EventVO(**event) for event in events]
+
+            # created_at 은 이전 값으로 대체
+            item.created_at = prv_item["created_at"]
+
+    def _enqueue(
+        self, spider: Spider, coll: str, item: ItemType, prv_item: Optional[dict]
+    ) -> int:
+        """
+        이전 아이템과 합쳐서 저장할 쓰기 작업을 쌓는다.
+        :return: coll 에 쌓인 쓰기 작업 수
+        """
+        # 합치기 전에 계산해야 수집한 값이 같을 때 hash 가 같다
+        content_hash = item.get_content_hash()
+        query = self._query(item.crawled_info)
+        if prv_item and content_hash and prv_item.get("content_hash") == content_hash:
+            self._inc_stats(spider, "skipped", 1)
+            if not self.touch_unchanged:
+                return len(self.__pending.get(coll, []))
+            op = UpdateOne(
+                query, {"$set": {"last_seen_at": get_timestamp()}}, hint=self.hint
+            )
+            touch = True
+        else:
+            touch = False
             if prv_item:
-                if coll == "products":
-                    # item 에서 null 인 값은 이전 값으로 대체 && events 는 합친다.
-                    for _field in fields(item):
-                        if _field.name == "events":
-                            continue
-                        if prv_val := prv_item.get(_field.name):
-                            if getattr(item, _field.name) is None:
-                                setattr(item, _field.name, prv_val)
-                    cur_events = list(map(asdict, item.events))
-                    prv_events = prv_item.get("events", [])
-                    events = cur_events + prv_events
-                    events = set(map(lambda x: (x["brand"], x["id"]), events))
-                    events = list(map(lambda x: {"brand": x[0], "id": x[1]}, events))
-                    item.events = [EventVO(**event) for event in events]
-
-                # created_at 은 이전 값으로 대체
-                item.created_at = prv_item["created_at"]
+                self._inc_stats(spider, "changed", 1)
+            if not self.server_merge:
+                self._merge(coll, item, prv_item)
+            doc = {
+                **item.to_document(),
+                "content_hash": content_hash,
+                "last_seen_at": item.updated_at,
+            }
+            if self.server_merge:
+                op = UpdateOne(
+                    query,
+                    self._merge_pipeline(coll, doc),
+                    upsert=True,
+                    hint=self.hint,
+                )
             elif coll == "events":
-                # 이전 이벤트 제거
-                r = self.write_db.get_collection(coll).delete_one(query)
-                spider.logger.info(f"Deleted previous event: {r.deleted_count}")
-
-            update = {"$set": asdict(item)}
-            res: UpdateResult = self.write_db.get_collection(coll).update_one(
-                query,
-                update,
-                upsert=True,
-                hint=hint,
-            )
-            if res.matched_count == 0:
-                spider.logger.info(f"New item saved: {asdict(item.crawled_info)}")
-            elif res.modified_count == 0:
-                spider.logger.info(f"Item already exists: {asdict(item.crawled_info)}")
+                # 이전 이벤트는 새 이벤트로 교체한다
+                op = ReplaceOne(query, doc, upsert=True, hint=self.hint)
             else:
-                spider.logger.info(f"Item updated: {asdict(item.crawled_info)}")
+                op = UpdateOne(query, {"$set": doc}, upsert=True, hint=self.hint)
+            if coll in self.__previous:
+                # 같은 아이템이 다시 들어오면 이번 값과 비교하고 합친다
+                names = ["content_hash"]
+                if not self.server_merge:
+                    names += self.merge_fields[coll]
+                self.__previous[coll][item.crawled_info.id] = bson.encode(
+                    {name: doc[name] for name in names}
+                )
+        self.__pending.setdefault(coll, []).append(
+            (op, item.to_document()["crawled_info"], touch)
+        )
+        self.__pending_keys.add((coll, item.crawled_info.spider, item.crawled_info.id))
+        return len(self.__pending[coll])
+
+    @classmethod
+    def _merge_pipeline(cls, coll: str, doc: dict) -> List[dict]:
+        """
+        _merge 와 같은 작업을 하는 update pipeline. 문서 하나를 원자적으로 수정하므로 동시에 저장해도 안전하다.
+        값은 $literal 로 감싸야 "$" 로 시작하는 문자열이 필드로 해석되지 않는다.
+        """
+        if coll == "products":
+            # item 에서 null 인 값은 이전 값으로 대체 && events 는 합친다.
+            values = {
+                name: {"$literal": value}
+                if value is not None
+                else {"$ifNull": [f"${name}", None]}
+                for name, value in doc.items()
+            }
+            values["events"] = {
+                "$setUnion": [{"$ifNull": ["$events", []]}, {"$literal": doc["events"]}]
+            }
+        else:
+            # 이전 이벤트는 새 이벤트로 교체한다(모든 필드를 덮어쓴다)
+            values = {name: {"$literal": value} for name, value in doc.items()}
+        # created_at 은 이전 값으로 대체
+        values["created_at"] = {"$ifNull": ["$created_at", doc["created_at"]]}
+        return [{"$set": values}]
+
+    def _take_pending(self, coll: str = None) -> Dict[str, List[PendingWrite]]:
+        """
+        쌓인 쓰기 작업을 꺼낸다
+        :param coll: None 이면 모든 collection
+        """
+        colls = [coll] if coll else list(self.__pending.keys())
+        return {
+            coll: self.__pending.pop(coll) for coll in colls if self.__pending.get(coll)
+        }
+
+    def flush(self, spider: Spider, coll: str = None):
+        """
+        쌓인 쓰기 작업을 bulk_write(ordered=False) 로 저장한다.
+        :param coll: None 이면 모든 collection
+        """
+        for coll, pending in self._take_pending(coll).items():
+            self._account(spider, coll, pending, self._bulk_write(coll, pending))
+
+    def _bulk_write(self, coll: str, pending: List[PendingWrite]) -> dict:
+        """
+        :return: bulk_api_result(nUpserted, nMatched, nModified, upserted, writeErrors)
+        """
+        try:
+            with self.latency.measure("bulk_write"):
+                return (
+                    self.write_db.get_collection(coll + self.collection_suffix)
+                    .bulk_write([op for op, _, _ in pending], ordered=False)
+                    .bulk_api_result
+                )
+        except BulkWriteError as e:
+            # 실패하지 않은 작업은 저장된다
+            return e.details
+
+    def _account(
+        self,
+        spider: Spider,
+        coll: str,
+        pending: List[PendingWrite],
+        result: dict,
+    ):
+        """
+        bulk_write 결과를 로그와 통계에 남긴다
+        """
+        for _, crawled_info, _ in pending:
+            self.__pending_keys.discard(
+                (coll, crawled_info["spider"], crawled_info["id"])
+            )
+        for error in result.get("writeErrors", []):
+            spider.logger.error(
+                f"Failed to save item: {pending[error['index']][1]} "
+                f"{error.get('errmsg')}"
+            )
+        for upserted in result.get("upserted", []):
+            spider.logger.info(f"New item saved: {pending[upserted['index']][1]}")
+
+        new = result.get("nUpserted", 0)
+        matched = result.get("nMatched", 0)
+        modified = result.get("nModified", 0)
+        # last_seen_at 만 수정한 작업은 updated 로 세지 않는다
+        touched = min(modified, sum(touch for _, _, touch in pending))
+        spider.logger.info(
+            f"Bulk write {coll}: new={new}, updated={modified - touched}, "
+            f"touched={touched}, unchanged={matched - modified}"
+        )
+        self._inc_stats(spider, "new", new)
+        self._inc_stats(spider, "updated", modified - touched)
+        self._inc_stats(spider, "touched", touched)
+        self._inc_stats(spider, "unchanged", matched - modified)
+        self._inc_stats(spider, "error", len(result.get("writeErrors", [])))
+
+    def _inc_stats(self, spider: Spider, key: str, count: int):
+        if self.stats is not None and count:
+            self.stats.inc_value(f"mongodb/{key}", count, spider=spider)
+
+    def _set_stats(self, spider: Spider, key: str, value):
+        if self.stats is not None:
+            self.stats.set_value(f"mongodb/{key}", value, spider=spider)
+
+
+class AsyncMongoDBPipeline(MongoDBPipeline):
+    """
+    MongoDBPipeline 의 조회/저장을 thread pool 에서 실행해 reactor 를 막지 않는다.
+    동시에 실행되는 bulk_write 는 MONGO_MAX_IN_FLIGHT 개로 제한하고, 넘으면 process_item 이 기다린다.
+    이전 아이템을 미리 읽어두는 open_spider 는 요청이 시작되기 전이므로 그대로 실행한다.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = super().from_crawler(crawler)
+        pipeline.max_in_flight = crawler.settings.getint("MONGO_MAX_IN_FLIGHT", 4)
+        return pipeline
+
+    def __init__(self, *args, max_in_flight: int = 4, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_in_flight = max_in_flight
+        self.__pool: ThreadPool = None
+        self.__semaphore: defer.DeferredSemaphore = None
+        self.__in_flight: Set[defer.Deferred] = set()
+
+    @override
+    def open_spider(self, spider: Spider):
+        # 조회 1개 + 저장 max_in_flight 개
+        self.__pool = ThreadPool(
+            minthreads=1, maxthreads=self.max_in_flight + 1, name="mongodb"
+        )
+        self.__pool.start()
+        self.__semaphore = defer.DeferredSemaphore(self.max_in_flight)
+        super().open_spider(spider)
+
+    @defer.inlineCallbacks
+    @override
+    def close_spider(self, spider: Spider):
+        # 주기적인 flush 를 멈추고, 마지막 flush 와 저장 중인 작업이 끝난 뒤 client 를 반환한다
+        self._stop_flusher()
+        yield defer.DeferredList([self.flush(spider), *self.__in_flight])
+        self._release(spider)
+        self.__pool.stop()
+
+    @defer.inlineCallbacks
+    @override
+    def process_item(self, item: ItemType, spider: Spider) -> ItemType:
+        """
+        :param item: Item to be processed
+        :param spider: Current Spider
+        :return: Deferred - 저장 대기열에 들어가면 item 을 반환한다
+        """
+        if self.stage == "test":
+            # Development mode - Don't save item to database
             return item
+
+        coll: str = item.get_collection_name()
+        if not self._is_preloaded(spider, coll, item.crawled_info):
+            if self._is_pending(coll, item.crawled_info):
+                # 같은 아이템이 아직 저장되지 않았다면 먼저 저장해야 이전 값과 합칠 수 있다
+                yield defer.DeferredList([self.flush(spider, coll), *self.__in_flight])
+        if self._is_preloaded(spider, coll, item.crawled_info):
+            prv_item = self._find_previous(spider, coll, item.crawled_info)
+        else:
+            prv_item = yield self.__defer(
+                self._find_previous, spider, coll, item.crawled_info
+            )
+        if self._enqueue(spider, coll, item, prv_item) >= self.bulk_size:
+            # 저장 중인 작업이 max_in_flight 개면 하나가 끝날 때까지 기다린다
+            yield self.__semaphore.acquire()
+            self.__write(spider, coll)
+        return item
+
+    @override
+    def flush(self, spider: Spider, coll: str = None) -> defer.Deferred:
+        """
+        :return: Deferred - 쌓인 쓰기 작업이 모두 저장되면 실행된다
+        """
+        colls = [coll] if coll else [None]
+        return defer.DeferredList(
+            [
+                self.__semaphore.acquire().addCallback(
+                    lambda _, c=c: self.__write(spider, c)
+                )
+                for c in colls
+            ]
+        )
+
+    def __write(self, spider: Spider, coll: Optional[str]) -> defer.Deferred:
+        """
+        semaphore 를 얻은 뒤 호출해야 하며, 저장이 끝나면 semaphore 를 반환한다
+        """
+        batches = self._take_pending(coll)
+        if not batches:
+            self.__semaphore.release()
+            return defer.succeed(None)
+        d = self.__defer(
+            lambda: {c: self._bulk_write(c, pending) for c, pending in batches.items()}
+        )
+
+        def account(results: Dict[str, dict]):
+            for c, result in results.items():
+                self._account(spider, c, batches[c], result)
+
+        def fail(failure):
+            count = sum(map(len, batches.values()))
+            spider.logger.error(f"Failed to save {count} items: {failure.value!r}")
+            self._inc_stats(spider, "error", count)
+
+        d.addCallbacks(account, fail)
+        d.addBoth(lambda _: self.__semaphore.release())
+        self.__in_flight.add(d)
+        d.addBoth(lambda _: self.__in_flight.discard(d))
+        return d
+
+    def __defer(self, func, *args, **kwargs) -> defer.Deferred:
+        from twisted.internet import reactor
+
+        return threads.deferToThreadPool(reactor, self.__pool, func, *args, **kwargs)
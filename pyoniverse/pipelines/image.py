@@ -1,40 +1,117 @@
+import hashlib
 import logging
 import re
-import warnings
 from io import BytesIO
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 
+from PIL import Image
 from scrapy import Request
-from scrapy.exceptions import ScrapyDeprecationWarning
 from scrapy.pipelines.files import S3FilesStore
-from scrapy.pipelines.images import ImagesPipeline
-from scrapy.utils.misc import md5sum
-from scrapy.utils.python import get_func_args
+from scrapy.pipelines.images import ImageException, ImagesPipeline
+from twisted.internet import defer, task
 
 from pyoniverse.items.event import BrandEventVO
 from pyoniverse.items.product import ProductVO
+from pyoniverse.pipelines.admission import (
+    ImageRejected,
+    PixelBudget,
+    decoded_bytes,
+    read_size,
+)
+from pyoniverse.pipelines.manifest import ImageManifest, ManifestEntry
+from pyoniverse.pipelines.transcode import (
+    MAX_WEBP_SIZE,
+    TranscodeResult,
+    Transcoder,
+    thumbnail,
+    to_rgb,
+    to_webp,
+    transcode,
+)
 
 
 class S3ImagePipeline(ImagesPipeline):
     """
     S3에 이미지를 저장한다.
+    webp 변환은 IMAGES_TRANSCODE_POOL(thread | process | inline)에서 실행하고, 결과는 Deferred 로 받는다.
+    IMAGES_MANIFEST 에 저장한 이미지는 다시 변환하지 않는다.
+    - IMAGES_MANIFEST_REVALIDATE: 조건부 요청(If-None-Match, If-Modified-Since)을 보내고 304 나 같은 원본이면 재사용한다
+    - 아니면 다운로드하지 않고 재사용한다
+    변환 전에 header 로 크기를 확인해서 IMAGES_MAX_PIXELS 보다 크면 버리고,
+    동시에 변환하는 이미지의 메모리는 IMAGES_MEMORY_BUDGET 이하로 제한한다(넘으면 기다린다).
     """
 
     stage: str = None
     logger: logging.Logger = None
+    transcoder: Transcoder = None
+    manifest: Optional[ImageManifest] = None
+    manifest_flush_interval: float = 5
+    __manifest_flusher: task.LoopingCall = None
+    revalidate: bool = True
+    max_pixels: int = Image.MAX_IMAGE_PIXELS
+    memory_budget: int = 512 * 1024**2
+    parallel: int = 1
+    budget: PixelBudget = None
 
     @classmethod
     def from_settings(cls, settings):
         stage = settings["STAGE"]
         pipeline = super().from_settings(settings)
         pipeline.stage = stage
+        pipeline.parallel = settings.getint("IMAGES_TRANSCODE_PARALLEL_SPIDERS", 1)
+        pipeline.transcoder = Transcoder(
+            mode=settings.get("IMAGES_TRANSCODE_POOL", "thread"),
+            workers=settings.getint("IMAGES_TRANSCODE_WORKERS", 0),
+            parallel=pipeline.parallel,
+        )
+        if manifest := settings.get("IMAGES_MANIFEST"):
+            pipeline.manifest = ImageManifest(
+                Path(manifest),
+                max_age=settings.getfloat("IMAGES_MANIFEST_MAX_AGE", 14) * 24 * 3600,
+            )
+        pipeline.manifest_flush_interval = settings.getfloat(
+            "IMAGES_MANIFEST_FLUSH_INTERVAL", 5
+        )
+        pipeline.revalidate = settings.getbool("IMAGES_MANIFEST_REVALIDATE", True)
+        pipeline.max_pixels = settings.getint(
+            "IMAGES_MAX_PIXELS", Image.MAX_IMAGE_PIXELS
+        )
+        pipeline.memory_budget = settings.getint(
+            "IMAGES_MEMORY_BUDGET", 512 * 1024**2
+        )
         return pipeline
 
     def open_spider(self, spider):
         self.logger = spider.logger
+        self.transcoder.start()
+        self.budget = PixelBudget.acquire_shared(self.memory_budget, self.parallel)
+        if self.manifest is not None:
+            self.manifest.open()
+            self.__manifest_flusher = task.LoopingCall(self.manifest.flush)
+            self.__manifest_flusher.start(self.manifest_flush_interval, now=False)
         return super().open_spider(spider)
 
+    def close_spider(self, spider):
+        self.transcoder.stop()
+        for key, value in self.budget.summary().items():
+            spider.crawler.stats.set_value(f"image_budget/{key}", value, spider=spider)
+        PixelBudget.release_shared(self.budget)
+        if self.manifest is not None:
+            if self.__manifest_flusher and self.__manifest_flusher.running:
+                self.__manifest_flusher.stop()
+            d = self.manifest.close()
+            stats = spider.crawler.stats
+            hits = stats.get_value("image_manifest/hits", 0, spider=spider)
+            misses = stats.get_value("image_manifest/misses", 0, spider=spider)
+            if hits + misses:
+                stats.set_value(
+                    "image_manifest/hit_rate",
+                    round(hits / (hits + misses), 4),
+                    spider=spider,
+                )
+            return d
+
     def get_media_requests(self, item: ProductVO, info):
         """
         :param item: Product | Event
@@ -42,9 +119,21 @@ class S3ImagePipeline(ImagesPipeline):
         :return: Request for image
         """
         if item.image.thumb:
-            yield Request(item.image.thumb)
+            yield self.__request(item.image.thumb)
         for url in item.image.others:
-            yield Request(url)
+            yield self.__request(url)
+
+    def __request(self, url: str) -> Request:
+        entry = self.manifest.get(url) if self.manifest is not None else None
+        if entry is None:
+            return Request(url)
+        headers = {}
+        if self.revalidate:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return Request(url, headers=headers, meta={"manifest": entry})
 
     def file_path(self, request, response=None, info=None, *, item: ProductVO = None):
         path = super().file_path(request, response, info, item=item)
@@ -57,12 +146,16 @@ class S3ImagePipeline(ImagesPipeline):
         path = re.sub(r"^full", rf"{prefix}", path)
         return path
 
-    def item_completed(self, results: List[dict], item: ProductVO, info):
+    def item_completed(self, results: List[Tuple[bool, Any]], item: ProductVO, info):
         """
         self.store: S3FilesStore
+        이미지 크기는 결과(url)마다 media_downloaded 가 넣어둔 값을 사용한다(변환이 끝난 순서와 관계없다).
         """
         store: S3FilesStore = self.store
-        others = []
+        thumb = None
+        # [(원래 url, s3 url)] - get_media_requests 의 순서
+        others: List[Tuple[str, str]] = []
+        sizes: Dict[str, dict] = {}
         for ok, value in results:
             if ok:
                 # Webp 로 변환
@@ -71,25 +164,30 @@ class S3ImagePipeline(ImagesPipeline):
                     url = f"s3://{store.bucket}/{store.prefix}{path}"
                 else:
                     url = f"s3://{store.bucket}/{path}"
+                if "width" in value:
+                    sizes[value["url"]] = {
+                        "width": value["width"],
+                        "height": value["height"],
+                    }
                 if value["url"] == item.image.thumb:
-                    item.image.thumb = url
+                    thumb = (value["url"], url)
                 else:
-                    others.append(url)
-                    # item.image.others = [
-                    #     o if o != value["url"] else url for o in item.image.others
-                    # ]
+                    others.append((value["url"], url))
             else:
                 self.logger.warning(f"Image download failed: {str(value)}\n{item}")
-        if item.image.thumb and not item.image.thumb.startswith("s3"):
-            item.image.thumb = None
-            if "thumb" in item.image.size:
-                del item.image.size["thumb"]
-        if item.image.thumb is None and len(others) > 0:
-            item.image.thumb = others[0]
-            item.image.size["thumb"] = item.image.size["others"].pop(0)
-            item.image.others = others[1:]
-        else:
-            item.image.others = others
+        if thumb is None and others:
+            thumb = others.pop(0)
+
+        item.image.thumb = thumb[1] if thumb else None
+        item.image.others = [url for _, url in others]
+        item.image.size = {}
+        if thumb and thumb[0] in sizes:
+            item.image.size["thumb"] = sizes[thumb[0]]
+        if others and all(src in sizes for src, _ in others):
+            item.image.size["others"] = [sizes[src] for src, _ in others]
+        # image 를 직접 수정했으므로(size 포함) 직렬화한 document 를 다시 만들어야 한다
+        item.image.invalidate_document()
+        item.invalidate_document()
         return item
 
     # Webp 저장을 위한 Overrides
@@ -97,136 +195,160 @@ class S3ImagePipeline(ImagesPipeline):
         """
         webp Image 로 저장한다.
         """
-        if response_body is None:
-            warnings.warn(
-                f"{self.__class__.__name__}.convert_image() method called in a deprecated way, "
-                "method called without response_body argument.",
-                category=ScrapyDeprecationWarning,
-                stacklevel=2,
-            )
+        image = to_rgb(image)
+        if size:
+            image = thumbnail(image, size)
+        return image, to_webp(image)
 
-        if image.format in ("PNG", "WEBP") and image.mode == "RGBA":
-            background = self._Image.new("RGBA", image.size, (255, 255, 255))
-            background.paste(image, image)
-            image = background.convert("RGB")
-        elif image.mode == "P":
-            image = image.convert("RGBA")
-            background = self._Image.new("RGBA", image.size, (255, 255, 255))
-            background.paste(image, image)
-            image = background.convert("RGB")
-        elif image.mode != "RGB":
-            image = image.convert("RGB")
+    def media_to_download(self, request, info, *, item=None):
+        entry: ManifestEntry = request.meta.get("manifest")
+        if entry is not None and not self.revalidate:
+            return self.__reuse(entry, request, info, "skipped", entry.size)
+        return super().media_to_download(request, info, item=item)
 
-        if size:
-            image = image.copy()
-            try:
-                # Image.Resampling.LANCZOS was added in Pillow 9.1.0
-                # remove this try except block,
-                # when updating the minimum requirements for Pillow.
-                resampling_filter = self._Image.Resampling.LANCZOS
-            except AttributeError:
-                resampling_filter = self._Image.ANTIALIAS
-            image.thumbnail(size, resampling_filter)
-        # Webp 로 변환
-        buf = BytesIO()
-        image.save(buf, format="webp")
-        return image, buf
-
-    def get_images(self, response, request, info, *, item=None):
-        path = self.file_path(request, response=response, info=info, item=item)
-        # Convert format to webp
-        path = Path(path).with_suffix(".webp")
-        orig_image = self._Image.open(BytesIO(response.body))
-
-        width, height = orig_image.size
-        if width < self.min_width or height < self.min_height:
-            # 작은 이미지 리사이징을 하지 않는다.
-            pass
-            # orig_image = orig_image.resize(
-            #     (max(width, self.min_width), max(height, self.min_height)),
-            #     reducing_gap=3.0,
-            # )
-            # self.logger.warning(
-            #     f"Image too small "
-            #     f"({width}x{height} < "
-            #     f"{self.min_width}x{self.min_height}), "
-            #     f"resized to ({orig_image.width}x{orig_image.height})"
-            # )
-        # webp maximum image size check
-        max_width, max_height = 16383, 16383
-        if orig_image.width > max_width or orig_image.height > max_height:
-            orig_image = orig_image.resize(
-                (min(orig_image.width, max_width), min(orig_image.height, max_height)),
-                reducing_gap=3.0,
-            )
-            self.logger.warning(
-                f"Image too large "
-                f"({width}x{height} > "
-                f"{max_width}x{max_height}), "
-                f"resized to ({orig_image.width}x{orig_image.height})"
-            )
-        if self._deprecated_convert_image is None:
-            self._deprecated_convert_image = "response_body" not in get_func_args(
-                self.convert_image
-            )
-            if self._deprecated_convert_image:
-                warnings.warn(
-                    f"{self.__class__.__name__}.convert_image() method overridden in a deprecated way, "
-                    "overridden method does not accept response_body argument.",
-                    category=ScrapyDeprecationWarning,
+    def media_downloaded(self, response, request, info, *, item=None):
+        """
+        :return: Deferred - 변환이 끝나면 결과(url, path, checksum, status, width, height)
+        """
+        entry: ManifestEntry = request.meta.get("manifest")
+        if entry is not None:
+            if response.status == 304:
+                return self.__reuse(entry, request, info, "not_modified", entry.size)
+            if (
+                response.status == 200
+                and hashlib.md5(response.body).hexdigest() == entry.checksum
+            ):
+                # 조건부 요청을 지원하지 않는 서버
+                self.__record(entry, response)
+                return self.__reuse(entry, request, info, "unchanged", 0)
+
+        result = super().media_downloaded(response, request, info, item=item)
+        # image_downloaded 가 반환한 Deferred
+        d: defer.Deferred = result["checksum"]
+
+        def completed(transcoded: TranscodeResult) -> dict:
+            image = transcoded.images[0]
+            if self.manifest is not None:
+                self.__inc_manifest_stats(info.spider, "misses", 1)
+                self.__record(
+                    ManifestEntry(
+                        url=request.url,
+                        checksum=hashlib.md5(response.body).hexdigest(),
+                        path=result["path"],
+                        width=image.width,
+                        height=image.height,
+                        size=len(response.body),
+                        cpu_seconds=transcoded.cpu_seconds,
+                    ),
+                    response,
                 )
+            return {
+                **result,
+                "checksum": transcoded.checksum,
+                "width": image.width,
+                "height": image.height,
+            }
 
-        if self._deprecated_convert_image:
-            image, buf = self.convert_image(orig_image)
-        else:
-            image, buf = self.convert_image(
-                orig_image, response_body=BytesIO(response.body)
+        def failed(failure):
+            self.logger.warning(
+                f"Image (error): Error processing image from {request}: {failure.value!r}"
             )
-        yield path, image, buf
+            raise ImageException(str(failure.value))
 
-        for thumb_id, size in self.thumbs.items():
-            thumb_path = self.thumb_path(
-                request, thumb_id, response=response, info=info, item=item
+        return d.addCallbacks(completed, failed)
+
+    def __reuse(
+        self, entry: ManifestEntry, request, info, status: str, bytes_saved: int
+    ) -> dict:
+        """
+        :param bytes_saved: 다운로드하지 않은 bytes
+        :return: manifest 에 기록한 결과(Pillow 를 사용하지 않는다)
+        """
+        self.__inc_manifest_stats(info.spider, "hits", 1)
+        self.__inc_manifest_stats(info.spider, status, 1)
+        self.__inc_manifest_stats(info.spider, "bytes_saved", bytes_saved)
+        self.__inc_manifest_stats(info.spider, "cpu_seconds_saved", entry.cpu_seconds)
+        return {
+            "url": request.url,
+            "path": entry.path,
+            "checksum": entry.checksum,
+            "status": status,
+            "width": entry.width,
+            "height": entry.height,
+        }
+
+    def __record(self, entry: ManifestEntry, response):
+        """
+        S3 에 저장한 이미지만 기록한다(test 에서는 저장하지 않는다)
+        """
+        if self.manifest is None or self.stage == "test":
+            return
+        entry.etag = response.headers.get("ETag", b"").decode() or None
+        entry.last_modified = (
+            response.headers.get("Last-Modified", b"").decode() or None
+        )
+        self.manifest.put(entry)
+
+    @staticmethod
+    def __inc_manifest_stats(spider, key: str, count):
+        if count:
+            spider.crawler.stats.inc_value(
+                f"image_manifest/{key}", count, spider=spider
             )
-            # Convert format to webp
-            thumb_path = Path(thumb_path).with_suffix(".webp")
-            if self._deprecated_convert_image:
-                thumb_image, thumb_buf = self.convert_image(image, size)
-            else:
-                thumb_image, thumb_buf = self.convert_image(image, size, buf)
-            yield thumb_path, thumb_image, thumb_buf
 
     def image_downloaded(self, response, request, info, *, item=None):
-        checksum = None
-        for path, image, buf in self.get_images(response, request, info, item=item):
-            if checksum is None:
-                buf.seek(0)
-                checksum = md5sum(buf)
-            width, height = image.size
-
-            # Image Size 저장
-            url_path = Path(request.url)
-            if item.image.thumb and url_path == Path(item.image.thumb):
-                item.image.size["thumb"] = {"width": width, "height": height}
-            else:
-                # 같은 우선순위끼리는 FIFO로 저장되므로, 순서가 보장됨
-                if "others" not in item.image.size:
-                    item.image.size["others"] = []
-                item.image.size["others"].append(
-                    {
-                        "width": width,
-                        "height": height,
-                    }
-                )
-            if self.stage != "test":
-                self.store.persist_file(
-                    path,
-                    buf,
-                    info,
-                    meta={"width": width, "height": height},
-                    # Webp Type 으로 저장
-                    headers={"Content-Type": "image/webp"},
+        """
+        :return: Deferred - 변환한 이미지를 저장하면 TranscodeResult
+        """
+        path = Path(self.file_path(request, response=response, info=info, item=item))
+        thumbs = {thumb_id: size for thumb_id, size in self.thumbs.items()}
+        try:
+            size = read_size(response.body, self.max_pixels)
+        except ImageRejected as e:
+            info.spider.crawler.stats.inc_value(
+                "image_budget/rejected", spider=info.spider
+            )
+            raise ImageException(str(e))
+        d = self.budget.run(
+            decoded_bytes(size, response.body),
+            self.transcoder.submit,
+            transcode,
+            response.body,
+            thumbs,
+        )
+
+        def persist(transcoded: TranscodeResult) -> TranscodeResult:
+            width, height = transcoded.original_size
+            if width > MAX_WEBP_SIZE[0] or height > MAX_WEBP_SIZE[1]:
+                self.logger.warning(
+                    f"Image too large ({width}x{height} > {MAX_WEBP_SIZE[0]}x{MAX_WEBP_SIZE[1]}), "
+                    f"resized to ({transcoded.images[0].width}x{transcoded.images[0].height})"
                 )
-            else:
-                self.logger.debug("Test mode - Image not saved")
-        return checksum
+            for image in transcoded.images:
+                if image.thumb_id is None:
+                    image_path = path
+                else:
+                    image_path = Path(
+                        self.thumb_path(
+                            request,
+                            image.thumb_id,
+                            response=response,
+                            info=info,
+                            item=item,
+                        )
+                    )
+                if self.stage != "test":
+                    self.store.persist_file(
+                        # Convert format to webp
+                        str(image_path.with_suffix(".webp")),
+                        BytesIO(image.data),
+                        info,
+                        meta={"width": image.width, "height": image.height},
+                        # Webp Type 으로 저장
+                        headers={"Content-Type": "image/webp"},
+                    )
+                else:
+                    self.logger.debug("Test mode - Image not saved")
+            return transcoded
+
+        return d.addCallback(persist)
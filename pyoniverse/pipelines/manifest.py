@@ -0,0 +1,147 @@
+import logging
+import sqlite3
+import time
+from dataclasses import astuple, dataclass, fields
+from pathlib import Path
+from typing import Dict, Optional
+
+from twisted.internet import defer, threads
+
+
+@dataclass(kw_only=True)
+class ManifestEntry:
+    url: str  # 원본 이미지 url
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None  # Last-Modified 헤더(그대로 If-Modified-Since 로 보낸다)
+    checksum: str  # 원본 이미지의 md5
+    path: str  # S3 에 저장한 경로(file_path)
+    width: int  # 저장한 webp 크기
+    height: int
+    size: int  # 원본 이미지 bytes
+    cpu_seconds: float  # 변환에 사용한 CPU 시간
+    updated_at: float = 0  # S3 에 저장한 시간(다시 저장하기 전까지 바꾸지 않는다)
+
+
+class ImageManifest:
+    """
+    이미 변환해서 S3 에 저장한 이미지를 원본 url 로 기록하는 SQLite 파일.
+    여러 spider(process)가 동시에 사용하므로 WAL 로 열고, write lock 을 오래 잡지 않는다.
+    - put 은 메모리에 모으고, flush 가 reactor 밖(thread)에서 짧은 transaction 하나로 기록한다
+    - 기록하지 못하면(database is locked) 다음 flush 에서 다시 기록한다. manifest 오류로 이미지가 실패하지 않는다
+    - S3 에 저장한 지 max_age 초가 지난 기록은 사용하지 않는다(S3 에서 삭제됐을 수 있다). 0 이면 계속 사용한다
+    get/put/flush 는 reactor thread 에서 호출한다.
+    """
+
+    columns = tuple(f.name for f in fields(ManifestEntry))
+    logger = logging.getLogger("scrapy.manifest")
+
+    def __init__(self, path: Path, timeout: float = 30, max_age: float = 0):
+        self.path = path
+        self.timeout = timeout
+        self.max_age = max_age
+        self.__conn: sqlite3.Connection = None
+        self.__pending: Dict[str, ManifestEntry] = {}
+        self.__writing: Dict[str, ManifestEntry] = {}  # flush 중인 기록
+        self.__flushing: Optional[defer.Deferred] = None
+
+    def open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.__conn = sqlite3.connect(self.path, timeout=self.timeout)
+        self.__conn.execute("PRAGMA journal_mode=WAL")
+        self.__conn.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, checksum TEXT NOT NULL, "
+            "path TEXT NOT NULL, width INTEGER NOT NULL, height INTEGER NOT NULL, "
+            "size INTEGER NOT NULL, cpu_seconds REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.__conn.commit()
+
+    @defer.inlineCallbacks
+    def close(self):
+        """
+        진행 중인 flush 가 끝나기를 기다린 뒤(실패한 기록은 pending 으로 돌아온다) 남은 기록을 쓰고 닫는다
+        """
+        if self.__flushing is not None:
+            yield self.__flushing
+        if self.__pending:
+            batch, self.__pending = self.__pending, {}
+            try:
+                self.__write(batch)
+            except sqlite3.Error as e:
+                self.logger.warning(
+                    f"Failed to write {len(batch)} manifest entries: {e!r}"
+                )
+        if self.__conn is not None:
+            self.__conn.close()
+            self.__conn = None
+
+    def get(self, url: str) -> Optional[ManifestEntry]:
+        entry = self.__pending.get(url) or self.__writing.get(url)
+        if entry is None:
+            try:
+                row = self.__conn.execute(
+                    f"SELECT {', '.join(self.columns)} FROM images WHERE url = ?",
+                    (url,),
+                ).fetchone()
+            except sqlite3.Error as e:
+                self.logger.warning(f"Failed to read manifest entry {url}: {e!r}")
+                return None
+            if row is None:
+                return None
+            entry = ManifestEntry(**dict(zip(self.columns, row)))
+        if self.max_age > 0 and time.time() - entry.updated_at > self.max_age:
+            return None
+        return entry
+
+    def put(self, entry: ManifestEntry):
+        """
+        처음 기록하는 이미지만 저장한 시간을 남긴다(원본이 같아서 재사용한 이미지는 그대로 둔다)
+        """
+        entry.updated_at = entry.updated_at or time.time()
+        self.__pending[entry.url] = entry
+
+    @property
+    def pending(self) -> int:
+        return len(self.__pending)
+
+    def flush(self) -> defer.Deferred:
+        """
+        모은 기록을 thread 에서 쓴다. 이미 flush 중이면 아무것도 하지 않는다
+        """
+        if self.__flushing is not None or not self.__pending:
+            return defer.succeed(None)
+        from twisted.internet import reactor
+
+        batch, self.__pending = self.__pending, {}
+        self.__writing = batch
+
+        def failed(failure):
+            failure.trap(sqlite3.Error)
+            self.logger.warning(
+                f"Failed to write {len(batch)} manifest entries: {failure.value!r}"
+            )
+            # 그 사이에 다시 기록한 url 은 새 값을 사용한다
+            self.__pending = {**batch, **self.__pending}
+
+        def done(_):
+            self.__writing = {}
+            self.__flushing = None
+
+        self.__flushing = threads.deferToThreadPool(
+            reactor, reactor.getThreadPool(), self.__write, batch
+        )
+        self.__flushing.addErrback(failed).addBoth(done)
+        return self.__flushing
+
+    def __write(self, batch: Dict[str, ManifestEntry]):
+        # thread 마다 connection 을 따로 사용한다
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            with conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO images ({', '.join(self.columns)}) "
+                    f"VALUES ({', '.join('?' * len(self.columns))})",
+                    [astuple(entry) for entry in batch.values()],
+                )
+        finally:
+            conn.close()
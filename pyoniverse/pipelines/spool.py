@@ -0,0 +1,388 @@
+import gzip
+import json
+import logging
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from overrides import override
+from pymongo import UpdateOne
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+from scrapy import Spider
+from scrapy.exceptions import NotConfigured
+from scrapy.statscollectors import StatsCollector
+from twisted.internet import task
+
+from pyoniverse.items import ItemType
+from pyoniverse.pipelines import BasePipeline
+from pyoniverse.pipelines.db import MongoDBPipeline
+
+
+# 기록 중인 segment 와 다 쓴 segment. SpoolLoader 는 다 쓴 segment 만 읽는다
+# segment 이름은 만든 시각(ns)이므로 이름 순서가 기록 순서이다
+OPEN_SUFFIX = ".open"
+SEALED_SUFFIX = ".ndjson.gz"
+
+
+def encode_record(record: dict) -> bytes:
+    """
+    한 줄에 하나의 record: "<crc32> <json>\\n"
+    """
+    payload = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def decode_record(line: bytes) -> Optional[dict]:
+    """
+    :return: checksum 이 맞지 않거나 잘린 줄이면 None
+    """
+    checksum, _, payload = line.rstrip(b"\n").partition(b" ")
+    if not line.endswith(b"\n") or checksum != b"%08x" % zlib.crc32(payload):
+        return None
+    return json.loads(payload)
+
+
+def read_segment(path: Path, start: int = 0) -> Iterator[Tuple[int, Optional[dict]]]:
+    """
+    :param start: 건너뛸 record 수
+    :return: (record 번호, record). 손상된 record 는 None
+    비정상 종료로 잘린 segment 는 읽을 수 있는 곳까지 읽는다.
+    """
+    with gzip.open(path, "rb") as f:
+        try:
+            for index, line in enumerate(f):
+                if index >= start:
+                    yield index, decode_record(line)
+        except (EOFError, zlib.error, gzip.BadGzipFile):
+            logging.getLogger("scrapy.spool").warning(f"Truncated segment: {path}")
+
+
+class SpoolWriter:
+    """
+    디렉터리에 gzip 으로 압축한 segment 를 순서대로 기록한다.
+    segment_records 개를 기록하면 다음 segment 로 넘어가고, fsync_records 개마다 디스크에 기록한다(sync).
+    """
+
+    def __init__(
+        self, path: Path, segment_records: int = 50000, fsync_records: int = 1000
+    ):
+        self.path = path
+        self.segment_records = segment_records
+        self.fsync_records = fsync_records
+        self.records = 0
+        self.bytes = 0
+        self.fsyncs = 0
+        self.sealed: List[Path] = []
+        self.__raw = None
+        self.__file: gzip.GzipFile = None
+        self.__segment_count = 0
+        self.__unsynced = 0
+
+    def open(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        # 비정상 종료로 남은 segment 는 잘린 곳까지 읽을 수 있으므로 그대로 넘긴다
+        for segment in sorted(self.path.glob(f"*{OPEN_SUFFIX}")):
+            self.__seal(segment)
+
+    def append(self, record: dict) -> int:
+        """
+        :return: 기록한 bytes(압축 전)
+        """
+        if self.__file is None:
+            self.__next_segment()
+        line = encode_record(record)
+        self.__file.write(line)
+        self.records += 1
+        self.bytes += len(line)
+        self.__segment_count += 1
+        self.__unsynced += 1
+        if self.__segment_count >= self.segment_records:
+            self.__close_segment()
+        elif self.__unsynced >= self.fsync_records:
+            self.sync()
+        return len(line)
+
+    def sync(self):
+        """
+        기록한 record 를 압축 stream 에서 내보내고 fsync 한다
+        """
+        if self.__file is None or not self.__unsynced:
+            return
+        self.__file.flush(zlib.Z_SYNC_FLUSH)
+        os.fsync(self.__raw.fileno())
+        self.fsyncs += 1
+        self.__unsynced = 0
+
+    def close(self):
+        if self.__file is not None:
+            self.__close_segment()
+
+    def __next_segment(self):
+        self.__raw = open(self.path / f"{time.time_ns():020d}{OPEN_SUFFIX}", "wb")
+        self.__file = gzip.GzipFile(fileobj=self.__raw, mode="wb", compresslevel=6)
+        self.__segment_count = 0
+
+    def __close_segment(self):
+        self.__file.close()
+        self.__raw.flush()
+        os.fsync(self.__raw.fileno())
+        self.fsyncs += 1
+        self.__raw.close()
+        self.sealed.append(self.__seal(Path(self.__raw.name)))
+        self.__file = self.__raw = None
+        self.__unsynced = 0
+
+    def __seal(self, segment: Path) -> Path:
+        sealed = segment.with_name(segment.name.replace(OPEN_SUFFIX, SEALED_SUFFIX))
+        segment.rename(sealed)
+        # rename 도 디스크에 기록한다
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return sealed
+
+
+class SpoolPipeline(BasePipeline):
+    """
+    MongoDB 대신 로컬 spool(SPOOL_DIR/<spider>/)에 아이템을 기록한다. SPOOL_ENABLED 일 때만 사용한다.
+    DB 가 느리거나 연결되지 않아도 크롤링은 멈추지 않고, load_spool.py(SpoolLoader)로 나중에 저장한다.
+    SPOOL_FSYNC_RECORDS 개마다 또는 SPOOL_FSYNC_INTERVAL 초마다 fsync 한다.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("SPOOL_ENABLED"):
+            raise NotConfigured("SPOOL_ENABLED is False")
+        return cls(
+            spool_dir=crawler.settings.get("SPOOL_DIR", "spool"),
+            stage=crawler.settings.get("STAGE"),
+            segment_records=crawler.settings.getint("SPOOL_SEGMENT_RECORDS", 50000),
+            fsync_records=crawler.settings.getint("SPOOL_FSYNC_RECORDS", 1000),
+            fsync_interval=crawler.settings.getfloat("SPOOL_FSYNC_INTERVAL", 1),
+            stats=crawler.stats,
+        )
+
+    def __init__(
+        self,
+        spool_dir: str,
+        stage: str,
+        segment_records: int = 50000,
+        fsync_records: int = 1000,
+        fsync_interval: float = 1,
+        stats: StatsCollector = None,
+    ):
+        self.spool_dir = Path(spool_dir)
+        self.stage = stage
+        self.segment_records = segment_records
+        self.fsync_records = fsync_records
+        self.fsync_interval = fsync_interval
+        self.stats = stats
+        self.writer: SpoolWriter = None
+        self.__syncer: task.LoopingCall = None
+
+    def open_spider(self, spider: Spider):
+        if self.stage == "test":
+            return
+        self.writer = SpoolWriter(
+            self.spool_dir / spider.name,
+            segment_records=self.segment_records,
+            fsync_records=self.fsync_records,
+        )
+        self.writer.open()
+        self.__syncer = task.LoopingCall(self.writer.sync)
+        self.__syncer.start(self.fsync_interval, now=False)
+
+    def close_spider(self, spider: Spider):
+        if self.writer is None:
+            return
+        if self.__syncer and self.__syncer.running:
+            self.__syncer.stop()
+        self.writer.close()
+        compressed = sum(segment.stat().st_size for segment in self.writer.sealed)
+        spider.logger.info(
+            f"Spooled {self.writer.records} items({self.writer.bytes} bytes, "
+            f"{compressed} bytes compressed) to {self.writer.path}"
+        )
+        self._set_stats(spider, "segments", len(self.writer.sealed))
+        self._set_stats(spider, "compressed_bytes", compressed)
+        self._set_stats(spider, "fsyncs", self.writer.fsyncs)
+
+    @override
+    def process_item(self, item: ItemType, spider: Spider) -> ItemType:
+        """
+        :param item: Item to be processed
+        :param spider: Current Spider
+        :return: Processed Item
+        """
+        if self.stage == "test":
+            # Development mode - Don't save item
+            return item
+        doc = {
+            **item.to_document(),
+            "content_hash": item.get_content_hash(),
+            "last_seen_at": item.updated_at,
+        }
+        size = self.writer.append(
+            {"collection": item.get_collection_name(), "document": doc}
+        )
+        self._inc_stats(spider, "records", 1)
+        self._inc_stats(spider, "bytes", size)
+        return item
+
+    def _inc_stats(self, spider: Spider, key: str, count: int):
+        if self.stats is not None and count:
+            self.stats.inc_value(f"spool/{key}", count, spider=spider)
+
+    def _set_stats(self, spider: Spider, key: str, value):
+        if self.stats is not None:
+            self.stats.set_value(f"spool/{key}", value, spider=spider)
+
+
+class SpoolLoader:
+    """
+    spool 에 기록된 아이템을 MongoDB 에 저장한다.
+    - MongoDBPipeline 의 update pipeline(MONGO_SERVER_MERGE)으로 저장하므로 같은 record 를 다시 저장해도 결과가 같다
+    - 같은 아이템은 같은 lane 에서 순서대로 저장하고, lane 들은 병렬로 bulk_write 한다(workers)
+    - chunk(workers * batch_size 개)를 모두 저장할 때마다 offset 을 기록하고, 다시 실행하면 offset 부터 저장한다
+    - 모두 저장한 segment 는 지운다
+    """
+
+    offset_file = "offset.json"
+    logger = logging.getLogger("scrapy.spool")
+
+    def __init__(
+        self,
+        db: Database,
+        workers: int = 4,
+        batch_size: int = 500,
+        collection_suffix: str = "",
+    ):
+        self.db = db
+        self.workers = workers
+        self.batch_size = batch_size
+        self.collection_suffix = collection_suffix
+
+    def load(self, spool_dir: Path, spiders: List[str] = None) -> Dict[str, dict]:
+        """
+        :param spiders: None 이면 spool_dir 의 모든 spider
+        :return: {spider: {records, new, updated, unchanged, error, corrupt}}
+        """
+        paths = sorted(p for p in Path(spool_dir).iterdir() if p.is_dir())
+        if spiders is not None:
+            paths = [p for p in paths if p.name in spiders]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return {path.name: self.load_spider(path, executor) for path in paths}
+
+    def load_spider(self, path: Path, executor: ThreadPoolExecutor) -> dict:
+        counts = dict.fromkeys(
+            ["records", "new", "updated", "unchanged", "error", "corrupt"], 0
+        )
+        offset = self.__read_offset(path)
+        for segment in sorted(path.glob(f"*{SEALED_SUFFIX}")):
+            if offset and segment.name < offset["segment"]:
+                # offset 을 기록한 뒤 지우지 못한 segment
+                segment.unlink()
+                continue
+            start = (
+                offset["record"] if offset and segment.name == offset["segment"] else 0
+            )
+            if start:
+                self.logger.info(f"Resume {segment} from record {start}")
+            chunk: List[dict] = []
+            index = start - 1
+            for index, record in read_segment(segment, start):
+                if record is None:
+                    self.logger.error(f"Corrupted record: {segment}#{index}")
+                    counts["corrupt"] += 1
+                else:
+                    chunk.append(record)
+                if len(chunk) >= self.workers * self.batch_size:
+                    self.__load_chunk(chunk, executor, counts)
+                    self.__write_offset(path, segment.name, index + 1)
+                    chunk = []
+            self.__load_chunk(chunk, executor, counts)
+            self.__write_offset(path, segment.name, index + 1)
+            segment.unlink()
+        self.logger.info(f"Loaded {path.name}: {counts}")
+        return counts
+
+    def __load_chunk(
+        self, chunk: List[dict], executor: ThreadPoolExecutor, counts: dict
+    ):
+        lanes: List[List[dict]] = [[] for _ in range(self.workers)]
+        for record in chunk:
+            crawled_info = record["document"]["crawled_info"]
+            key = f"{crawled_info['spider']}/{crawled_info['id']}".encode()
+            lanes[zlib.crc32(key) % self.workers].append(record)
+        # 실패하면(연결 오류 등) 예외가 전달되고 offset 은 기록되지 않는다
+        for result in executor.map(self.__load_lane, lanes):
+            for key, count in result.items():
+                counts[key] += count
+        counts["records"] += len(chunk)
+
+    def __load_lane(self, records: List[dict]) -> dict:
+        counts = dict.fromkeys(["new", "updated", "unchanged", "error"], 0)
+        for i in range(0, len(records), self.batch_size):
+            batches: Dict[str, List[UpdateOne]] = {}
+            for record in records[i : i + self.batch_size]:
+                coll, doc = record["collection"], record["document"]
+                query = {
+                    "crawled_info.spider": doc["crawled_info"]["spider"],
+                    "crawled_info.id": doc["crawled_info"]["id"],
+                }
+                batches.setdefault(coll, []).append(
+                    UpdateOne(
+                        query,
+                        MongoDBPipeline._merge_pipeline(coll, doc),
+                        upsert=True,
+                        hint=MongoDBPipeline.hint,
+                    )
+                )
+            for coll, ops in batches.items():
+                result = self.__bulk_write(coll, ops)
+                for error in result.get("writeErrors", []):
+                    self.logger.error(
+                        f"Failed to load item: {error.get('op', {}).get('q')} "
+                        f"{error.get('errmsg')}"
+                    )
+                counts["new"] += result.get("nUpserted", 0)
+                counts["updated"] += result.get("nModified", 0)
+                counts["unchanged"] += result.get("nMatched", 0) - result.get(
+                    "nModified", 0
+                )
+                counts["error"] += len(result.get("writeErrors", []))
+        return counts
+
+    def __bulk_write(self, coll: str, ops: List[UpdateOne]) -> dict:
+        try:
+            return (
+                self.db.get_collection(coll + self.collection_suffix)
+                .bulk_write(ops, ordered=False)
+                .bulk_api_result
+            )
+        except BulkWriteError as e:
+            # 실패하지 않은 작업은 저장된다
+            return e.details
+
+    def __read_offset(self, path: Path) -> Optional[dict]:
+        offset = path / self.offset_file
+        if not offset.exists():
+            return None
+        return json.loads(offset.read_text())
+
+    def __write_offset(self, path: Path, segment: str, record: int):
+        """
+        :param record: segment 에서 저장을 마친 record 수
+        """
+        tmp = path / f"{self.offset_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"segment": segment, "record": record}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path / self.offset_file)
@@ -0,0 +1,224 @@
+import hashlib
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+from twisted.internet import defer
+
+
+# webp 의 최대 크기
+MAX_WEBP_SIZE = (16383, 16383)
+
+
+@dataclass(kw_only=True)
+class TranscodedImage:
+    thumb_id: Optional[str] = None  # None 이면 원본
+    width: int
+    height: int
+    data: bytes
+
+
+@dataclass(kw_only=True)
+class TranscodeResult:
+    original_size: Tuple[int, int]
+    checksum: str  # 원본 webp 의 md5
+    images: List[TranscodedImage]
+    cpu_seconds: float = 0  # 변환에 사용한 CPU 시간(worker thread)
+
+
+def to_rgb(image: Image.Image) -> Image.Image:
+    """
+    투명한 부분은 흰색으로 채운다
+    """
+    if image.format in ("PNG", "WEBP") and image.mode == "RGBA":
+        background = Image.new("RGBA", image.size, (255, 255, 255))
+        background.paste(image, image)
+        image = background.convert("RGB")
+    elif image.mode == "P":
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255))
+        background.paste(image, image)
+        image = background.convert("RGB")
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+def fit(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    Image.thumbnail 과 같은 크기(비율 유지, 확대하지 않는다)
+    """
+    width, height = size
+    x, y = box
+    if width <= x and height <= y:
+        return size
+    aspect = width / height
+
+    def round_aspect(number: float, key: Callable[[int], float]) -> int:
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    if x / y >= aspect:
+        x = round_aspect(y * aspect, key=lambda n: abs(aspect - n / y))
+    else:
+        y = round_aspect(x / aspect, key=lambda n: 0 if n == 0 else abs(aspect - x / n))
+    return x, y
+
+
+def thumbnail(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """
+    원본을 복사하지 않고 새 이미지를 만든다. reducing_gap 이면 먼저 Image.reduce(정수배 축소)로 줄인 뒤 LANCZOS 를 적용한다
+    """
+    target = fit(image.size, size)
+    if target == image.size:
+        return image
+    return image.resize(target, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+
+def pyramid(
+    image: Image.Image, thumbs: Dict[str, Tuple[int, int]]
+) -> Dict[str, Image.Image]:
+    """
+    큰 thumb 부터 만들고, 작은 thumb 는 바로 앞에서 만든 thumb 를 줄여서 만든다(cascade)
+    """
+    result = {}
+    previous = image
+    for thumb_id, size in sorted(
+        thumbs.items(), key=lambda thumb: fit(image.size, thumb[1]), reverse=True
+    ):
+        target = fit(image.size, size)
+        # 앞의 thumb 가 더 작으면(비율이 다른 box) 원본에서 만든다
+        source = (
+            previous
+            if previous.width >= target[0] and previous.height >= target[1]
+            else image
+        )
+        if source.size == target:
+            result[thumb_id] = source
+        else:
+            result[thumb_id] = source.resize(
+                target, Image.Resampling.LANCZOS, reducing_gap=2.0
+            )
+        previous = result[thumb_id]
+    return {thumb_id: result[thumb_id] for thumb_id in thumbs}
+
+
+def to_webp(image: Image.Image) -> BytesIO:
+    buf = BytesIO()
+    image.save(buf, format="webp")
+    return buf
+
+
+def transcode(body: bytes, thumbs: Dict[str, Tuple[int, int]]) -> TranscodeResult:
+    """
+    이미지를 webp 로 변환한다(원본 + thumbs). process pool 에서 실행되므로 인자와 결과는 pickle 할 수 있어야 한다.
+    원본은 한 번만 decode 하고, thumbs 는 pyramid 로 만든다.
+    """
+    start = time.thread_time()
+    # BytesIO 는 bytes 를 복사하지 않는다
+    image = Image.open(BytesIO(body))
+    original_size = image.size
+    if image.width > MAX_WEBP_SIZE[0] or image.height > MAX_WEBP_SIZE[1]:
+        target = (
+            min(image.width, MAX_WEBP_SIZE[0]),
+            min(image.height, MAX_WEBP_SIZE[1]),
+        )
+        # JPEG 는 decode 할 때 1/2, 1/4, 1/8 로 줄일 수 있다(target 보다 작아지지 않는다)
+        image.draft("RGB", target)
+        image = image.resize(target, reducing_gap=3.0)
+    image = to_rgb(image)
+    data = to_webp(image).getvalue()
+    images = [TranscodedImage(width=image.width, height=image.height, data=data)]
+    for thumb_id, thumb in pyramid(image, thumbs).items():
+        images.append(
+            TranscodedImage(
+                thumb_id=thumb_id,
+                width=thumb.width,
+                height=thumb.height,
+                data=to_webp(thumb).getvalue(),
+            )
+        )
+    return TranscodeResult(
+        original_size=original_size,
+        checksum=hashlib.md5(data).hexdigest(),
+        images=images,
+        cpu_seconds=time.thread_time() - start,
+    )
+
+
+class Transcoder:
+    """
+    이미지 변환을 reactor thread 밖에서 실행하고 결과를 Deferred 로 돌려준다.
+    - thread: thread pool. Pillow 는 decode/encode/resize 중 GIL 을 놓는다
+    - process: process pool(fork). GIL 과 관계없이 CPU 를 모두 사용한다. worker 는 처음 변환할 때 만든다
+    - inline: reactor thread 에서 바로 실행한다(이전 동작)
+    pool 은 process 에 mode 마다 하나만 만들고 같은 process 의 spider(InProcessRunner)가 같이 사용한다.
+    workers 가 0 이면 CPU 수를 동시에 실행하는 spider process 수(parallel)로 나눈다.
+    """
+
+    modes = ("thread", "process", "inline")
+    # {mode: (executor, 사용 중인 Transcoder 수)}
+    __pools: Dict[str, Tuple[Executor, int]] = {}
+
+    def __init__(self, mode: str = "thread", workers: int = 0, parallel: int = 1):
+        if mode not in self.modes:
+            raise ValueError(f"Unknown transcode mode: {mode!r}")
+        self.mode = mode
+        self.workers = workers or max(1, (os.cpu_count() or 1) // max(1, parallel))
+        self.__executor: Executor = None
+
+    def start(self):
+        if self.mode == "inline" or self.__executor is not None:
+            return
+        executor, users = self.__pools.get(self.mode, (None, 0))
+        if executor is None:
+            if self.mode == "process":
+                # spawn, forkserver 는 main.py 를 다시 실행하므로 fork 를 사용한다
+                executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("fork"),
+                )
+            else:
+                executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="transcode"
+                )
+        self.__pools[self.mode] = (executor, users + 1)
+        self.__executor = executor
+
+    def stop(self):
+        """
+        마지막으로 사용하던 Transcoder 가 pool 을 닫는다. 끝나기를 기다리지 않는다(reactor 를 멈추지 않는다)
+        """
+        if self.__executor is None:
+            return
+        executor, users = self.__pools[self.mode]
+        if users <= 1:
+            del self.__pools[self.mode]
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            self.__pools[self.mode] = (executor, users - 1)
+        self.__executor = None
+
+    def submit(self, func: Callable, *args) -> defer.Deferred:
+        if self.__executor is None:
+            return defer.maybeDeferred(func, *args)
+        from twisted.internet import reactor
+
+        d = defer.Deferred()
+
+        def done(future: Future):
+            # executor 의 thread 에서 호출되므로 reactor thread 에서 Deferred 를 실행한다
+            if future.cancelled():
+                reactor.callFromThread(d.cancel)
+            elif (error := future.exception()) is not None:
+                reactor.callFromThread(d.errback, error)
+            else:
+                reactor.callFromThread(d.callback, future.result())
+
+        self.__executor.submit(func, *args).add_done_callback(done)
+        return d
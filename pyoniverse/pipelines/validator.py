@@ -1,5 +1,8 @@
-from dataclasses import asdict
+import math
+from dataclasses import is_dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
 
+from marshmallow import Schema, ValidationError, fields
 from scrapy import Spider
 from scrapy.exceptions import DropItem
 
@@ -7,11 +10,127 @@ from pyoniverse.items import ItemType, ItemVO
 from pyoniverse.pipelines import BasePipeline
 
 
+Check = Callable[[Any], bool]
+
+
+class FastValidator:
+    """
+    marshmallow schema 로 dataclass 를 직접 검사하는 함수를 만든다(asdict 없이).
+    marshmallow 가 통과시키는 값만 통과시키고, 판단할 수 없으면 False 를 반환한다.
+    False 면 marshmallow 로 다시 검사해야 한다(실패 사유는 marshmallow 가 만든다).
+    """
+
+    def __init__(self, schema: Schema):
+        self.check: Check = self.compile_schema(schema)
+
+    def __call__(self, value: Any) -> bool:
+        return self.check(value)
+
+    @classmethod
+    def compile_schema(cls, schema: Schema) -> Check:
+        checks: Dict[str, Check] = {
+            name: cls.compile_field(field) for name, field in schema.fields.items()
+        }
+        required = {name for name, field in schema.fields.items() if field.required}
+        # dataclass type 마다 검사할 필드를 한 번만 정한다. None 이면 marshmallow 로 검사해야 한다
+        plans: Dict[type, Optional[List[Tuple[str, Check]]]] = {}
+
+        def plan(keys: Iterable[str]) -> Optional[List[Tuple[str, Check]]]:
+            # 모르는 필드가 있거나 필수 필드가 없으면 marshmallow 가 실패 사유를 만든다
+            keys = set(keys)
+            if not keys <= checks.keys() or not required <= keys:
+                return None
+            return [(name, c) for name, c in checks.items() if name in keys]
+
+        def check(value) -> bool:
+            if isinstance(value, dict):
+                fields_ = plan(value.keys())
+                return fields_ is not None and all(
+                    c(value[name]) for name, c in fields_
+                )
+            if not is_dataclass(value) or isinstance(value, type):
+                return False
+            if (fields_ := plans.get(type(value), False)) is False:
+                fields_ = plans[type(value)] = plan(value.__dataclass_fields__)
+            return fields_ is not None and all(
+                c(getattr(value, name)) for name, c in fields_
+            )
+
+        return check
+
+    @classmethod
+    def compile_field(cls, field: fields.Field) -> Check:
+        check = cls.__compile_type(field)
+        for validator in field.validators:
+            # marshmallow 의 validator(정규식은 이미 compile 되어 있다)를 그대로 사용한다
+            check = cls.__with_validator(check, validator)
+        if field.allow_none:
+            return lambda value: value is None or check(value)
+        return lambda value: value is not None and check(value)
+
+    @classmethod
+    def __compile_type(cls, field: fields.Field) -> Check:
+        # 하위 class(URL 은 String)부터 확인한다
+        if isinstance(field, fields.Nested):
+            nested = cls.compile_schema(field.schema)
+            if field.many:
+                return lambda value: type(value) is list and all(map(nested, value))
+            return nested
+        if isinstance(field, fields.List):
+            inner = cls.compile_field(field.inner)
+            return lambda value: type(value) is list and all(map(inner, value))
+        if isinstance(field, fields.String):
+            return lambda value: type(value) is str
+        if isinstance(field, fields.Integer):
+            return lambda value: type(value) is int
+        if isinstance(field, fields.Float):
+            if field.allow_nan:
+                return lambda value: type(value) in (int, float)
+            return lambda value: type(value) in (int, float) and math.isfinite(value)
+        # 지원하지 않는 필드는 항상 marshmallow 로 검사한다
+        return lambda value: False
+
+    @staticmethod
+    def __with_validator(check: Check, validator: Callable) -> Check:
+        def validate(value) -> bool:
+            if not check(value):
+                return False
+            try:
+                validator(value)
+            except ValidationError:
+                return False
+            return True
+
+        return validate
+
+
 class ValidationPipeline(BasePipeline):
     """
     This pipeline is responsible for validating the data
+    schema 는 item class 마다 한 번만 만든다.
+    VALIDATION_FAST_PATH 이면 FastValidator 로 먼저 검사하고, 통과하지 못한 아이템만 marshmallow 로 검사한다.
     """
 
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(fast_path=crawler.settings.getbool("VALIDATION_FAST_PATH", True))
+
+    def __init__(self, fast_path: bool = True):
+        self.fast_path = fast_path
+        self.__schemas: Dict[Type[ItemVO], Schema] = {}
+        self.__validators: Dict[Type[ItemVO], FastValidator] = {}
+
+    def get_schema(self, item: ItemType) -> Schema:
+        if (schema := self.__schemas.get(type(item))) is None:
+            schema = self.__schemas[type(item)] = item.get_schema()
+        return schema
+
+    def get_validator(self, item: ItemType) -> FastValidator:
+        if (validator := self.__validators.get(type(item))) is None:
+            validator = FastValidator(self.get_schema(item))
+            self.__validators[type(item)] = validator
+        return validator
+
     def process_item(self, item: ItemType, spider: Spider) -> ItemType:
         """
         :param item:
@@ -26,8 +145,9 @@ class ValidationPipeline(BasePipeline):
         if not hasattr(item, "get_collection_name"):
             raise DropItem(f"Item is not has collection name: {item}")
         # Condition 3: Drop if the item is missing or invalid fields
-        schema = item.get_schema()
-        reason: dict = schema.validate(asdict(item))
+        if self.fast_path and self.get_validator(item)(item):
+            return item
+        reason: dict = self.get_schema(item).validate(item.to_document())
         if reason:
             raise DropItem(f"Item is not valid: {reason}")
         return item
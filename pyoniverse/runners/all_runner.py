@@ -1,34 +1,126 @@
 import asyncio
-from asyncio.subprocess import Process
-from pathlib import Path
-from typing import Any, Coroutine, List, NoReturn, Sequence
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 from overrides import override
 
+from pyoniverse.out.model.log_result import LogResult
+from pyoniverse.out.model.run_result import RunResult
+from pyoniverse.parser.log_parser.log_parser import LogParser
 from pyoniverse.runners.runner import Runner
 
 
 class AllRunner(Runner):
+    """
+    Spider 별로 프로세스를 실행한다.
+    - workers: 동시에 실행할 spider 수(None 이면 모두 동시에 실행)
+    - timeout: spider 별 제한 시간(초). 넘으면 SIGTERM, grace_sec 후에도 살아있으면 SIGKILL
+    """
+
+    grace_sec: float = 60
+    # 동시에 실행하는 spider 프로세스 수(이미지 변환 pool 크기를 나눈다)
+    parallel: int = 1
+
     @classmethod
     @override
-    def run(cls, *args, **kwargs):
-        spider_dir = Path("pyoniverse/spiders")
-        sub_runners: List[Coroutine[Any, Any, Process]] = []
-        for spider in spider_dir.glob("*.py"):
-            if not spider.name.startswith("__"):
-                name = spider.with_suffix("").stem
-                cls.logger.info(f"Run {name}")
-                sub_runners.append(
-                    asyncio.create_subprocess_exec(
-                        "python", "main.py", f"--stage={kwargs['stage']}", name
-                    )
-                )
-        asyncio.run(cls._collect(sub_runners))
+    def run(cls, *args, **kwargs) -> List[RunResult]:
+        spiders = cls._order(
+            cls._list_spiders(kwargs.get("spiders")), LogParser().parse()
+        )
+        workers = kwargs.get("workers") or len(spiders)
+        cls.parallel = max(1, min(workers, len(spiders)))
+        return asyncio.run(
+            cls._collect(
+                spiders,
+                workers=workers,
+                timeout=kwargs.get("timeout"),
+                stage=kwargs["stage"],
+            )
+        )
+
+    @classmethod
+    def _order(cls, spiders: List[str], history: Dict[str, LogResult]) -> List[str]:
+        """
+        이전 실행에서 오래 걸린 spider 부터 실행한다. 이전 기록이 없는 spider 는 가장 먼저 실행한다.
+        """
+        return sorted(
+            spiders,
+            key=lambda name: -history[name].elapsed_sec
+            if name in history
+            else float("-inf"),
+        )
+
+    @classmethod
+    def _launch(cls, name: str, **kwargs) -> int:
+        """
+        :return: spider 를 실행한 프로세스의 pid
+        """
+        return os.posix_spawnp(
+            "python",
+            ["python", "main.py", f"--stage={kwargs['stage']}", name],
+            {**os.environ, "IMAGES_TRANSCODE_PARALLEL_SPIDERS": str(cls.parallel)},
+        )
 
     @classmethod
     async def _collect(
-        cls, sub_runners: List[Coroutine[Any, Any, Process]]
-    ) -> NoReturn:
-        subprocesses: Sequence[Process] = await asyncio.gather(*sub_runners)
-        for subprocess in subprocesses:
-            await subprocess.wait()
+        cls, spiders: List[str], workers: int, timeout: Optional[float], **kwargs
+    ) -> List[RunResult]:
+        semaphore = asyncio.Semaphore(workers)
+        # os.wait4 는 blocking 이므로 worker 수만큼 thread 를 사용한다
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return await asyncio.gather(
+                *(
+                    cls._run_spider(name, semaphore, executor, timeout, **kwargs)
+                    for name in spiders
+                )
+            )
+
+    @classmethod
+    async def _run_spider(
+        cls,
+        name: str,
+        semaphore: asyncio.Semaphore,
+        executor: ThreadPoolExecutor,
+        timeout: Optional[float],
+        **kwargs,
+    ) -> RunResult:
+        async with semaphore:
+            cls.logger.info(f"Run {name}")
+            loop = asyncio.get_running_loop()
+            start = time.monotonic()
+            pid = cls._launch(name, **kwargs)
+            waiter = loop.run_in_executor(executor, os.wait4, pid, 0)
+
+            timed_out = False
+            try:
+                _, status, usage = await asyncio.wait_for(
+                    asyncio.shield(waiter), timeout
+                )
+            except asyncio.TimeoutError:
+                timed_out = True
+                cls.logger.error(f"{name} exceeded {timeout} sec. Terminate")
+                os.kill(pid, signal.SIGTERM)
+                try:
+                    _, status, usage = await asyncio.wait_for(
+                        asyncio.shield(waiter), cls.grace_sec
+                    )
+                except asyncio.TimeoutError:
+                    cls.logger.error(f"{name} is still alive. Kill")
+                    os.kill(pid, signal.SIGKILL)
+                    _, status, usage = await waiter
+
+            # ru_maxrss: Linux 는 KB, macOS 는 bytes
+            max_rss = usage.ru_maxrss
+            if sys.platform != "darwin":
+                max_rss *= 1024
+            return RunResult(
+                spider=name,
+                exit_code=os.waitstatus_to_exitcode(status),
+                elapsed_sec=time.monotonic() - start,
+                max_rss=max_rss,
+                timed_out=timed_out,
+            )
@@ -0,0 +1,80 @@
+import importlib
+import logging
+import os
+import sys
+import traceback
+from typing import List
+
+from overrides import override
+from scrapy.crawler import CrawlerProcess
+from scrapy.settings import Settings
+from scrapy.spiderloader import SpiderLoader
+
+from pyoniverse.out.model.run_result import RunResult
+from pyoniverse.runners.all_runner import AllRunner
+
+
+class ForkRunner(AllRunner):
+    """
+    무거운 모듈과 project settings 를 부모 프로세스에서 한 번만 로드한 뒤, spider 마다 fork 한다.
+    자식 프로세스는 main.py 를 다시 실행하지 않는다.
+    동시 실행 수, 제한 시간, 실행 순서는 AllRunner 와 같다.
+    """
+
+    # fork 전에 twisted.internet.reactor 를 설치하는 모듈(ex. scrapy.extensions.telnet)은 넣으면 안된다
+    preload_modules: List[str] = [
+        "scrapy.crawler",
+        "scrapy.core.engine",
+        "scrapy.core.downloader.handlers.http11",
+        "scrapy.pipelines.images",
+        "boto3",
+        "botocore.session",
+        "PIL.Image",
+        "pymongo",
+        "marshmallow",
+        "bs4",
+        "lxml.html",
+        "pyoniverse.items.product",
+        "pyoniverse.items.event",
+        "pyoniverse.pipelines.image",
+        "pyoniverse.pipelines.validator",
+        "pyoniverse.pipelines.db",
+        "pyoniverse.middlewares.random_ua",
+        "pyoniverse.middlewares.retry_ua",
+    ]
+    settings: Settings = None
+
+    @classmethod
+    @override
+    def run(cls, *args, **kwargs) -> List[RunResult]:
+        for module in cls.preload_modules:
+            importlib.import_module(module)
+        cls.settings = cls._prepare(*args, **kwargs)
+        # spider 모듈도 미리 import 한다
+        SpiderLoader.from_settings(cls.settings.frozencopy())
+        if "twisted.internet.reactor" in sys.modules:
+            raise RuntimeError("Reactor must not be installed before fork")
+        return super().run(*args, **kwargs)
+
+    @classmethod
+    @override
+    def _launch(cls, name: str, **kwargs) -> int:
+        pid = os.fork()
+        if pid != 0:
+            return pid
+
+        # Child process
+        code = 1
+        try:
+            settings = cls.settings.copy()
+            settings["IMAGES_TRANSCODE_PARALLEL_SPIDERS"] = cls.parallel
+            process: CrawlerProcess = CrawlerProcess(settings)
+            crawler = process.create_crawler(name)
+            process.crawl(crawler)
+            process.start()
+            code = 0 if cls._finished(crawler) else 1
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            logging.shutdown()
+            os._exit(code)
@@ -0,0 +1,133 @@
+import logging
+from typing import List, Optional
+
+from overrides import override
+from scrapy import Spider, signals
+from scrapy.crawler import Crawler, CrawlerProcess
+from scrapy.settings import Settings
+from scrapy.utils.log import LogCounterHandler
+
+from pyoniverse.out.model.run_result import RunResult
+from pyoniverse.runners.runner import Runner
+
+
+class SpiderLogFilter(logging.Filter):
+    """
+    spider 이름이 일치하는 로그만 통과시킨다.
+    하나의 프로세스에서 여러 spider 가 실행될 때, spider 별 LOG_FILE 을 분리하기 위해 사용한다.
+    """
+
+    def __init__(self, spider: str):
+        super().__init__()
+        self.spider = spider
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        spider = getattr(record, "spider", None)
+        return getattr(spider, "name", None) == self.spider
+
+
+class RequestBudget:
+    """
+    하나의 Reactor 에서 실행되는 Crawler 들이 CONCURRENT_REQUESTS 를 나눠 쓴다.
+    Spider 가 종료되면 남은 Crawler 들에게 다시 분배한다.
+    """
+
+    def __init__(self, total: int):
+        self.total = total
+        self.crawlers: List[Crawler] = []
+
+    def add(self, crawler: Crawler):
+        self.crawlers.append(crawler)
+        crawler.signals.connect(self.release, signal=signals.spider_closed)
+
+    def release(self, spider: Spider, **kwargs):
+        self.crawlers = [c for c in self.crawlers if c.spider is not spider]
+        self.rebalance()
+
+    def rebalance(self):
+        running = [c for c in self.crawlers if c.engine is not None]
+        if not running:
+            return
+        share = max(1, self.total // len(running))
+        for crawler in running:
+            # Spider 에 설정된 CONCURRENT_REQUESTS 보다 크게 할당하지 않는다
+            limit = crawler.settings.getint("CONCURRENT_REQUESTS")
+            crawler.engine.downloader.total_concurrency = min(share, limit)
+
+
+class InProcessRunner(Runner):
+    """
+    모든 Spider 를 하나의 프로세스, 하나의 Reactor 에서 실행한다.
+    """
+
+    @classmethod
+    @override
+    def run(cls, *args, **kwargs) -> List[RunResult]:
+        # Scrapy root handler 는 Crawler 가 생성될 때마다 spider 의 LOG_FILE 로 교체되므로 사용하지 않는다
+        settings = cls._prepare(*args, install_root_handler=False, **kwargs)
+        logging.root.setLevel(logging.NOTSET)
+        handlers: List[logging.Handler] = [cls._attach_log_file(settings)]
+
+        process: CrawlerProcess = CrawlerProcess(settings, install_root_handler=False)
+        budget = RequestBudget(settings.getint("GLOBAL_CONCURRENT_REQUESTS"))
+        crawlers: List[Crawler] = []
+        for name in cls._list_spiders(kwargs.get("spiders")):
+            cls.logger.info(f"Run {name}")
+            crawler = process.create_crawler(name)
+            handlers.append(cls._attach_log_file(crawler.settings, name))
+            # log_count/* 통계도 해당 spider 의 로그만 센다
+            for counter in logging.root.handlers:
+                if (
+                    isinstance(counter, LogCounterHandler)
+                    and counter.crawler is crawler
+                ):
+                    counter.addFilter(SpiderLogFilter(name))
+            process.crawl(crawler)
+            budget.add(crawler)
+            crawlers.append(crawler)
+        budget.rebalance()
+
+        try:
+            process.start()
+        finally:
+            for handler in handlers:
+                logging.root.removeHandler(handler)
+                handler.close()
+        return [cls._result(crawler) for crawler in crawlers]
+
+    @classmethod
+    def _result(cls, crawler: Crawler) -> RunResult:
+        """
+        max_rss 는 모든 spider 가 공유하는 프로세스의 최대 RSS 이다
+        """
+        stats = crawler.stats.get_stats()
+        return RunResult(
+            spider=crawler.spidercls.name,
+            exit_code=0 if cls._finished(crawler) else 1,
+            elapsed_sec=stats.get("elapsed_time_seconds", 0),
+            max_rss=stats.get("memusage/max"),
+        )
+
+    @classmethod
+    def _attach_log_file(
+        cls, settings: Settings, spider: Optional[str] = None
+    ) -> logging.Handler:
+        """
+        LOG_FILE 에 로그를 기록한다. spider 가 주어지면 해당 spider 의 로그만 기록한다.
+        LogParser 가 spider 별 로그 파일을 읽기 때문에 필요하다.
+        """
+        handler = logging.FileHandler(
+            settings["LOG_FILE"],
+            mode="a" if settings.getbool("LOG_FILE_APPEND") else "w",
+            encoding=settings["LOG_ENCODING"],
+        )
+        handler.setFormatter(
+            logging.Formatter(
+                fmt=settings.get("LOG_FORMAT"), datefmt=settings.get("LOG_DATEFORMAT")
+            )
+        )
+        handler.setLevel(settings.get("LOG_LEVEL"))
+        if spider:
+            handler.addFilter(SpiderLogFilter(spider))
+        logging.root.addHandler(handler)
+        return handler
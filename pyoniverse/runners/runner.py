@@ -1,10 +1,13 @@
 import logging
 import os
 from abc import ABCMeta, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Optional
 
-from scrapy.settings import Settings
-from scrapy.utils.log import configure_logging
-from scrapy.utils.project import get_project_settings
+
+if TYPE_CHECKING:
+    from scrapy.crawler import Crawler
+    from scrapy.settings import Settings
 
 
 class Runner(metaclass=ABCMeta):
@@ -16,15 +19,61 @@ class Runner(metaclass=ABCMeta):
         pass
 
     @classmethod
-    def _prepare(cls, *args, **kwargs) -> Settings:
+    def _prepare(cls, *args, **kwargs) -> "Settings":
+        # subprocess 모드의 부모 프로세스는 scrapy 를 로드하지 않는다
+        from scrapy.utils.log import configure_logging
+        from scrapy.utils.project import get_project_settings
+
         settings = get_project_settings()
         settings["LOG_LEVEL"] = kwargs.get("loglevel", "DEBUG")
         settings["LOG_FILE"] = "debug.json"  # default log file
         settings["STAGE"] = kwargs["stage"]
         settings["MONGO_URI"] = os.getenv("MONGO_URI")
         settings["MONGO_DB"] = os.getenv("MONGO_DB")
-        configure_logging(settings)
+        # --clear_db 로 실행하면 Engine 이 만든 staging collection 에 저장한다
+        settings["MONGO_COLLECTION_SUFFIX"] = os.getenv("MONGO_COLLECTION_SUFFIX", "")
+        # main.py 의 --clear_db 확인과 같은 규칙(1, true 만 True. 대소문자 무시)
+        if (spool_enabled := os.getenv("SPOOL_ENABLED")) is not None:
+            settings["SPOOL_ENABLED"] = spool_enabled.lower() in {"1", "true"}
+        # AllRunner 가 동시에 실행하는 spider 프로세스 수
+        settings["IMAGES_TRANSCODE_PARALLEL_SPIDERS"] = int(
+            os.getenv(
+                "IMAGES_TRANSCODE_PARALLEL_SPIDERS",
+                settings["IMAGES_TRANSCODE_PARALLEL_SPIDERS"],
+            )
+        )
+        configure_logging(
+            settings, install_root_handler=kwargs.get("install_root_handler", True)
+        )
         cls.logger.info(
             f"Stage: {settings['STAGE']}, Log Level: {settings['LOG_LEVEL']}"
         )
         return settings
+
+    @classmethod
+    def _finished(cls, crawler: "Crawler") -> bool:
+        """
+        spider 가 정상 종료했는지 확인한다(finish_reason == "finished").
+        실행 전에 실패하면 finish_reason 이 없다
+        """
+        return crawler.stats.get_value("finish_reason") == "finished"
+
+    @classmethod
+    def _list_spiders(cls, spiders: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        :param spiders: 실행할 spider 이름. None 이면 pyoniverse/spiders 의 모든 spider
+        :return: spider 이름 목록
+        """
+        spider_dir = Path("pyoniverse/spiders")
+        names = []
+        for spider in sorted(spider_dir.glob("*.py")):
+            if not spider.name.startswith("__"):
+                names.append(spider.with_suffix("").stem)
+        if spiders is None:
+            return names
+
+        spiders = [s.strip() for s in spiders if s.strip()]
+        unknown = set(spiders) - set(names)
+        if unknown:
+            raise ValueError(f"Unknown spiders: {sorted(unknown)}")
+        return spiders
@@ -7,8 +7,13 @@ from pyoniverse.runners.runner import Runner
 class SingleRunner(Runner):
     @classmethod
     @override
-    def run(cls, *args, **kwargs):
+    def run(cls, *args, **kwargs) -> bool:
+        """
+        :return: spider 가 정상 종료했는지 여부
+        """
         settings = cls._prepare(*args, **kwargs)
         runner: CrawlerProcess = CrawlerProcess(settings)
-        runner.crawl(kwargs["spider"])
+        crawler = runner.create_crawler(kwargs["spider"])
+        runner.crawl(crawler)
         runner.start()
+        return cls._finished(crawler)
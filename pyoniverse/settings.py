@@ -22,6 +22,8 @@ ROBOTSTXT_OBEY = False
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
 CONCURRENT_REQUESTS = 128
+# inprocess 모드에서 모든 spider 가 나눠 쓰는 요청 수
+GLOBAL_CONCURRENT_REQUESTS = 128
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
@@ -69,24 +71,66 @@ DOWNLOADER_MIDDLEWARES = {
     "scrapy.downloadermiddlewares.useragent.UserAgentMiddleware": None,
     "pyoniverse.middlewares.random_ua.RandomUserAgentMiddleware": 400,
     "pyoniverse.middlewares.retry_ua.RetryRandomUserAgentMiddleware": 401,
+    "pyoniverse.middlewares.backoff.BackoffMiddleware": 450,
     "scrapy.downloadermiddlewares.retry.RetryMiddleware": None,
 }
 USER_AGENT_TYPE = "desktop"  # mobile, desktop
+# meta["backoff"] 요청(403 후 재시도)을 기다리는 시간: BACKOFF_BASE * 2^(연속 실패 - 1), 최대 BACKOFF_MAX, ±BACKOFF_JITTER
+BACKOFF_BASE = 5
+BACKOFF_MAX = 60
+BACKOFF_JITTER = 0.5
+BACKOFF_RETRY_BUDGET = 30  # 도메인마다 재시도할 수 있는 횟수
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
 # EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
 # }
+EXTENSIONS = {
+    # ADAPTIVE_CONCURRENCY_ENABLED 일 때만 동작
+    "pyoniverse.extensions.concurrency.AdaptiveConcurrency": 510,
+}
+# 도메인마다 동시 요청 수를 1 ~ CONCURRENT_REQUESTS_PER_DOMAIN 에서 조정한다(pyoniverse/extensions/concurrency.py)
+ADAPTIVE_CONCURRENCY_ENABLED = True
+ADAPTIVE_CONCURRENCY_STATE = "state/concurrency.json"  # 학습한 값. 다음 실행의 시작 값
+ADAPTIVE_CONCURRENCY_MIN = 1
+ADAPTIVE_CONCURRENCY_WINDOW = 20  # 이 수의 응답마다 조정한다
+ADAPTIVE_CONCURRENCY_TARGET_LATENCY = 1.0  # sec
+
+# 목록 page 를 PAGINATION_WINDOW 개씩 미리 요청한다(지난 실행의 page 수 + 1 로 시작, 최대 PAGINATION_MAX_WINDOW)
+PAGINATION_STATE = "state/pagination.json"
+PAGINATION_WINDOW = 4
+PAGINATION_MAX_WINDOW = 32
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
     "pyoniverse.pipelines.image.S3ImagePipeline": 100,  # Image Pipeline 에서 추가되는 값이 있기 때문에 Validation 전에 실행
     "pyoniverse.pipelines.validator.ValidationPipeline": 200,
-    "pyoniverse.pipelines.db.MongoDBPipeline": 300,
+    "pyoniverse.pipelines.db.MongoDBPipeline": 300,  # reactor 를 막지 않으려면 AsyncMongoDBPipeline
+    "pyoniverse.pipelines.spool.SpoolPipeline": 300,  # SPOOL_ENABLED 이면 MongoDBPipeline 대신 사용
 }
 
+VALIDATION_FAST_PATH = True  # ValidationPipeline 에서 marshmallow 전에 dataclass 를 직접 검사
+
+# MongoDB
+MONGO_BULK_SIZE = 500  # bulk_write 로 한 번에 저장할 쓰기 작업 수(1 이하면 아이템마다 저장)
+MONGO_BULK_INTERVAL = 5  # 쌓인 쓰기 작업을 저장하는 주기(초)
+MONGO_MAX_IN_FLIGHT = 4  # AsyncMongoDBPipeline 에서 동시에 실행할 bulk_write 수
+MONGO_SERVER_MERGE = True  # 이전 아이템과 합치는 작업을 DB 에서 실행(MongoDB 4.2 미만이면 False)
+MONGO_TOUCH_UNCHANGED = (
+    True  # content hash 가 같은 아이템은 last_seen_at 만 수정(False 면 저장하지 않음)
+)
+MONGO_PRELOAD_LIMIT = 200000  # 이전 아이템을 미리 읽어둘 최대 문서 수(넘으면 아이템마다 조회)
+MONGO_ENSURE_INDEXES = True  # 시작할 때 hint 에 필요한 index 를 만들고 사용하는지 확인
+
+# Spool - MongoDB 대신 로컬 파일에 저장하고 load_spool.py 로 MongoDB 에 저장한다
+SPOOL_ENABLED = False  # 환경 변수 SPOOL_ENABLED 로 변경
+SPOOL_DIR = "spool"  # SPOOL_DIR/<spider>/ 에 segment 를 기록
+SPOOL_SEGMENT_RECORDS = 50000  # segment 하나에 기록할 아이템 수
+SPOOL_FSYNC_RECORDS = 1000  # fsync 주기(아이템 수)
+SPOOL_FSYNC_INTERVAL = 1  # fsync 주기(초)
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 # AUTOTHROTTLE_ENABLED = True
@@ -131,3 +175,20 @@ IMAGES_STORE = os.getenv("IMAGES_STORE")  # bucket, prefix = IMAGE_STORE[5:].spl
 IMAGES_MIN_HEIGHT = 360
 IMAGES_MIN_WIDTH = 360
 IMAGES_EXPIRES = 0  # 15일 후에 이미지 삭제
+IMAGES_TRANSCODE_POOL = (
+    "thread"  # webp 변환을 실행할 곳(thread | process | inline). process 마다 pool 하나를 같이 사용한다
+)
+IMAGES_TRANSCODE_WORKERS = 0  # 0 이면 CPU 수 // IMAGES_TRANSCODE_PARALLEL_SPIDERS
+IMAGES_TRANSCODE_PARALLEL_SPIDERS = (
+    1  # 동시에 실행하는 spider 프로세스 수(AllRunner, ForkRunner 가 설정한다)
+)
+IMAGES_MANIFEST = "manifest/images.sqlite3"  # 저장한 이미지 기록(원본 url). None 이면 사용하지 않는다
+IMAGES_MANIFEST_REVALIDATE = True  # False 면 기록한 이미지는 다운로드하지 않는다
+IMAGES_MANIFEST_MAX_AGE = 14  # 일. S3 에서 15일 후에 삭제되므로 그 전에 다시 변환해서 저장한다. 0 이면 계속 사용한다
+IMAGES_MANIFEST_FLUSH_INTERVAL = (
+    5  # sec. 모은 기록을 짧은 transaction 으로 쓰는 주기(write lock 을 오래 잡지 않는다)
+)
+IMAGES_MAX_PIXELS = (
+    89478485  # 이보다 크면 변환하지 않는다(decompression bomb). Pillow 의 MAX_IMAGE_PIXELS
+)
+IMAGES_MEMORY_BUDGET = 512 * 1024**2  # 동시에 변환하는 이미지의 메모리(RGBA 기준 bytes)
@@ -9,6 +9,7 @@ from scrapy.http import HtmlResponse
 from pyoniverse.items import CrawledInfoVO, EventVO, ImageVO, PriceVO
 from pyoniverse.items.product import ProductVO
 from pyoniverse.items.utils import convert_brand, convert_currency, convert_event
+from pyoniverse.pagination.links import LinkPaginator, PageLinks
 
 
 class CspaceWebSpider(Spider):
@@ -33,7 +34,15 @@ class CspaceWebSpider(Spider):
         "twoPlus": "2+1",
     }
 
+    # pager 의 page 번호 중 가장 큰 page 까지 한 번에 요청한다
+    pagination = PageLinks(
+        pager=".pagination.pc a",
+        next_link=".pagination.pc li:has(> a.active) + li > a",
+    )
+    paginator: LinkPaginator = None
+
     def start_requests(self):
+        self.paginator = LinkPaginator(self.pagination)
         yield Request(url=self.base_url, callback=self.enter, dont_filter=True)
 
     def enter(self, response: HtmlResponse) -> Request:
@@ -42,22 +51,13 @@ class CspaceWebSpider(Spider):
         )
 
     def parse_list(self, response: HtmlResponse) -> Request:
+        yield from self.paginator.follow(response, self.parse_list)
         soup = BeautifulSoup(response.text, "html.parser")
 
         items = soup.select("ul.box > li")
         for item in items:
             yield from self.parse_product(item, response.url)
 
-        pagination = soup.select_one(".pagination.pc")
-        cur_page = pagination.select_one("a.active").parent  # li tag
-        if next_page := cur_page.find_next_sibling("li"):
-            if next_page.select_one("a")["href"] != "#void":
-                self.logger.info(f"Next page: {next_page.select_one('a')['href']}")
-                yield Request(
-                    url=self.base_url + next_page.select_one("a")["href"],
-                    callback=self.parse_list,
-                )
-
     def parse_product(self, item: Tag, url: str) -> Request:
         events = item["class"]
         try:
@@ -1,5 +1,5 @@
 import re
-from time import sleep
+from typing import List
 
 from bs4 import BeautifulSoup
 from scrapy import FormRequest, Request, Spider
@@ -11,6 +11,7 @@ from twisted.python.failure import Failure
 from pyoniverse.items import CrawledInfoVO, EventVO, ImageVO, ItemType, PriceVO
 from pyoniverse.items.product import ProductVO
 from pyoniverse.items.utils import convert_brand, convert_currency, convert_event
+from pyoniverse.pagination.speculative import SpeculativePaginator
 
 
 class CUWebSpider(Spider):
@@ -70,40 +71,81 @@ class CUWebSpider(Spider):
         "cu": "CUG",
     }
 
+    paginator: SpeculativePaginator = None
+
     def start_requests(self) -> Request:
+        # 목록마다 여러 page 를 동시에 요청한다
+        self.paginator = SpeculativePaginator.from_settings(self.settings)
         # Get cookies
         yield Request(
             url=self.base_url, callback=self.__start_request, errback=self.errback
         )
 
+    def closed(self, reason: str):
+        # start_requests 전에 종료되면 paginator 가 없다
+        if self.paginator is not None:
+            self.paginator.close(self)
+
     def __start_request(self, response: HtmlResponse, **kwargs) -> Request:
+        # 403 후 cookie 를 다시 받았으면 실패한 요청만 다시 보낸다
+        if "key" in kwargs:
+            yield from self.__list_requests(
+                [int(kwargs["params"]["pageIndex"])], **kwargs
+            )
+            return
+        if "crawl_id" in kwargs:
+            yield self.__detail_request(**kwargs)
+            return
         # base list
         for category in self.list_category.values():
             params = self.list_params.copy()
-            params["pageIndex"] = "1"
             params["searchMainCategory"] = category
             params["codeParent"] = category
-            yield FormRequest(
+            key = f"{self.name}/list/{category}"
+            yield from self.__list_requests(
+                self.paginator.start(key),
+                key=key,
                 url=self.list_base_url,
-                formdata=params,
-                callback=self.parse_list,
-                cb_kwargs={"params": params},
-                errback=self.errback,
+                params=params,
             )
         # pb list
         for category in self.pb_list_category.values():
             params = self.pb_params.copy()
-            params["pageIndex"] = "1"
             params["searchgubun"] = category
-            yield FormRequest(
+            key = f"{self.name}/pb/{category}"
+            yield from self.__list_requests(
+                self.paginator.start(key),
+                key=key,
                 url=self.pb_list_base_url,
+                params=params,
+                event="MONOPOLY",
+            )
+
+    def __list_requests(self, pages: List[int], **kwargs) -> Request:
+        for page in pages:
+            params = {**kwargs["params"], "pageIndex": str(page)}
+            yield FormRequest(
+                url=kwargs["url"],
                 formdata=params,
                 callback=self.parse_list,
-                cb_kwargs={"params": params, "event": "MONOPOLY"},
+                cb_kwargs={**kwargs, "params": params},
                 errback=self.errback,
             )
 
+    def __detail_request(self, **kwargs) -> Request:
+        return Request(
+            url=self.detail_base_url.format(gdIdx=kwargs["crawl_id"]),
+            callback=self.parse,
+            cb_kwargs={"crawl_id": kwargs["crawl_id"], "event": kwargs["event"]},
+            dont_filter=True,
+            errback=self.errback,
+        )
+
     def parse_list(self, response: HtmlResponse, **kwargs) -> Request:
+        key, page = kwargs["key"], int(kwargs["params"]["pageIndex"])
+        if self.paginator.is_past_end(key, page):
+            # 빈 page 뒤의 page 는 무시한다
+            return
         soup = BeautifulSoup(response.text, "html.parser")
 
         # id 추출
@@ -125,26 +167,17 @@ class CUWebSpider(Spider):
             self.logger.error(
                 f"Failed to parse crawl ID: {response.url}\n{response.request.body}"
             )
+            yield from self.__list_requests(self.paginator.failed(key, page), **kwargs)
             raise DropItem("Crawl ID doesn't exist")
 
         for crawl_id in crawl_ids:
-            yield Request(
-                url=self.detail_base_url.format(gdIdx=crawl_id),
-                callback=self.parse,
-                cb_kwargs={"crawl_id": crawl_id, "event": kwargs.get("event", None)},
-                dont_filter=True,
-                errback=self.errback,
-            )
-        if crawl_ids:
-            # 현재 페이지에 상품이 있다면 다음 페이지로 이동. 현재 페이지에 상품이 없으면 마지막 페이지에 도달한 것이므로 종료
-            kwargs["params"]["pageIndex"] = str(int(kwargs["params"]["pageIndex"]) + 1)
-            yield FormRequest(
-                url=response.url,
-                callback=self.parse_list,
-                formdata=kwargs["params"],
-                cb_kwargs=kwargs,
-                errback=self.errback,
+            yield self.__detail_request(
+                crawl_id=crawl_id, event=kwargs.get("event", None)
             )
+        # 현재 페이지에 상품이 없으면 마지막 페이지에 도달한 것이므로 더 요청하지 않는다
+        yield from self.__list_requests(
+            self.paginator.done(key, page, not crawl_ids), **kwargs
+        )
 
     def parse(self, response: HtmlResponse, **kwargs) -> ItemType:
         tags = []
@@ -240,13 +273,23 @@ class CUWebSpider(Spider):
         if failure.check(HttpError) and failure.value.response.status == 403:
             req: Request = failure.value.response.request.copy()
             req.dont_filter = True
-            self.logger.error("403 Forbidden: {}. Retry after 5 sec".format(req.url))
-            sleep(5)
+            self.logger.error("403 Forbidden: {}. Retry with backoff".format(req.url))
             yield Request(
                 self.base_url,
                 callback=self.__start_request,
                 cb_kwargs=req.cb_kwargs,
                 dont_filter=True,
+                meta={"backoff": True},
+                errback=self.errback,
             )
         else:
             self.logger.error(repr(failure))
+            kwargs = failure.request.cb_kwargs
+            if "key" in kwargs:
+                # 실패한 목록 page 는 건너뛰고 다음 page 를 요청한다
+                yield from self.__list_requests(
+                    self.paginator.failed(
+                        kwargs["key"], int(kwargs["params"]["pageIndex"])
+                    ),
+                    **kwargs,
+                )
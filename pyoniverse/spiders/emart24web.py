@@ -14,6 +14,7 @@ from pyoniverse.items.utils import (
     convert_currency,
     convert_event,
 )
+from pyoniverse.pagination.links import LinkPaginator, PageLinks
 
 
 class Emart24WebSpider(Spider):
@@ -57,8 +58,12 @@ class Emart24WebSpider(Spider):
         "즉석식": {"category_seq": "41", "category": "FOOD"},
     }
     pagination_url = base_url + "{list_path}?search=&category_seq={category_seq}&align="
+    # 다음(마지막) 페이지 버튼의 page 번호까지 한 번에 요청한다
+    pagination = PageLinks(pager=".nextButtons a", next_link=".nextButtons > .next > a")
+    paginator: LinkPaginator = None
 
     def start_requests(self):
+        self.paginator = LinkPaginator(self.pagination)
         yield Request(url=self.base_url, callback=self.enter_main)
 
     def enter_main(self, response):
@@ -85,6 +90,7 @@ class Emart24WebSpider(Spider):
                     )
 
     def parse_list(self, response: HtmlResponse, **kwargs) -> Request:
+        yield from self.paginator.follow(response, self.parse_list, kwargs)
         soup = BeautifulSoup(response.text, "html.parser")
         items = soup.select("div.itemWrap")
         kwargs["url"] = response.url
@@ -102,14 +108,6 @@ class Emart24WebSpider(Spider):
             case _:
                 raise ValueError(f"Unknown list: {kwargs['list']!r}")
 
-        next_page = soup.select_one(".nextButtons > .next > a")
-        if next_page:
-            yield Request(
-                url=self.base_url + next_page["href"],
-                callback=self.parse_list,
-                cb_kwargs=kwargs,
-            )
-
     def parse_item(self, item: Tag, **kwargs) -> ItemType:
         tags = item.select(".itemTit > span")
         events = []
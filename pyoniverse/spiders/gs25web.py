@@ -1,6 +1,5 @@
 import json
 from pathlib import Path
-from time import sleep
 
 from bs4 import BeautifulSoup
 from scrapy import Request, Spider
@@ -51,6 +50,9 @@ class Gs25WebSpider(Spider):
         "X-Requested-With": "XMLHttpRequest",
     }
 
+    # Token 이 계속 거절되면(점검 페이지, 바뀐 endpoint) 이 횟수만큼 다시 받은 뒤 포기합니다
+    max_rebootstrap = 3
+
     def start_requests(self):
         for key, url in self.start_urls.items():
             if key == "event":
@@ -77,50 +79,18 @@ class Gs25WebSpider(Spider):
         - 1+1
         - 2+1
         - 덤증정
+        CSRF Token 을 받아서 kwargs["page"] 를 요청합니다. 나머지 page 는 1 page 의 응답에서 같은 Token 으로 요청합니다.
         """
-        soup = BeautifulSoup(response.body, "html.parser")
-        form = soup.select_one("#CSRFForm")
-        if not form:
-            raise RuntimeError("Can't find event post action")
-
-        csrf_token = form.select_one("input")["value"]
-        req_url = self.search_urls["event"]
-        query = "CSRFToken={}".format(csrf_token)
-
-        form_data = {
-            "pageNum": str(kwargs["page"]),
-            "pageSize": "8",
-            "searchType": "",
-            "searchWord": "",
-            "parameterList": "TOTAL",
-        }
-
-        header = self.headers.copy()
-        yield FormRequest(
-            url=f"{req_url}?{query}",
-            callback=self.parse_event,
-            errback=self.errback,
-            formdata=form_data,
-            cb_kwargs=kwargs,
-            headers=header,
-            dont_filter=True,
-        )
+        yield self.__event_page_request(self.__csrf_token(response), kwargs)
 
     def parse_youus_home(self, response: HtmlResponse, **kwargs) -> ItemType:
         """
         유어스 상품 목록을 가져옵니다.
         - Fresh Food
         - PB 상품
+        CSRF Token 을 받아서 kwargs["page"] 를 요청합니다. 나머지 page 는 1 page 의 응답에서 같은 Token 으로 요청합니다.
         """
-        soup = BeautifulSoup(response.body, "html.parser")
-        form = soup.select_one("#CSRFForm")
-        if not form:
-            raise RuntimeError("Can't find event post action")
-
-        csrf_token = form.select_one("input")["value"]
-        req_url = self.search_urls["youus"]
-        query = "CSRFToken={}".format(csrf_token)
-
+        csrf_token = self.__csrf_token(response)
         if "srv_food_ck" not in kwargs:
             search_food_ck_map = {
                 "FreshFoodKey": [
@@ -140,60 +110,129 @@ class Gs25WebSpider(Spider):
 
             for srv_food_ck, search_product_list in search_food_ck_map.items():
                 for search_product in search_product_list:
-                    form_data = {
-                        "pageNum": str(kwargs["page"]),
-                        "pageSize": "16",
-                        "searchWord": "",
-                        "searchHPrice": "",
-                        "searchTPrice": "",
-                        "searchSrvFoodCK": srv_food_ck,
-                        "searchSort": "searchALLSort",
-                        "searchProduct": search_product,
-                    }
-
-                    header = self.headers.copy()
-                    kwargs.update(
-                        {"srv_food_ck": srv_food_ck, "search_product": search_product}
-                    )
-                    yield FormRequest(
-                        url=f"{req_url}?{query}",
-                        callback=self.parse_youus,
-                        errback=self.errback,
-                        formdata=form_data,
-                        cb_kwargs=kwargs,
-                        headers=header,
-                        dont_filter=True,
+                    # 요청마다 cb_kwargs 를 따로 만듭니다(같은 dict 를 공유하면 마지막 값으로 덮어씁니다)
+                    yield self.__youus_page_request(
+                        csrf_token,
+                        {
+                            **kwargs,
+                            "srv_food_ck": srv_food_ck,
+                            "search_product": search_product,
+                        },
                     )
         else:
-            yield FormRequest(
-                url=f"{req_url}?{query}",
-                callback=self.parse_youus,
-                errback=self.errback,
-                formdata={
-                    "pageNum": str(kwargs["page"]),
-                    "pageSize": "16",
-                    "searchWord": "",
-                    "searchHPrice": "",
-                    "searchTPrice": "",
-                    "searchSrvFoodCK": kwargs["srv_food_ck"],
-                    "searchSort": "searchALLSort",
-                    "searchProduct": kwargs["search_product"],
-                },
-                cb_kwargs=kwargs,
-                headers=self.headers,
-                dont_filter=True,
+            yield self.__youus_page_request(csrf_token, kwargs)
+
+    @staticmethod
+    def __csrf_token(response: HtmlResponse) -> str:
+        soup = BeautifulSoup(response.body, "html.parser")
+        form = soup.select_one("#CSRFForm")
+        if not form:
+            raise RuntimeError("Can't find event post action")
+        return form.select_one("input")["value"]
+
+    def __event_page_request(self, csrf_token: str, kwargs: dict) -> FormRequest:
+        return FormRequest(
+            url="{}?CSRFToken={}".format(self.search_urls["event"], csrf_token),
+            callback=self.parse_event,
+            errback=self.errback,
+            formdata={
+                "pageNum": str(kwargs["page"]),
+                "pageSize": "8",
+                "searchType": "",
+                "searchWord": "",
+                "parameterList": "TOTAL",
+            },
+            cb_kwargs={**kwargs, "csrf_token": csrf_token},
+            headers=self.headers.copy(),
+            dont_filter=True,
+        )
+
+    def __youus_page_request(self, csrf_token: str, kwargs: dict) -> FormRequest:
+        return FormRequest(
+            url="{}?CSRFToken={}".format(self.search_urls["youus"], csrf_token),
+            callback=self.parse_youus,
+            errback=self.errback,
+            formdata={
+                "pageNum": str(kwargs["page"]),
+                "pageSize": "16",
+                "searchWord": "",
+                "searchHPrice": "",
+                "searchTPrice": "",
+                "searchSrvFoodCK": kwargs["srv_food_ck"],
+                "searchSort": "searchALLSort",
+                "searchProduct": kwargs["search_product"],
+            },
+            cb_kwargs={**kwargs, "csrf_token": csrf_token},
+            headers=self.headers.copy(),
+            dont_filter=True,
+        )
+
+    def __json_or_rebootstrap(self, response: HtmlResponse, kwargs: dict):
+        """
+        :return: (body, []) 또는 Token 이 거절되었으면(JSON 이 아닌 응답) (None, 새 Token 을 받는 요청)
+        max_rebootstrap 번 다시 받아도 거절되면 (None, [])
+        """
+        try:
+            body = response.json()
+            if isinstance(body, str):
+                body = json.loads(body)
+            return body, []
+        except ValueError:
+            kwargs = {k: v for k, v in kwargs.items() if k != "csrf_token"}
+            kwargs["rebootstrap"] = kwargs.get("rebootstrap", 0) + 1
+            if kwargs["rebootstrap"] > self.max_rebootstrap:
+                self.logger.error(
+                    f"CSRF Token rejected {self.max_rebootstrap} times: {response.url} {kwargs}. Give up"
+                )
+                return None, []
+            self.logger.error(
+                f"CSRF Token rejected: {response.url} {kwargs}. Retry with new token"
             )
+            callback = (
+                self.parse_event_home
+                if kwargs["type"] == "event"
+                else self.parse_youus_home
+            )
+            return None, [
+                Request(
+                    self.start_urls[kwargs["type"]],
+                    callback=callback,
+                    headers=self.headers,
+                    cb_kwargs=kwargs,
+                    dont_filter=True,
+                    meta={"backoff": True},
+                )
+            ]
+
+    def __next_pages(self, kwargs: dict, number_of_pages: int, request) -> list:
+        """
+        1 page 의 응답에서 나머지 page 를 한 번에 요청합니다(같은 Token 을 사용합니다)
+        """
+        if int(kwargs["page"]) != 1:
+            return []
+        self.logger.info(f"Pages: {number_of_pages} {kwargs}")
+        # 나머지 page 는 다시 받은 횟수를 새로 셉니다
+        kwargs = {k: v for k, v in kwargs.items() if k != "rebootstrap"}
+        return [
+            request(kwargs["csrf_token"], {**kwargs, "page": page})
+            for page in range(2, int(number_of_pages) + 1)
+        ]
 
     def parse_event(self, response: HtmlResponse, **kwargs) -> ItemType:
-        body = response.json()
-        if isinstance(body, str):
-            body = json.loads(body)
+        body, rebootstrap = self.__json_or_rebootstrap(response, kwargs)
+        if body is None:
+            yield from rebootstrap
+            return
         pagination = body["pagination"]
         results = body["results"]
 
         if not results:
             return
 
+        yield from self.__next_pages(
+            kwargs, pagination["numberOfPages"], self.__event_page_request
+        )
+
         for result in results:
             result = {k: v for k, v in result.items() if not k.endswith("Old")}
             product_name = result["goodsNm"]
@@ -228,26 +267,21 @@ class Gs25WebSpider(Spider):
             )
             yield product
 
-        current_page = int(kwargs["page"])
-        self.logger.info(f"Next page: {current_page + 1}/{pagination['numberOfPages']}")
-        yield Request(
-            self.start_urls["event"],
-            callback=self.parse_event_home,
-            headers=self.headers,
-            cb_kwargs={"type": "event", "page": current_page + 1},
-            dont_filter=True,
-        )
-
     def parse_youus(self, response: HtmlResponse, **kwargs) -> ItemType:
-        body = response.json()
-        if isinstance(body, str):
-            body = json.loads(body)
+        body, rebootstrap = self.__json_or_rebootstrap(response, kwargs)
+        if body is None:
+            yield from rebootstrap
+            return
         pagination = body["SubPageListPagination"]
         results = body["SubPageListData"]
 
         if not results:
             return
 
+        yield from self.__next_pages(
+            kwargs, pagination["numberOfPages"], self.__youus_page_request
+        )
+
         for result in results:
             result = {k: v for k, v in result.items() if not k.endswith("Old")}
             product_name = result["goodsNm"]
@@ -371,24 +405,12 @@ class Gs25WebSpider(Spider):
             )
             yield product
 
-        current_page = int(kwargs["page"])
-        self.logger.info(f"Next page: {current_page + 1}/{pagination['numberOfPages']}")
-        kwargs["page"] = current_page + 1
-        yield Request(
-            self.start_urls["event"],
-            callback=self.parse_youus_home,
-            headers=self.headers,
-            cb_kwargs=kwargs,
-            dont_filter=True,
-        )
-
     def errback(self, failure: Failure):
         # Retry if 403 Forbidden
         if failure.check(HttpError) and failure.value.response.status == 403:
             req: Request = failure.value.response.request.copy()
             req.dont_filter = True
-            self.logger.error("403 Forbidden: {}. Retry after 5 sec".format(req.url))
-            sleep(5)
+            self.logger.error("403 Forbidden: {}. Retry with backoff".format(req.url))
             match req.cb_kwargs["type"]:
                 # Reset cookies
                 case "event":
@@ -398,6 +420,7 @@ class Gs25WebSpider(Spider):
                         headers=self.headers,
                         cb_kwargs=req.cb_kwargs,
                         dont_filter=True,
+                        meta={"backoff": True},
                     )
                 case "youus":
                     yield Request(
@@ -406,6 +429,7 @@ class Gs25WebSpider(Spider):
                         headers=self.headers,
                         cb_kwargs=req.cb_kwargs,
                         dont_filter=True,
+                        meta={"backoff": True},
                     )
                 case _:
                     raise RuntimeError("Unknown type: {}".format(req.cb_kwargs["type"]))
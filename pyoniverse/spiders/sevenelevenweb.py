@@ -1,6 +1,5 @@
 import re
 from pathlib import Path
-from time import sleep
 
 from bs4 import BeautifulSoup
 from scrapy import FormRequest, Request, Spider
@@ -63,15 +62,18 @@ class SevenElevenWebSpider(Spider):
                             "intPageSize": "100",
                             "pTab": ptab,
                         }
-                        kwargs["size"] = "100"
-                        kwargs["tab"] = tab
-                        kwargs["ptab"] = ptab
                         yield FormRequest(
                             url=self.base_url + self.tab[tab]["pagination"],
                             formdata=form,
                             callback=self.parse_list,
                             errback=self.errback,
-                            cb_kwargs=kwargs,
+                            # 요청마다 cb_kwargs 를 따로 만든다(같은 dict 를 공유하면 마지막 값으로 덮어쓴다)
+                            cb_kwargs={
+                                **kwargs,
+                                "size": "100",
+                                "tab": tab,
+                                "ptab": ptab,
+                            },
                             dont_filter=True,
                         )
                 case "Cafe":
@@ -105,15 +107,17 @@ class SevenElevenWebSpider(Spider):
 
                     for ptab in ptabs:
                         form["pTab"] = ptab
-                        kwargs["size"] = "10"
-                        kwargs["tab"] = tab
-                        kwargs["ptab"] = ptab
                         yield FormRequest(
                             url=self.base_url + self.tab[tab]["main"],
                             formdata=form,
                             callback=self.parse_list,
                             errback=self.errback,
-                            cb_kwargs=kwargs,
+                            cb_kwargs={
+                                **kwargs,
+                                "size": "10",
+                                "tab": tab,
+                                "ptab": ptab,
+                            },
                             dont_filter=True,
                         )
                 case _:
@@ -126,12 +130,14 @@ class SevenElevenWebSpider(Spider):
             case "Fresh Food":
                 actual_size = soup.select_one("#listCnt")["value"]
                 if int(kwargs["size"]) <= int(actual_size):
+                    # 첫 응답의 전체 상품 수로 한 번에 모두 가져온다(크기를 늘려가며 다시 받지 않는다)
+                    size = str(int(actual_size) + 1)
                     self.logger.debug(
-                        "Size is not enough. {} <= {}".format(
-                            kwargs["size"], actual_size
+                        "Size is not enough. {} <= {}. Fetch {}".format(
+                            kwargs["size"], actual_size, size
                         )
                     )
-                    kwargs["size"] = str(int(kwargs["size"]) * 2)
+                    kwargs = {**kwargs, "size": size}
                     form = {
                         "intPageSize": kwargs["size"],
                         "pTab": kwargs["ptab"],
@@ -385,8 +391,8 @@ class SevenElevenWebSpider(Spider):
         if failure.check(HttpError) and failure.value.response.status == 403:
             req: Request = failure.value.response.request.copy()
             req.dont_filter = True
-            self.logger.error("403 Forbidden: {}. Retry after 5 sec".format(req.url))
-            sleep(5)
+            self.logger.error("403 Forbidden: {}. Retry with backoff".format(req.url))
+            req.meta["backoff"] = True
             yield req
         else:
             self.logger.error(repr(failure))
@@ -30,44 +30,72 @@ class SevenElevenWebSpider(Spider):
         yield Request(url=self.base_url + self.main_path, callback=self.parse_list)
 
     def parse_list(self, response: HtmlResponse, **kwargs) -> Request:
+        """
+        진행중인 이벤트가 모두 있는 목록을 받을 때까지 intPageSize 를 늘려서 다시 요청한다.
+        - 전체 이벤트 수(#listCnt)가 있으면 그 크기로 한 번에 요청한다
+        - 없으면 크기를 2배씩 늘린다
+        - 목록은 진행중인 이벤트부터 있으므로, 끝난 이벤트가 보이면 더 요청하지 않는다
+        """
         if "page_size" in kwargs:
             body = f"<html><body><ul id=listUl>{response.text}</ul></body></html>"
         else:
             body = response.text
 
         soup = BeautifulSoup(body, "html.parser")
+        lst = soup.select("#listUl > li")
         # pagination
-        if not soup.select_one("p.complete"):
-            page_size = kwargs.get("page_size", 15)
+        if not soup.select_one("p.complete") and not self.__has_ended(lst):
+            page_size = kwargs.get("page_size", 0)
+            count = soup.select_one("#listCnt")
+            if count and count.get("value", "").isdigit():
+                if page_size >= int(count["value"]):
+                    self.logger.warning(
+                        f"No complete mark: {page_size} >= {count['value']}"
+                    )
+                    yield from self.__parse_events(lst)
+                    return
+                page_size = int(count["value"])
+            else:
+                page_size = max(15, page_size * 2)
             yield FormRequest(
                 self.base_url + self.pagination_path,
                 callback=self.parse_list,
                 formdata={"intPageSize": str(page_size)},
-                cb_kwargs={"page_size": page_size + 5},
+                cb_kwargs={"page_size": page_size},
             )
         else:
-            lst = soup.select("#listUl > li")
-            for event in lst:
-                status = event.select_one("p").text.strip()
-                if status != "진행중":
-                    return
-                link = event.select_one("a")
-                title = link.select_one("strong").text.strip()
-                start_at, end_at = link.select_one("span").text.strip().split(" ~ ")
-                start_at = datetime.strptime(start_at, "%Y-%m-%d")
-                end_at = datetime.strptime(end_at, "%Y-%m-%d")
-                crawl_id = re.search(r"fncGoView\((.+)\)", link["href"]).group(1)
-                yield FormRequest(
-                    self.base_url + self.detail_path,
-                    callback=self.parse,
-                    formdata={"seqNo": crawl_id},
-                    cb_kwargs={
-                        "title": title,
-                        "start_at": start_at,
-                        "end_at": end_at,
-                        "crawl_id": crawl_id,
-                    },
-                )
+            yield from self.__parse_events(lst)
+
+    @staticmethod
+    def __has_ended(lst) -> bool:
+        for event in lst:
+            status = event.select_one("p")
+            if status and status.text.strip() != "진행중":
+                return True
+        return False
+
+    def __parse_events(self, lst):
+        for event in lst:
+            status = event.select_one("p").text.strip()
+            if status != "진행중":
+                return
+            link = event.select_one("a")
+            title = link.select_one("strong").text.strip()
+            start_at, end_at = link.select_one("span").text.strip().split(" ~ ")
+            start_at = datetime.strptime(start_at, "%Y-%m-%d")
+            end_at = datetime.strptime(end_at, "%Y-%m-%d")
+            crawl_id = re.search(r"fncGoView\((.+)\)", link["href"]).group(1)
+            yield FormRequest(
+                self.base_url + self.detail_path,
+                callback=self.parse,
+                formdata={"seqNo": crawl_id},
+                cb_kwargs={
+                    "title": title,
+                    "start_at": start_at,
+                    "end_at": end_at,
+                    "crawl_id": crawl_id,
+                },
+            )
 
     def parse(self, response: HtmlResponse, **kwargs):
         soup = BeautifulSoup(response.text, "html.parser")
@@ -0,0 +1,31 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+
+class JsonState:
+    """
+    다음 실행에서 사용할 값을 key 마다 기록하는 JSON 파일(state/).
+    같은 파일을 사용하는 spider 가 동시에 실행될 수 있으므로 다시 읽어서 합친 뒤 바꿔 쓴다.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save(self, values: Dict[str, Any]):
+        if not values:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        merged = {**self.load(), **values}
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(merged, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
@@ -0,0 +1,87 @@
+from typing import Dict, List
+from unittest.mock import patch
+
+import pytest
+
+from pyoniverse.db.client import DBClient
+
+
+class FakeDatabase:
+    def __init__(self, names: List[str]):
+        self.names = names
+        self.indexes: Dict[str, list] = {}
+
+    def list_collection_names(self) -> List[str]:
+        return list(self.names)
+
+    def drop_collection(self, name: str):
+        if name in self.names:
+            self.names.remove(name)
+
+    def create_collection(self, name: str):
+        self.names.append(name)
+        db = self
+
+        class Collection:
+            def create_indexes(self, indexes: list):
+                db.indexes[name] = indexes
+
+        return Collection()
+
+
+class FakeMongoClient:
+    def __init__(self, *args, **kwargs):
+        self.commands = []
+        self.db = FakeDatabase(["products", "events", "products_staging_1"])
+        self.admin = self
+
+    def command(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+    def get_database(self, name: str, **kwargs) -> FakeDatabase:
+        return self.db
+
+
+@pytest.fixture
+def client():
+    with patch("pyoniverse.db.client.MongoClient", FakeMongoClient):
+        client = DBClient(URI="mongodb://localhost:27017", DB="test")
+    return client, client._DBClient__client
+
+
+def test_prepare_staging(client):
+    # given
+    client, mongo = client
+    # when
+    suffix = client.prepare_staging()
+    # then: 이전 staging collection 은 지우고 index 를 가진 새 collection 을 만든다
+    assert suffix.startswith(DBClient.staging_prefix)
+    assert sorted(mongo.db.names) == sorted(
+        ["products", "events", f"products{suffix}", f"events{suffix}"]
+    )
+    assert mongo.db.indexes[f"products{suffix}"] == DBClient.indexes["products"]
+
+
+def test_swap(client):
+    # given
+    client, mongo = client
+    # when
+    client.swap("_staging_1")
+    # then
+    assert mongo.commands[1:] == [
+        (
+            ("renameCollection", f"test.{coll}_staging_1"),
+            {"to": f"test.{coll}", "dropTarget": True},
+        )
+        for coll in ["products", "events"]
+    ]
+
+
+def test_drop_staging(client):
+    # given
+    client, mongo = client
+    # when
+    client.drop_staging("_staging_1")
+    # then: 기존 collection 은 남긴다
+    assert "products_staging_1" not in mongo.db.names
+    assert {"products", "events"} <= set(mongo.db.names)
@@ -0,0 +1,31 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+while "tests" not in os.listdir():
+    os.chdir("..")
+
+
+@pytest.fixture
+def budgets() -> dict:
+    return json.loads(Path("benchmarks/importtime_budget.json").read_text())
+
+
+def test_entry_points_do_not_import_forbidden_modules(budgets):
+    for entry_point, budget in budgets.items():
+        # given
+        code = "\n".join(f"import {module}" for module in budget["modules"])
+        code += "\nimport sys\nprint(','.join(sorted(sys.modules)))"
+        # when
+        res = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        imported = set(res.stdout.strip().split(","))
+        # then
+        for module in budget["forbidden"]:
+            assert module not in imported, f"{entry_point} imports {module}"
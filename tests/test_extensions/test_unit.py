@@ -0,0 +1,187 @@
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+from scrapy import Request
+from scrapy.http import Response
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+
+from pyoniverse.extensions.concurrency import AdaptiveConcurrency
+
+
+while "tests" not in os.listdir():
+    os.chdir("..")
+
+
+def make_extension(tmp_path, max_limit: int = 16) -> AdaptiveConcurrency:
+    crawler = SimpleNamespace(
+        stats=MemoryStatsCollector(SimpleNamespace(settings=Settings())),
+        spider=SimpleNamespace(logger=SimpleNamespace(info=lambda *_: None)),
+        engine=SimpleNamespace(
+            downloader=SimpleNamespace(
+                slots={"a.com": SimpleNamespace(concurrency=max_limit)}
+            )
+        ),
+    )
+    return AdaptiveConcurrency(
+        crawler,
+        path=tmp_path / "state" / "concurrency.json",
+        min_limit=1,
+        max_limit=max_limit,
+        window=4,
+        target_latency=1.0,
+    )
+
+
+def receive(extension: AdaptiveConcurrency, status: int, latency: float = 0.1):
+    request = Request(
+        "https://a.com/", meta={"download_slot": "a.com", "download_latency": latency}
+    )
+    extension.response_downloaded(
+        Response(request.url, status=status), request, extension.crawler.spider
+    )
+
+
+def slot(extension: AdaptiveConcurrency):
+    return extension.crawler.engine.downloader.slots["a.com"]
+
+
+def test_adaptive_concurrency_ban(tmp_path):
+    # given
+    extension = make_extension(tmp_path)
+    extension.spider_opened(None)
+    # when: 처음 차단되면 바로 절반으로 줄인다
+    receive(extension, 403)
+    assert slot(extension).concurrency == 8
+    # when: 같은 window 의 응답은 한 번 더 차단되어도 window 가 끝날 때 줄인다
+    receive(extension, 429)
+    receive(extension, 200)
+    assert slot(extension).concurrency == 8
+    receive(extension, 503)
+    # then
+    assert slot(extension).concurrency == 4
+
+
+@pytest.mark.parametrize("latency, expected", [(0.1, 5), (2.0, 3)])
+def test_adaptive_concurrency_latency(tmp_path, latency, expected):
+    # given
+    extension = make_extension(tmp_path)
+    (tmp_path / "state").mkdir()
+    (tmp_path / "state" / "concurrency.json").write_text(json.dumps({"a.com": 4}))
+    extension.spider_opened(None)
+    # when: 지난 실행에서 학습한 값부터 시작한다
+    for _ in range(4):
+        receive(extension, 200, latency)
+    # then: 빠르면 1 늘리고, 느리면 3/4 로 줄인다
+    assert slot(extension).concurrency == expected
+
+
+def test_adaptive_concurrency_save(tmp_path):
+    # given
+    extension = make_extension(tmp_path, max_limit=5)
+    path = tmp_path / "state" / "concurrency.json"
+    path.parent.mkdir()
+    path.write_text(json.dumps({"b.com": 2}))
+    extension.spider_opened(None)
+    for _ in range(4 * 3):
+        receive(extension, 200)
+    receive(extension, 403)
+    # when
+    extension.spider_closed(extension.crawler.spider)
+    # then: 차단되기 전까지 문제없던 값을 저장한다(다른 spider 의 값은 그대로 둔다)
+    assert json.loads(path.read_text()) == {"a.com": 2, "b.com": 2}
+    stats = extension.crawler.stats.get_stats()
+    assert stats["concurrency/a.com/peak"] == 5
+    assert stats["concurrency/a.com/banned"] == 1
+
+
+def test_adaptive_concurrency_retried_responses(tmp_path):
+    # Reactor 가 필요하므로 별도 프로세스에서 실행한다
+    script = f"""
+from scrapy import Request, Spider
+from scrapy.crawler import CrawlerRunner
+from scrapy.http import Response
+from scrapy.utils.project import get_project_settings
+from twisted.internet import defer, task
+
+
+class TooManyRequestsHandler:
+    lazy = False
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def download_request(self, request, spider):
+        request.meta["download_latency"] = 0.01
+        return defer.succeed(Response(request.url, status=429, request=request))
+
+
+class OneRequestSpider(Spider):
+    name = "test"
+
+    def start_requests(self):
+        yield Request("http://a.com/", callback=self.parse)
+
+    def parse(self, response):
+        pass
+
+
+@defer.inlineCallbacks
+def main(reactor):
+    settings = get_project_settings()
+    settings.setdict(
+        {{
+            "ITEM_PIPELINES": {{}},
+            "DOWNLOAD_HANDLERS": {{"http": "__main__.TooManyRequestsHandler"}},
+            "ADAPTIVE_CONCURRENCY_STATE": {str(tmp_path / "concurrency.json")!r},
+            "LOG_LEVEL": "ERROR",
+            "LOG_FILE": None,
+        }}
+    )
+    crawler = CrawlerRunner(settings).create_crawler(OneRequestSpider)
+    yield crawler.crawl()
+    stats = crawler.stats.get_stats()
+    # 처음 요청 + RETRY_TIMES 번 재시도한 응답을 모두 차단으로 본다
+    retries = settings.getint("RETRY_TIMES")
+    assert stats["retry/count"] == retries, stats
+    assert stats["concurrency/a.com/banned"] == retries + 1, stats
+    assert stats["concurrency/a.com/limit"] < settings.getint(
+        "CONCURRENT_REQUESTS_PER_DOMAIN"
+    ), stats
+
+
+task.react(main)
+"""
+    # when
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, timeout=60
+    )
+    # then
+    assert result.returncode == 0, result.stderr
+
+
+def test_startup_probe_only_in_benchmark_settings():
+    # given
+    code = (
+        "from scrapy.utils.project import get_project_settings\n"
+        "print(','.join(get_project_settings().getdict('EXTENSIONS')))"
+    )
+    probe = "pyoniverse.extensions.startup.StartupProbe"
+    for module, expected in [
+        ("pyoniverse.settings", False),
+        ("benchmarks.startup_settings", True),
+    ]:
+        # when
+        res = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={**os.environ, "SCRAPY_SETTINGS_MODULE": module},
+        )
+        # then: benchmark 용 extension 은 기본 settings 에 없다
+        assert (probe in res.stdout.strip().split(",")) is expected
@@ -0,0 +1,125 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+from scrapy import Request
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import Response
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+
+from pyoniverse.middlewares.backoff import BackoffMiddleware
+
+
+while "tests" not in os.listdir():
+    os.chdir("..")
+
+
+@pytest.fixture
+def spider():
+    return SimpleNamespace(
+        name="test", logger=SimpleNamespace(info=lambda *_: None, error=lambda *_: None)
+    )
+
+
+def make_middleware(**kwargs) -> BackoffMiddleware:
+    stats = MemoryStatsCollector(SimpleNamespace(settings=Settings()))
+    return BackoffMiddleware(stats=stats, **kwargs)
+
+
+def test_backoff_delay():
+    # given
+    middleware = make_middleware(base=1, max_delay=5, jitter=0.5)
+    # when
+    delays = [middleware.delay("a.com") for _ in range(5)]
+    # then: 1, 2, 4, 5, 5 ±50%
+    for delay, expected in zip(delays, [1, 2, 4, 5, 5]):
+        assert expected * 0.5 <= delay <= expected * 1.5
+    # then: 다른 도메인은 처음부터 시작한다
+    assert middleware.delay("b.com") <= 1.5
+
+
+def test_backoff_reset_on_success(spider):
+    # given
+    middleware = make_middleware(base=1, jitter=0)
+    request = Request("https://a.com/1")
+    middleware.delay("a.com")
+    middleware.delay("a.com")
+    # when
+    middleware.process_response(request, Response(request.url, status=403), spider)
+    assert middleware.delay("a.com") == 4
+    middleware.process_response(request, Response(request.url, status=200), spider)
+    # then
+    assert middleware.delay("a.com") == 1
+
+
+def test_backoff_budget(spider):
+    # given
+    middleware = make_middleware(retry_budget=0)
+    request = Request("https://a.com/1", meta={"backoff": True})
+    # when
+    coro = middleware.process_request(request, spider)
+    # then
+    with pytest.raises(IgnoreRequest):
+        coro.send(None)
+    assert middleware.stats.get_value("backoff/a.com/gave_up") == 1
+
+
+def test_backoff_process_request():
+    # Reactor 가 필요하므로 별도 프로세스에서 실행한다
+    script = """
+import time
+from types import SimpleNamespace
+from scrapy import Request
+from twisted.internet import defer, task
+from tests.test_middlewares.test_unit import make_middleware
+
+@defer.inlineCallbacks
+def main(reactor):
+    spider = SimpleNamespace(name="test", logger=SimpleNamespace(info=print))
+    middleware = make_middleware(base=0.2, jitter=0)
+    ticks = []
+    loop = task.LoopingCall(lambda: ticks.append(time.monotonic()))
+    loop.start(0.01)
+    start = time.monotonic()
+    # 기다리지 않는 요청
+    assert (yield defer.Deferred.fromCoroutine(
+        middleware.process_request(Request("https://a.com/0"), spider)
+    )) is None
+    yield defer.gatherResults([
+        defer.Deferred.fromCoroutine(middleware.process_request(
+            Request(f"https://a.com/{i}", meta={"backoff": True}), spider
+        ))
+        for i in range(2)
+    ])
+    elapsed = time.monotonic() - start
+    loop.stop()
+    # 0.2, 0.4 초를 동시에 기다린다
+    assert 0.35 < elapsed < 0.6, elapsed
+    # 멈춘 동안에는 같은 도메인의 다른 요청도 기다린다(다른 도메인은 기다리지 않는다)
+    start = time.monotonic()
+    middleware.paused_until["a.com"] = start + 0.2
+    yield defer.Deferred.fromCoroutine(
+        middleware.process_request(Request("https://b.com/0"), spider)
+    )
+    assert time.monotonic() - start < 0.1
+    yield defer.Deferred.fromCoroutine(
+        middleware.process_request(Request("https://a.com/1"), spider)
+    )
+    assert 0.15 < time.monotonic() - start < 0.4
+    assert middleware.stats.get_value("backoff/a.com/held") == 1
+    # 기다리는 동안 reactor 는 멈추지 않는다
+    assert len(ticks) > 20, len(ticks)
+    assert middleware.stats.get_value("backoff/a.com/retries") == 2
+    assert abs(middleware.stats.get_value("backoff/a.com/seconds") - 0.6) < 1e-6
+
+task.react(main)
+"""
+    # when
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, timeout=60
+    )
+    # then
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,162 @@
+import json
+import os
+from types import SimpleNamespace
+
+from scrapy.http import HtmlResponse
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+
+from pyoniverse.pagination.links import LinkPaginator, PageLinks
+from pyoniverse.pagination.speculative import SpeculativePaginator
+from pyoniverse.state import JsonState
+
+
+while "tests" not in os.listdir():
+    os.chdir("..")
+
+
+def make_spider() -> SimpleNamespace:
+    return SimpleNamespace(
+        crawler=SimpleNamespace(
+            stats=MemoryStatsCollector(SimpleNamespace(settings=Settings()))
+        )
+    )
+
+
+def test_window(tmp_path):
+    path = tmp_path / "state" / "pagination.json"
+    path.parent.mkdir()
+    path.write_text(json.dumps({"cu/list/10": 6, "cu/list/20": 100}))
+    paginator = SpeculativePaginator(JsonState(path), window=4, max_window=32)
+    # 지난 실행의 page 수 + 1(빈 page)
+    assert paginator.start("cu/list/10") == [1, 2, 3, 4, 5, 6, 7]
+    assert paginator.start("cu/list/20") == list(range(1, 33))
+    assert paginator.start("cu/list/30") == [1, 2, 3, 4]
+    # 이미 시작한 목록
+    assert paginator.start("cu/list/30") == []
+
+
+def test_stop_at_first_empty_page(tmp_path):
+    paginator = SpeculativePaginator(JsonState(tmp_path / "pagination.json"), window=3)
+    key = "cu/list/10"
+    assert paginator.start(key) == [1, 2, 3]
+    assert paginator.done(key, 1, empty=False) == [4]
+    assert paginator.done(key, 4, empty=False) == [5]
+    assert paginator.done(key, 3, empty=True) == []
+    # 빈 page 뒤의 page 는 무시하고 더 요청하지 않는다
+    assert paginator.is_past_end(key, 4)
+    assert paginator.is_past_end(key, 5)
+    assert not paginator.is_past_end(key, 2)
+    assert paginator.done(key, 2, empty=False) == []
+
+    spider = make_spider()
+    paginator.close(spider)
+    stats = spider.crawler.stats.get_stats()
+    assert stats[f"pagination/{key}/pages"] == 2
+    assert stats[f"pagination/{key}/requested"] == 5
+    assert JsonState(tmp_path / "pagination.json").load() == {key: 2}
+
+
+def test_state_save(tmp_path):
+    path = tmp_path / "state" / "pagination.json"
+    paginator = SpeculativePaginator(JsonState(path), window=2)
+    paginator.start("cu/list/10")
+    paginator.done("cu/list/10", 1, empty=True)
+    # 끝까지 보지 못한 목록은 기록하지 않는다
+    paginator.start("cu/list/20")
+    # 동시에 실행된 다른 spider 가 저장한 값과 합친다
+    JsonState(path).save({"gs25/event/1": 3})
+    paginator.close(make_spider())
+    assert JsonState(path).load() == {"cu/list/10": 0, "gs25/event/1": 3}
+    assert not list(path.parent.glob("*.tmp"))
+
+
+def test_window_grows_past_history(tmp_path):
+    path = tmp_path / "pagination.json"
+    path.write_text(json.dumps({"cu/list/10": 2}))
+    paginator = SpeculativePaginator(JsonState(path), window=4)
+    key = "cu/list/10"
+    # 기록된 page 수 + 1 까지만 요청한다
+    assert paginator.start(key) == [1, 2, 3]
+    assert paginator.done(key, 1, empty=False) == []
+    # 목록이 길어졌으면 계속 요청한다
+    assert paginator.done(key, 3, empty=False) == [4, 5]
+    assert paginator.done(key, 2, empty=False) == [6]
+    assert paginator.done(key, 4, empty=True) == []
+    paginator.close(make_spider())
+    assert JsonState(path).load() == {key: 3}
+
+
+def make_page(url: str, pages: range, active: int) -> HtmlResponse:
+    links = "".join(
+        f'<li><a {"class=active " if page == active else ""}'
+        f'href="/list?category=1&page={page}">{page}</a></li>'
+        for page in pages
+    )
+    body = f'<ul class="pager"><li><a href="#void">prev</a></li>{links}</ul>'
+    return HtmlResponse(url, body=body.encode())
+
+
+def test_link_paginator():
+    paginator = LinkPaginator(
+        PageLinks(pager=".pager a", next_link=".pager li:has(> a.active) + li > a")
+    )
+
+    def follow(response: HtmlResponse) -> list:
+        requests = list(paginator.follow(response, print, {"tab": "event"}))
+        assert all(r.cb_kwargs == {"tab": "event"} for r in requests)
+        assert all(r.callback is print for r in requests)
+        return [r.url for r in requests]
+
+    # 첫 page 의 pager 에 보이는 page 를 한 번에 요청한다(다른 query parameter 는 링크를 따른다)
+    first = make_page("https://a.com/list", range(1, 6), active=1)
+    assert follow(first) == [
+        f"https://a.com/list?category=1&page={page}" for page in range(2, 6)
+    ]
+    assert (
+        follow(make_page("https://a.com/list?category=1&page=2", range(1, 6), 2)) == []
+    )
+    # 뒤쪽 page 의 pager 에 새 번호가 보이면 이어서 요청한다
+    assert follow(
+        make_page("https://a.com/list?category=1&page=5", range(5, 8), 5)
+    ) == [
+        "https://a.com/list?category=1&page=6",
+        "https://a.com/list?category=1&page=7",
+    ]
+    # page 번호를 알 수 없으면 다음 page 링크를 따라간다
+    paginator = LinkPaginator(
+        PageLinks(
+            pager=".pager a",
+            param="p",
+            next_link=".pager li:has(> a.active) + li > a",
+        )
+    )
+    assert follow(first) == ["https://a.com/list?category=1&page=2"]
+    assert follow(make_page("https://a.com/list", range(1, 2), active=1)) == []
+
+
+def test_window_grows_by_configured_window(tmp_path):
+    path = tmp_path / "pagination.json"
+    path.write_text(json.dumps({"cu/list/10": 30}))
+    paginator = SpeculativePaginator(JsonState(path), window=4)
+    key = "cu/list/10"
+    assert paginator.start(key) == list(range(1, 32))
+    for page in range(1, 31):
+        assert paginator.done(key, page, empty=False) == []
+    # then: 목록이 한 page 늘어도 window 전체가 아니라 PAGINATION_WINDOW 개만 더 요청한다
+    assert paginator.done(key, 31, empty=False) == [32, 33, 34, 35]
+
+
+def test_failed_page(tmp_path):
+    paginator = SpeculativePaginator(JsonState(tmp_path / "pagination.json"), window=2)
+    key = "cu/list/10"
+    assert paginator.start(key) == [1, 2]
+    # then: 실패한 page 는 window 에서 빼고 다음 page 를 요청한다
+    assert paginator.failed(key, 1) == [3]
+    assert paginator.failed(key, 2) == [4]
+    assert paginator.done(key, 3, empty=False) == [5]
+    assert paginator.done(key, 4, empty=True) == []
+    spider = make_spider()
+    paginator.close(spider)
+    assert spider.crawler.stats.get_value(f"pagination/{key}/failed") == 2
+    assert JsonState(tmp_path / "pagination.json").load() == {key: 3}
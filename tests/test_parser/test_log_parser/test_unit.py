@@ -100,6 +100,14 @@ def test_log_parser_convert(result_data):
     assert res.collected_count == collected_count
     assert res.error_count == error_count
     assert res.elapsed_sec == elapsed_sec
+    assert res.new_count == 0
+
+    # when
+    res = log_parser._convert(
+        {**result_data, "mongodb/new": 3, "mongodb/changed": 2, "mongodb/skipped": 1}
+    )
+    # then
+    assert (res.new_count, res.changed_count, res.skipped_count) == (3, 2, 1)
 
 
 def test_log_parser_summary(log_results):
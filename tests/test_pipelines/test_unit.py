@@ -0,0 +1,1151 @@
+import copy
+import dataclasses
+import gzip
+import hashlib
+import os
+import pickle
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from io import BytesIO
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List
+from unittest.mock import patch
+
+import bson
+import pytest
+from bson.raw_bson import RawBSONDocument
+from PIL import Image
+from pymongo import MongoClient, ReplaceOne, UpdateOne
+from pymongo.errors import AutoReconnect
+from pymongo.results import BulkWriteResult
+from scrapy.exceptions import DropItem
+from scrapy.http import Response
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+
+from pyoniverse.db.client import DBClient
+from pyoniverse.items import CrawledInfoVO, EventVO, ImageVO, PriceVO
+from pyoniverse.items.event import BrandEventVO
+from pyoniverse.items.product import ProductVO
+from pyoniverse.items.schemas.product import ProductSchema
+from pyoniverse.pipelines.db import MongoDBPipeline
+from pyoniverse.pipelines.admission import ImageRejected, PixelBudget, read_size
+from pyoniverse.pipelines.image import S3ImagePipeline
+from pyoniverse.pipelines.manifest import ImageManifest, ManifestEntry
+from pyoniverse.pipelines.spool import (
+    OPEN_SUFFIX,
+    SEALED_SUFFIX,
+    SpoolLoader,
+    SpoolPipeline,
+    SpoolWriter,
+    read_segment,
+)
+from pyoniverse.pipelines.transcode import Transcoder, pyramid, transcode
+from pyoniverse.pipelines.validator import FastValidator, ValidationPipeline
+
+
+if "tests" not in os.listdir():
+    os.chdir("..")
+
+
+class FakeCursor(list):
+    def __init__(self, docs, indexed: bool):
+        super().__init__(docs)
+        self.indexed = indexed
+
+    def explain(self) -> dict:
+        stage = {"stage": "IXSCAN"} if self.indexed else {"stage": "COLLSCAN"}
+        return {
+            "queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": stage}}
+        }
+
+
+class FakeCollection:
+    """
+    find_one, find, count_documents, bulk_write, create_indexes 만 지원하는 메모리 collection
+    """
+
+    def __init__(self, delay: float = 0):
+        self.docs: List[dict] = []
+        self.bulk_calls: List[list] = []
+        self.find_one_calls = 0
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self.indexes = []
+
+    def __find(self, query: dict):
+        for doc in self.docs:
+            if all(self.__get(doc, key) == val for key, val in query.items()):
+                return doc
+        return None
+
+    @staticmethod
+    def __get(doc: dict, key: str):
+        for part in key.split("."):
+            doc = doc.get(part, {})
+        return doc
+
+    def find_one(self, query: dict, projection=None, **kwargs):
+        self.find_one_calls += 1
+        doc = self.__find(query)
+        return dict(doc) if doc else None
+
+    def find(self, query: dict, projection: dict = None, **kwargs):
+        fields = [key.split(".")[0] for key, val in (projection or {}).items() if val]
+        docs = []
+        for doc in self.docs:
+            if all(self.__get(doc, key) == val for key, val in query.items()):
+                doc = {key: val for key, val in doc.items() if key in fields}
+                docs.append(RawBSONDocument(bson.encode(doc)))
+        return FakeCursor(docs, indexed=bool(self.indexes))
+
+    def create_indexes(self, indexes: list):
+        self.indexes = list(indexes)
+
+    def count_documents(self, query: dict, **kwargs):
+        return len(list(self.find(query, {})))
+
+    def bulk_write(self, requests: list, ordered: bool = True, **kwargs):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        self.running -= 1
+        self.bulk_calls.append(requests)
+        result = {"nUpserted": 0, "nMatched": 0, "nModified": 0, "upserted": []}
+        for index, request in enumerate(requests):
+            doc = self.__find(request._filter)
+            if isinstance(request, ReplaceOne):
+                new = request._doc
+            elif isinstance(request._doc, list):
+                # update pipeline 은 실행하지 않고 필터만 저장한다
+                new = dict(request._filter)
+            else:
+                new = request._doc["$set"]
+            if doc is None:
+                self.docs.append(dict(new))
+                result["nUpserted"] += 1
+                result["upserted"].append({"index": index, "_id": index})
+                continue
+            result["nMatched"] += 1
+            if any(doc.get(key) != val for key, val in new.items()):
+                if isinstance(request, ReplaceOne):
+                    doc.clear()
+                doc.update(new)
+                result["nModified"] += 1
+        return BulkWriteResult(result, True)
+
+
+class FakeDatabase:
+    def __init__(self, delay: float = 0):
+        self.collections: Dict[str, FakeCollection] = {}
+        self.delay = delay
+
+    def get_collection(self, name: str, **kwargs) -> FakeCollection:
+        return self.collections.setdefault(name, FakeCollection(self.delay))
+
+
+def make_product(id: str, price: float = 1000, events: List[EventVO] = None):
+    product = ProductVO(
+        crawled_info=CrawledInfoVO(spider="test", id=id, url="https://a.b", brand=1),
+        name=f"product-{id}",
+        price=PriceVO(value=price, currency=1),
+        image=ImageVO(),
+        events=events or [],
+    )
+    # 실행 시간과 관계없이 같은 아이템이 되도록 고정한다
+    product.updated_at = 0
+    return product
+
+
+@pytest.fixture
+def spider():
+    return SimpleNamespace(
+        name="test",
+        logger=SimpleNamespace(
+            info=lambda *_: None, warning=lambda *_: None, error=lambda *_: None
+        ),
+    )
+
+
+def open_pipeline(
+    spider,
+    bulk_size: int,
+    preload_limit: int = 0,
+    server_merge: bool = False,
+    db: FakeDatabase = None,
+    cls=MongoDBPipeline,
+    **kwargs,
+):
+    stats = MemoryStatsCollector(SimpleNamespace(settings=Settings()))
+    pipeline = cls(
+        mongo_uri="mongodb://localhost:27017",
+        mongo_db="test",
+        stage="dev",
+        bulk_size=bulk_size,
+        bulk_interval=60,
+        preload_limit=preload_limit,
+        server_merge=server_merge,
+        stats=stats,
+        **kwargs,
+    )
+    db = db or FakeDatabase()
+    # MongoClient 대신 FakeDatabase 를 사용한다
+    with patch.object(MongoClient, "get_database", return_value=db):
+        pipeline.open_spider(spider)
+    return pipeline, db, stats
+
+
+def test_mongodb_pipeline_bulk_write(spider):
+    # given
+    pipeline, db, stats = open_pipeline(spider, bulk_size=3)
+
+    # when
+    for id in ["1", "2"]:
+        pipeline.process_item(make_product(id), spider)
+    # then
+    assert db.get_collection("products").bulk_calls == []
+
+    # when
+    pipeline.process_item(make_product("3"), spider)
+    # then
+    assert len(db.get_collection("products").bulk_calls) == 1
+    assert all(
+        isinstance(op, UpdateOne) for op in db.get_collection("products").bulk_calls[0]
+    )
+    assert stats.get_value("mongodb/new") == 3
+
+    # when
+    pipeline.process_item(make_product("1"), spider)
+    pipeline.process_item(make_product("2", price=2000), spider)
+    pipeline.close_spider(spider)
+    # then
+    assert len(db.get_collection("products").bulk_calls) == 2
+    assert stats.get_value("mongodb/updated") == 1
+    assert stats.get_value("mongodb/changed") == 1
+    # content hash 가 같은 아이템은 last_seen_at 만 수정한다
+    assert stats.get_value("mongodb/skipped") == 1
+    assert stats.get_value("mongodb/touched") == 1
+    [touch] = db.get_collection("products").bulk_calls[1][:1]
+    assert list(touch._doc["$set"]) == ["last_seen_at"]
+
+
+def test_mongodb_pipeline_flush_pending_item(spider):
+    # given
+    pipeline, db, stats = open_pipeline(spider, bulk_size=100)
+
+    # when
+    pipeline.process_item(make_product("1", events=[EventVO(brand=1, id=1)]), spider)
+    item = pipeline.process_item(
+        make_product("1", events=[EventVO(brand=1, id=2)]), spider
+    )
+    pipeline.close_spider(spider)
+    # then: 저장되지 않은 이전 아이템을 먼저 저장하고 합친다
+    assert len(db.get_collection("products").bulk_calls) == 2
+    assert {(e.brand, e.id) for e in item.events} == {(1, 1), (1, 2)}
+    assert db.get_collection("products").docs[0]["events"] == [
+        {"brand": e.brand, "id": e.id} for e in item.events
+    ]
+
+
+def test_mongodb_pipeline_preload(spider):
+    # given
+    db = FakeDatabase()
+    pipeline, _, _ = open_pipeline(spider, bulk_size=100, preload_limit=10, db=db)
+    pipeline.process_item(make_product("1", events=[EventVO(brand=1, id=1)]), spider)
+    pipeline.process_item(make_product("2"), spider)
+    pipeline.close_spider(spider)
+
+    # when
+    pipeline, _, stats = open_pipeline(spider, bulk_size=100, preload_limit=10, db=db)
+    product = make_product("1", events=[EventVO(brand=1, id=2)])
+    product.description = None
+    item = pipeline.process_item(product, spider)
+    again = pipeline.process_item(
+        make_product("1", events=[EventVO(brand=1, id=3)]), spider
+    )
+    pipeline.close_spider(spider)
+    # then: 이전 아이템을 조회하지 않고 미리 읽어둔 값과 합친다
+    assert db.get_collection("products").find_one_calls == 0
+    assert stats.get_value("mongodb/preload/products/count") == 2
+    assert stats.get_value("mongodb/preload/products/bytes") > 0
+    assert {(e.brand, e.id) for e in item.events} == {(1, 1), (1, 2)}
+    assert {(e.brand, e.id) for e in again.events} == {(1, 1), (1, 2), (1, 3)}
+
+    # when
+    pipeline, _, stats = open_pipeline(spider, bulk_size=100, preload_limit=1, db=db)
+    pipeline.process_item(make_product("1"), spider)
+    pipeline.close_spider(spider)
+    # then: 문서가 많으면 아이템마다 조회한다
+    assert stats.get_value("mongodb/preload/products/fallback") == 2
+    assert db.get_collection("products").find_one_calls == 1
+
+    # when
+    pipeline, _, stats = open_pipeline(
+        spider, bulk_size=100, preload_limit=1, server_merge=True, db=db
+    )
+    pipeline.process_item(make_product("2"), spider)
+    pipeline.close_spider(spider)
+    # then: DB 에서 합치더라도 아이템마다 content hash 를 조회해서 비교한다
+    assert stats.get_value("mongodb/preload/products/fallback") == 2
+    assert db.get_collection("products").find_one_calls == 2
+    assert stats.get_value("mongodb/skipped") == 1
+
+
+def test_mongodb_pipeline_server_merge(spider):
+    # given
+    pipeline, db, stats = open_pipeline(
+        spider, bulk_size=100, preload_limit=10, server_merge=True
+    )
+    product = make_product("1", events=[EventVO(brand=1, id=1)])
+    product.description = "$5"
+
+    # when
+    pipeline.process_item(product, spider)
+    pipeline.flush(spider)
+    # then: 이전 아이템을 읽지 않고 update pipeline 하나로 저장한다
+    collection = db.get_collection("products")
+    assert collection.find_one_calls == 0
+    assert stats.get_value("mongodb/preload/products/count") == 0
+    [[op]] = collection.bulk_calls
+    assert isinstance(op, UpdateOne)
+    [stage] = op._doc
+    values = stage["$set"]
+    assert values["description"] == {"$literal": "$5"}
+    assert values["category"] == {"$ifNull": ["$category", None]}
+    assert values["events"] == {
+        "$setUnion": [
+            {"$ifNull": ["$events", []]},
+            {"$literal": [{"brand": 1, "id": 1}]},
+        ]
+    }
+    assert values["created_at"] == {"$ifNull": ["$created_at", product.created_at]}
+
+
+def test_mongodb_pipeline_server_merge_skip_unchanged(spider):
+    # given
+    db = FakeDatabase()
+    db.get_collection("products").docs.append(
+        {
+            "crawled_info": {"spider": "test", "id": "1"},
+            "content_hash": make_product("1").get_content_hash(),
+        }
+    )
+    pipeline, _, stats = open_pipeline(
+        spider, bulk_size=100, server_merge=True, db=db, touch_unchanged=False
+    )
+
+    # when
+    pipeline.process_item(make_product("1"), spider)
+    pipeline.process_item(make_product("2"), spider)
+    pipeline.close_spider(spider)
+    # then: 미리 읽지 않은 collection 도 content hash 를 조회해서 비교한다
+    collection = db.get_collection("products")
+    assert collection.find_one_calls == 2
+    assert stats.get_value("mongodb/skipped") == 1
+    assert stats.get_value("mongodb/new") == 1
+    assert len(collection.bulk_calls[-1]) == 1
+
+
+def test_mongodb_pipeline_skip_unchanged(spider):
+    # given
+    db = FakeDatabase()
+    pipeline, _, _ = open_pipeline(spider, bulk_size=100, preload_limit=10, db=db)
+    pipeline.process_item(make_product("1"), spider)
+    pipeline.close_spider(spider)
+    saved = db.get_collection("products").docs[0]
+    assert saved["content_hash"] == make_product("1").get_content_hash()
+
+    # when
+    pipeline, _, stats = open_pipeline(
+        spider, bulk_size=100, preload_limit=10, db=db, touch_unchanged=False
+    )
+    pipeline.process_item(make_product("1"), spider)
+    pipeline.process_item(make_product("2"), spider)
+    pipeline.close_spider(spider)
+    # then: 바뀌지 않은 아이템은 저장하지 않는다
+    assert stats.get_value("mongodb/skipped") == 1
+    assert stats.get_value("mongodb/changed") is None
+    assert stats.get_value("mongodb/new") == 1
+    assert len(db.get_collection("products").bulk_calls[-1]) == 1
+
+
+def test_async_mongodb_pipeline():
+    # Reactor 가 필요하므로 별도 프로세스에서 실행한다
+    script = """
+from types import SimpleNamespace
+from twisted.internet import defer, task
+from pyoniverse.pipelines.db import AsyncMongoDBPipeline
+from tests.test_pipelines.test_unit import FakeDatabase, make_product, open_pipeline
+
+@defer.inlineCallbacks
+def main(reactor):
+    spider = SimpleNamespace(
+        name="test", logger=SimpleNamespace(info=print, error=print)
+    )
+    db = FakeDatabase(delay=0.1)
+    pipeline, _, stats = open_pipeline(
+        spider, bulk_size=2, cls=AsyncMongoDBPipeline, db=db, max_in_flight=2
+    )
+    items = yield defer.gatherResults(
+        [pipeline.process_item(make_product(str(i)), spider) for i in range(9)]
+    )
+    yield pipeline.close_spider(spider)
+    collection = db.get_collection("products")
+    assert len(items) == 9
+    assert stats.get_value("mongodb/new") == 9, stats.get_stats()
+    assert sum(map(len, collection.bulk_calls)) == 9
+    assert collection.max_running == 2, collection.max_running
+
+task.react(main)
+"""
+    # when
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, timeout=60
+    )
+    # then
+    assert result.returncode == 0, result.stderr
+
+
+def test_async_mongodb_pipeline_close():
+    # Reactor 가 필요하므로 별도 프로세스에서 실행한다
+    script = """
+from types import SimpleNamespace
+from twisted.internet import defer, task
+from pyoniverse.pipelines.db import AsyncMongoDBPipeline, MongoDBPipeline
+from tests.test_pipelines.test_unit import FakeDatabase, make_product, open_pipeline
+
+@defer.inlineCallbacks
+def main(reactor):
+    spider = SimpleNamespace(
+        name="test", logger=SimpleNamespace(info=print, error=print)
+    )
+    db = FakeDatabase(delay=0.1)
+    collection = db.get_collection("products")
+    pipeline, _, stats = open_pipeline(
+        spider, bulk_size=100, cls=AsyncMongoDBPipeline, db=db
+    )
+    for i in range(3):
+        yield pipeline.process_item(make_product(str(i)), spider)
+
+    # client 를 반환할 때 저장 중인 작업이 없어야 한다
+    released = []
+    release = MongoDBPipeline._MongoDBPipeline__release_client.__func__
+
+    def record(cls, uri):
+        released.append((collection.running, sum(map(len, collection.bulk_calls))))
+        release(cls, uri)
+
+    MongoDBPipeline._MongoDBPipeline__release_client = classmethod(record)
+    flushes = []
+    flush = pipeline.flush
+    pipeline.flush = lambda *args: flushes.append(args) or flush(*args)
+
+    yield pipeline.close_spider(spider)
+    assert released == [(0, 3)], released
+    assert len(flushes) == 1, flushes
+    assert stats.get_value("mongodb/new") == 3, stats.get_stats()
+
+task.react(main)
+"""
+    # when
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, timeout=60
+    )
+    # then
+    assert result.returncode == 0, result.stderr
+
+
+def test_mongodb_pipeline_collection_suffix(spider):
+    # given
+    pipeline, db, _ = open_pipeline(
+        spider, bulk_size=100, collection_suffix="_staging_1"
+    )
+    # when
+    pipeline.process_item(make_product("1"), spider)
+    pipeline.close_spider(spider)
+    # then: --clear_db 로 실행되면 staging collection 에 저장한다
+    assert db.get_collection("products_staging_1").docs
+    assert "products" not in db.collections
+
+
+def test_spool_writer(tmp_path):
+    # given
+    writer = SpoolWriter(tmp_path, segment_records=3, fsync_records=2)
+    writer.open()
+    # when
+    for i in range(4):
+        writer.append({"i": i})
+    # then: 기록 중인 segment 도 fsync 한 곳까지 읽을 수 있다
+    [sealed] = writer.sealed
+    [open_segment] = tmp_path.glob(f"*{OPEN_SUFFIX}")
+    assert [r for _, r in read_segment(sealed)] == [{"i": i} for i in range(3)]
+    writer.sync()
+    assert [r for _, r in read_segment(open_segment)] == [{"i": 3}]
+
+    # when: 비정상 종료 후 다시 열기
+    SpoolWriter(tmp_path).open()
+    # then
+    assert len(list(tmp_path.glob(f"*{SEALED_SUFFIX}"))) == 2
+    assert not list(tmp_path.glob(f"*{OPEN_SUFFIX}"))
+
+
+def test_spool_checksum(tmp_path):
+    # given
+    writer = SpoolWriter(tmp_path)
+    writer.open()
+    for i in range(3):
+        writer.append({"i": i})
+    writer.close()
+    [segment] = writer.sealed
+    lines = gzip.decompress(segment.read_bytes()).splitlines(keepends=True)
+    # when
+    lines[1] = lines[1].replace(b'"i":1', b'"i":7')
+    segment.write_bytes(gzip.compress(b"".join(lines)))
+    # then
+    assert list(read_segment(segment, start=1)) == [(1, None), (2, {"i": 2})]
+
+
+def test_spool_pipeline(spider, tmp_path):
+    # given
+    stats = MemoryStatsCollector(SimpleNamespace(settings=Settings()))
+    pipeline = SpoolPipeline(spool_dir=str(tmp_path), stage="dev", stats=stats)
+    pipeline.open_spider(spider)
+    # when
+    pipeline.process_item(make_product("1"), spider)
+    pipeline.close_spider(spider)
+    # then
+    [segment] = (tmp_path / spider.name).glob(f"*{SEALED_SUFFIX}")
+    [(_, record)] = read_segment(segment)
+    assert record["collection"] == "products"
+    assert record["document"]["content_hash"] == make_product("1").get_content_hash()
+    assert stats.get_value("spool/records") == 1
+    assert stats.get_value("spool/segments") == 1
+
+
+def spool_products(path, ids: List[str], segment_records: int):
+    writer = SpoolWriter(path, segment_records=segment_records)
+    writer.open()
+    for id in ids:
+        product = make_product(id)
+        doc = asdict(product)
+        doc.update(content_hash=product.get_content_hash(), last_seen_at=0)
+        writer.append({"collection": "products", "document": doc})
+    writer.close()
+
+
+def test_spool_loader(tmp_path):
+    # given
+    spool_products(tmp_path / "test", [str(i) for i in range(10)], segment_records=6)
+    db = FakeDatabase()
+    collection = db.get_collection("products")
+    fail = {"calls": 2}
+    bulk_write = collection.bulk_write
+
+    def flaky_bulk_write(requests, **kwargs):
+        fail["calls"] -= 1
+        if fail["calls"] < 0:
+            raise AutoReconnect("primary is unreachable")
+        return bulk_write(requests, **kwargs)
+
+    collection.bulk_write = flaky_bulk_write
+    loader = SpoolLoader(db, workers=2, batch_size=1)
+
+    # when: 두 번째 chunk 에서 실패
+    with pytest.raises(AutoReconnect):
+        loader.load(tmp_path)
+    # then: 저장한 chunk 까지 offset 을 기록한다
+    assert len(collection.docs) == 2
+    assert (tmp_path / "test" / SpoolLoader.offset_file).exists()
+
+    # when
+    fail["calls"] = 100
+    results = loader.load(tmp_path)
+    # then: offset 부터 이어서 저장하고, 다 저장한 segment 는 지운다
+    assert results["test"]["records"] == 8
+    assert results["test"]["new"] == 8
+    assert sorted(doc["crawled_info.id"] for doc in collection.docs) == [
+        str(i) for i in range(10)
+    ]
+    assert not list((tmp_path / "test").glob(f"*{SEALED_SUFFIX}"))
+    # update pipeline 으로 저장한다
+    assert all(isinstance(op._doc, list) for ops in collection.bulk_calls for op in ops)
+
+
+def test_mongodb_pipeline_ensure_indexes(spider):
+    # given
+    db = FakeDatabase()
+    # when
+    pipeline, _, stats = open_pipeline(spider, bulk_size=100, db=db)
+    pipeline.process_item(make_product("1"), spider)
+    pipeline.close_spider(spider)
+    # then: hint 에 필요한 index 를 만들고 조회가 index 를 사용하는지 확인한다
+    for coll in ["products", "events"]:
+        assert db.get_collection(coll).indexes == DBClient.indexes[coll]
+        assert stats.get_value(f"mongodb/index/{coll}/find_one") == "FETCH/IXSCAN"
+    assert stats.get_value("mongodb/latency/find_one/count") == 1
+    assert stats.get_value("mongodb/latency/bulk_write/max_ms") >= 0
+
+    # when
+    pipeline, _, stats = open_pipeline(spider, bulk_size=100, ensure_indexes=False)
+    pipeline.close_spider(spider)
+    # then
+    assert stats.get_value("mongodb/index/products/find_one") is None
+
+
+def drop_reason(pipeline: ValidationPipeline, item, spider):
+    try:
+        pipeline.process_item(item, spider)
+    except DropItem as e:
+        return str(e)
+    return None
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [
+        ("name", None),
+        ("name", 1),
+        ("category", True),
+        ("tags", ["a", 1]),
+        ("price.value", float("nan")),
+        ("price.currency", 1.0),
+        ("crawled_info.url", "not a url"),
+        ("image.thumb", "ftp://a.b/c.jpg"),
+        ("image.others", ["https://pyoniverse.kr/c.jpg", "c.jpg"]),
+        ("image.size", {"thumb": {"width": 1}}),
+        ("image.size", {"unknown": {}}),
+        ("events", [EventVO(brand=1, id="1")]),
+    ],
+)
+def test_validation_pipeline_fast_path(spider, field, value):
+    # given
+    fast, slow = ValidationPipeline(fast_path=True), ValidationPipeline(fast_path=False)
+    product = make_product("1")
+    product.crawled_info.url = "https://pyoniverse.kr/1"
+    product.image = ImageVO(
+        thumb="https://pyoniverse.kr/c.jpg",
+        others=["s3://bucket/c"],
+        size={"thumb": None},
+    )
+    assert FastValidator(ProductSchema())(product)
+    assert drop_reason(fast, product, spider) is None
+    # when
+    *path, name = field.split(".")
+    target = product
+    for part in path:
+        target = getattr(target, part)
+    setattr(target, name, value)
+    # then: fast path 를 통과하지 못하면 marshmallow 로 검사한다(1.0, "1" 처럼 marshmallow 는 통과시키는 값도 있다)
+    assert not FastValidator(ProductSchema())(product)
+    assert drop_reason(fast, product, spider) == drop_reason(slow, product, spider)
+
+
+def test_validation_pipeline_cache_schema(spider):
+    # given
+    pipeline = ValidationPipeline()
+    event = BrandEventVO(
+        crawled_info=CrawledInfoVO(
+            spider="test", id="1", url="https://pyoniverse.kr/1", brand=1
+        ),
+        start_at=0,
+        end_at=1,
+        name="event",
+        image=ImageVO(thumb="https://pyoniverse.kr/c.jpg"),
+    )
+    # when
+    pipeline.process_item(event, spider)
+    # then: item class 마다 schema 를 한 번만 만든다
+    assert pipeline.get_schema(make_product("3")) is pipeline.get_schema(
+        make_product("4")
+    )
+    assert pipeline.get_validator(event)(event)
+
+
+def test_item_to_document():
+    # given
+    product = make_product("1")
+    # when
+    doc = product.to_document()
+    # then: pipeline 들이 같은 document 를 사용한다
+    assert doc == asdict(product)
+    assert product.to_document() is doc
+    assert "_document" not in doc
+
+    # when: 필드에 대입하면 다시 만든다
+    product.name = "changed"
+    # then
+    assert product.to_document()["name"] == "changed"
+
+    # when: 하위 객체를 수정하면 직접 invalidate 해야 한다
+    doc = product.to_document()
+    product.image.thumb = "https://pyoniverse.kr/c.jpg"
+    assert product.to_document() is doc
+    product.invalidate_document()
+    # then
+    assert product.to_document()["image"]["thumb"] == "https://pyoniverse.kr/c.jpg"
+
+
+def test_s3_image_pipeline_invalidate_document():
+    # given
+    product = make_product("1")
+    product.image = ImageVO(thumb="https://pyoniverse.kr/c.jpg")
+    before = product.to_document()
+    pipeline = SimpleNamespace(store=SimpleNamespace(bucket="bucket", prefix=""))
+    results = [(True, {"url": product.image.thumb, "path": "products/c.jpg"})]
+    # when
+    item = S3ImagePipeline.item_completed(pipeline, results, product, None)
+    # then: image 를 수정한 뒤에는 document 를 다시 만든다
+    assert item.to_document() is not before
+    assert item.to_document()["image"]["thumb"] == "s3://bucket/products/c.webp"
+
+
+def test_s3_image_pipeline_sizes_by_url():
+    # given: 변환이 끝난 순서와 관계없이 결과는 요청 순서로 온다
+    product = make_product("1")
+    product.image = ImageVO(
+        thumb="https://pyoniverse.kr/t.jpg",
+        others=["https://pyoniverse.kr/a.jpg", "https://pyoniverse.kr/b.jpg"],
+    )
+    pipeline = SimpleNamespace(
+        store=SimpleNamespace(bucket="bucket", prefix=""),
+        logger=SimpleNamespace(warning=print),
+    )
+    results = [
+        (False, Exception("404")),
+        *[
+            (
+                True,
+                {
+                    "url": f"https://pyoniverse.kr/{name}.jpg",
+                    "path": f"products/{name}.jpg",
+                    "width": width,
+                    "height": width * 2,
+                },
+            )
+            for name, width in [("a", 10), ("b", 20)]
+        ],
+    ]
+    # when
+    item = S3ImagePipeline.item_completed(pipeline, results, product, None)
+    # then: 실패한 thumb 대신 첫번째 이미지를 사용하고, 크기는 url 에 맞춰 넣는다
+    assert item.image.thumb == "s3://bucket/products/a.webp"
+    assert item.image.others == ["s3://bucket/products/b.webp"]
+    assert item.image.size == {
+        "thumb": {"width": 10, "height": 20},
+        "others": [{"width": 20, "height": 40}],
+    }
+
+
+def test_transcode():
+    # given: 투명한 PNG
+    image = Image.new("RGBA", (400, 200), (255, 0, 0, 0))
+    body = BytesIO()
+    image.save(body, format="PNG")
+    # when
+    result = transcode(body.getvalue(), {"small": (50, 50)})
+    # then
+    assert result.original_size == (400, 200)
+    full, small = result.images
+    assert (full.thumb_id, full.width, full.height) == (None, 400, 200)
+    assert (small.thumb_id, small.width, small.height) == ("small", 50, 25)
+    assert result.checksum == hashlib.md5(full.data).hexdigest()
+    webp = Image.open(BytesIO(full.data))
+    assert webp.format == "WEBP"
+    assert webp.convert("RGB").getpixel((0, 0)) == (255, 255, 255)
+    # then: process pool 에 보낼 수 있다
+    assert pickle.loads(pickle.dumps(result)) == result
+
+
+def test_pixel_budget():
+    # given
+    budget = PixelBudget(100)
+    granted = []
+    # when: 60 + 60 은 limit 을 넘는다
+    for name, weight in [("a", 60), ("b", 60), ("c", 10), ("d", 1000)]:
+        budget.acquire(weight).addCallback(lambda w, name=name: granted.append(name))
+    # then: 작은 c 도 먼저 온 b 를 앞지르지 않는다
+    assert granted == ["a"]
+    assert budget.queue_depth == 3
+    budget.release(60)
+    assert granted == ["a", "b", "c"]
+    # then: limit 보다 큰 d 는 혼자 실행한다
+    budget.release(60)
+    budget.release(10)
+    assert granted == ["a", "b", "c", "d"]
+    assert budget.used == 100
+    budget.release(100)
+    summary = budget.summary()
+    assert (summary["queued"], summary["max_queue_depth"]) == (3, 3)
+
+
+def test_pixel_budget_shared():
+    # when: 같은 process 의 pipeline 은 budget 하나를 같이 사용한다
+    budget = PixelBudget.acquire_shared(1000, parallel=4)
+    other = PixelBudget.acquire_shared(1000, parallel=4)
+    # then: 동시에 실행하는 spider process 수로 나눈다
+    assert other is budget
+    assert budget.limit == 250
+
+    # when
+    PixelBudget.release_shared(budget)
+    # then: 사용 중인 pipeline 이 남아 있으면 그대로 둔다
+    assert PixelBudget.acquire_shared(1000, parallel=4) is budget
+
+    # when
+    PixelBudget.release_shared(budget)
+    PixelBudget.release_shared(budget)
+    # then
+    new = PixelBudget.acquire_shared(1000, parallel=4)
+    assert new is not budget
+    PixelBudget.release_shared(new)
+
+
+def test_pixel_budget_run_releases_on_error():
+    # given
+    budget = PixelBudget(100)
+    errors = []
+    # when
+    budget.run(80, int, "x").addErrback(errors.append)
+    # then
+    assert errors[0].check(ValueError)
+    assert budget.used == 0
+
+
+def test_read_size():
+    # given
+    body = BytesIO()
+    Image.new("RGB", (30, 40)).save(body, format="PNG")
+    # then
+    assert read_size(body.getvalue(), 30 * 40) == (30, 40)
+    with pytest.raises(ImageRejected, match="decompression-bomb"):
+        read_size(body.getvalue(), 30 * 40 - 1)
+    with pytest.raises(ImageRejected, match="invalid-image"):
+        read_size(b"<html></html>", 30 * 40)
+
+
+def test_pyramid():
+    # given
+    image = Image.new("RGB", (1000, 600))
+    thumbs = {"small": (50, 50), "wide": (900, 100), "large": (400, 400)}
+    # when
+    result = pyramid(image, thumbs)
+    # then: Image.thumbnail 과 같은 크기이고 순서는 그대로이다
+    assert list(result) == list(thumbs)
+    for thumb_id, size in thumbs.items():
+        expected = image.copy()
+        expected.thumbnail(size)
+        assert result[thumb_id].size == expected.size
+    # then: 줄일 필요가 없으면 그대로 사용한다
+    assert pyramid(image, {"full": (2000, 2000)})["full"] is image
+
+
+@pytest.mark.parametrize("mode", ["thread", "process", "inline"])
+def test_transcoder(mode):
+    # Reactor 가 필요하므로 별도 프로세스에서 실행한다
+    script = f"""
+import os
+from twisted.internet import defer, task
+from pyoniverse.pipelines.transcode import Transcoder
+
+@defer.inlineCallbacks
+def main(reactor):
+    transcoder = Transcoder(mode={mode!r}, workers=2)
+    # 같은 process 의 다른 spider
+    other = Transcoder(mode={mode!r}, workers=2)
+    transcoder.start()
+    other.start()
+    pids = yield defer.gatherResults(
+        [t.submit(os.getpid) for t in (transcoder, other) for _ in range(8)]
+    )
+    if {mode!r} == "process":
+        # pool 을 같이 사용한다
+        assert os.getpid() not in pids and len(set(pids)) <= 2, pids
+    else:
+        assert set(pids) == {{os.getpid()}}, pids
+    try:
+        yield transcoder.submit(int, "x")
+        raise AssertionError("error is not propagated")
+    except ValueError:
+        pass
+    transcoder.stop()
+    # 먼저 끝난 spider 가 pool 을 닫지 않는다
+    yield other.submit(os.getpid)
+    other.stop()
+
+task.react(main)
+"""
+    # when
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, timeout=60
+    )
+    # then
+    assert result.returncode == 0, result.stderr
+
+
+def make_manifest_pipeline(tmp_path, spider, revalidate: bool):
+    spider.crawler = SimpleNamespace(
+        stats=MemoryStatsCollector(SimpleNamespace(settings=Settings()))
+    )
+    pipeline = S3ImagePipeline.__new__(S3ImagePipeline)
+    pipeline.stage = "dev"
+    pipeline.revalidate = revalidate
+    pipeline.manifest = ImageManifest(tmp_path / "manifest" / "images.sqlite3")
+    pipeline.manifest.open()
+    pipeline.manifest.put(
+        ManifestEntry(
+            url="https://pyoniverse.kr/a.jpg",
+            etag='"abc"',
+            checksum=hashlib.md5(b"image").hexdigest(),
+            path="products/a.jpg",
+            width=10,
+            height=20,
+            size=5,
+            cpu_seconds=0.5,
+        )
+    )
+    # 변환하지 않아야 한다
+    pipeline.transcoder = None
+    return pipeline
+
+
+def test_image_manifest(tmp_path):
+    # given
+    manifest = ImageManifest(tmp_path / "images.sqlite3")
+    manifest.open()
+    entry = ManifestEntry(
+        url="https://pyoniverse.kr/a.jpg",
+        checksum="c",
+        path="products/a.jpg",
+        width=10,
+        height=20,
+        size=5,
+        cpu_seconds=0.5,
+    )
+    # when
+    manifest.put(entry)
+    manifest.close()
+    manifest.open()
+    # then: 다시 열어도 남아있다
+    assert manifest.get(entry.url) == entry
+    assert manifest.get("https://pyoniverse.kr/b.jpg") is None
+    manifest.close()
+
+
+def test_image_manifest_max_age(tmp_path):
+    # given: S3 에 저장한 지 오래된 이미지
+    manifest = ImageManifest(tmp_path / "images.sqlite3", max_age=3600)
+    manifest.open()
+    entry = ManifestEntry(
+        url="https://pyoniverse.kr/a.jpg",
+        checksum="c",
+        path="products/a.jpg",
+        width=10,
+        height=20,
+        size=5,
+        cpu_seconds=0.5,
+        updated_at=time.time() - 7200,
+    )
+    # when: 재사용하면서 다시 기록해도
+    manifest.put(entry)
+    manifest.close()
+    manifest.open()
+    # then: 저장한 시간은 그대로이고, 사용하지 않는다(S3 에서 삭제됐을 수 있다)
+    assert manifest.get(entry.url) is None
+    manifest.max_age = 0
+    assert manifest.get(entry.url) == entry
+
+    # when: 다시 변환해서 저장하면
+    manifest.put(dataclasses.replace(entry, updated_at=0))
+    manifest.max_age = 3600
+    # then
+    assert manifest.get(entry.url).updated_at > entry.updated_at
+    manifest.close()
+
+
+def test_transcoder_workers():
+    cpu_count = os.cpu_count() or 1
+    # then: CPU 수를 동시에 실행하는 spider 프로세스 수로 나눈다
+    assert Transcoder().workers == cpu_count
+    assert Transcoder(parallel=2).workers == max(1, cpu_count // 2)
+    assert Transcoder(parallel=cpu_count * 2).workers == 1
+    assert Transcoder(workers=3, parallel=8).workers == 3
+
+
+def test_image_manifest_locked(tmp_path):
+    # Reactor 가 필요하므로 별도 프로세스에서 실행한다
+    script = f"""
+import sqlite3
+from pathlib import Path
+from twisted.internet import defer, task
+from pyoniverse.pipelines.manifest import ImageManifest, ManifestEntry
+
+@defer.inlineCallbacks
+def main(reactor):
+    path = Path({str(tmp_path / "images.sqlite3")!r})
+    manifest = ImageManifest(path, timeout=0.1)
+    manifest.open()
+    entry = ManifestEntry(
+        url="https://pyoniverse.kr/a.jpg", checksum="c", path="products/a.jpg",
+        width=10, height=20, size=5, cpu_seconds=0.5,
+    )
+    manifest.put(entry)
+    # 다른 spider 가 write lock 을 잡고 있다
+    other = sqlite3.connect(path)
+    other.execute("BEGIN IMMEDIATE")
+    yield manifest.flush()
+    assert manifest.pending == 1
+    assert manifest.get(entry.url) == entry
+    # lock 이 풀리면 다음 flush 에서 기록한다
+    other.rollback()
+    yield manifest.flush()
+    assert manifest.pending == 0
+    assert other.execute("SELECT url FROM images").fetchall() == [(entry.url,)]
+    yield manifest.close()
+
+task.react(main)
+"""
+    # when
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, timeout=60
+    )
+    # then
+    assert result.returncode == 0, result.stderr
+    assert "Failed to write 1 manifest entries" in result.stderr
+
+
+def test_image_manifest_close_while_flushing(tmp_path):
+    # Reactor 가 필요하므로 별도 프로세스에서 실행한다
+    script = f"""
+import sqlite3
+from pathlib import Path
+from twisted.internet import defer, task
+from pyoniverse.pipelines.manifest import ImageManifest, ManifestEntry
+
+@defer.inlineCallbacks
+def main(reactor):
+    path = Path({str(tmp_path / "images.sqlite3")!r})
+    manifest = ImageManifest(path, timeout=0.1)
+    manifest.open()
+    entry = ManifestEntry(
+        url="https://pyoniverse.kr/a.jpg", checksum="c", path="products/a.jpg",
+        width=10, height=20, size=5, cpu_seconds=0.5,
+    )
+    manifest.put(entry)
+    # 다른 spider 가 write lock 을 잡고 있어서 flush 가 실패한다
+    other = sqlite3.connect(path)
+    other.execute("BEGIN IMMEDIATE")
+    manifest.flush().addBoth(lambda _: other.rollback())
+    # flush 가 끝나기 전에 닫아도 실패한 기록을 다시 쓴다
+    yield manifest.close()
+    assert manifest.pending == 0
+    assert other.execute("SELECT url FROM images").fetchall() == [(entry.url,)]
+
+task.react(main)
+"""
+    # when
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, timeout=60
+    )
+    # then
+    assert result.returncode == 0, result.stderr
+    assert "Failed to write 1 manifest entries" in result.stderr
+
+
+@pytest.mark.parametrize(
+    "revalidate, status, body, expected",
+    [
+        (True, 304, b"", "not_modified"),
+        (True, 200, b"image", "unchanged"),
+        (False, None, None, "skipped"),
+    ],
+)
+def test_s3_image_pipeline_manifest(
+    tmp_path, spider, revalidate, status, body, expected
+):
+    # given
+    pipeline = make_manifest_pipeline(tmp_path, spider, revalidate)
+    info = SimpleNamespace(spider=spider)
+    product = make_product("1")
+    product.image = ImageVO(thumb="https://pyoniverse.kr/a.jpg")
+    # when
+    (request,) = pipeline.get_media_requests(product, info)
+    if status is None:
+        result = pipeline.media_to_download(request, info)
+    else:
+        if revalidate:
+            assert request.headers["If-None-Match"] == b'"abc"'
+        response = Response(request.url, status=status, body=body, request=request)
+        result = pipeline.media_downloaded(response, request, info)
+    pipeline.manifest.close()
+    # then: 기록한 경로와 크기를 사용한다
+    assert result == {
+        "url": request.url,
+        "path": "products/a.jpg",
+        "checksum": hashlib.md5(b"image").hexdigest(),
+        "status": expected,
+        "width": 10,
+        "height": 20,
+    }
+    stats = spider.crawler.stats.get_stats()
+    assert stats["image_manifest/hits"] == 1
+    assert stats[f"image_manifest/{expected}"] == 1
+    assert stats["image_manifest/cpu_seconds_saved"] == 0.5
+    assert stats.get("image_manifest/bytes_saved", 0) == (0 if body else 5)
+
+
+def test_s3_image_pipeline_manifest_miss(tmp_path, spider):
+    # given: 원본이 바뀐 이미지
+    pipeline = make_manifest_pipeline(tmp_path, spider, True)
+    pipeline.transcoder = Transcoder(mode="inline")
+    pipeline.budget = PixelBudget(1024**2)
+    pipeline.thumbs = {}
+    pipeline.logger = spider.logger
+    saved = []
+    pipeline.store = SimpleNamespace(
+        persist_file=lambda path, *_, **__: saved.append(path)
+    )
+    info = SimpleNamespace(spider=spider)
+    product = make_product("1")
+    product.image = ImageVO(thumb="https://pyoniverse.kr/a.jpg")
+    (request,) = pipeline.get_media_requests(product, info)
+    body = BytesIO()
+    Image.new("RGB", (30, 40)).save(body, format="PNG")
+    response = Response(
+        request.url,
+        body=body.getvalue(),
+        headers={"ETag": '"def"'},
+        request=request,
+    )
+    # when
+    results = []
+    pipeline.media_downloaded(response, request, info, item=product).addCallback(
+        results.append
+    )
+    # then: 변환해서 저장하고 manifest 를 갱신한다
+    assert (results[0]["width"], results[0]["height"]) == (30, 40)
+    assert saved == [str(Path(results[0]["path"]).with_suffix(".webp"))]
+    entry = pipeline.manifest.get(request.url)
+    pipeline.manifest.close()
+    assert (entry.etag, entry.width, entry.height) == ('"def"', 30, 40)
+    assert entry.checksum == hashlib.md5(body.getvalue()).hexdigest()
+    assert entry.path == results[0]["path"]
+    assert spider.crawler.stats.get_value("image_manifest/misses") == 1
+
+
+def test_item_slots():
+    # given
+    product = make_product("1", events=[EventVO(brand=1, id=2)])
+    # then: 아이템마다 __dict__ 를 만들지 않는다
+    assert not hasattr(product, "__dict__")
+    assert not hasattr(product.crawled_info, "__dict__")
+    # then: EventVO 는 수정할 수 없고 같은 값이면 같은 객체이다
+    assert EventVO(brand=1, id=2) is product.events[0]
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        product.events[0].id = 3
+    # then: pickle, copy 후에도 같은 값이다
+    assert copy.deepcopy(product) == product
+    assert pickle.loads(pickle.dumps(product)).to_document() == product.to_document()
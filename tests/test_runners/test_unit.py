@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from pyoniverse.out.model.log_result import LogResult
+from pyoniverse.runners.all_runner import AllRunner
+from pyoniverse.runners.fork_runner import ForkRunner
+from pyoniverse.runners.inprocess_runner import RequestBudget, SpiderLogFilter
+from pyoniverse.runners.runner import Runner
+
+
+while "tests" not in os.listdir():
+    os.chdir("..")
+
+
+class FakeSignals:
+    def connect(self, *args, **kwargs):
+        pass
+
+
+def make_crawler(concurrent_requests: int = 128):
+    return SimpleNamespace(
+        spider=object(),
+        signals=FakeSignals(),
+        settings=SimpleNamespace(getint=lambda _: concurrent_requests),
+        engine=SimpleNamespace(downloader=SimpleNamespace(total_concurrency=None)),
+    )
+
+
+def test_list_spiders():
+    # when
+    names = Runner._list_spiders()
+    # then
+    assert "cuweb" in names
+    assert "sevenelevenweb_event" in names
+    assert all(not name.startswith("__") for name in names)
+
+    # when
+    names = Runner._list_spiders(["cuweb", " gs25web "])
+    # then
+    assert names == ["cuweb", "gs25web"]
+
+    # when & then
+    with pytest.raises(ValueError):
+        Runner._list_spiders(["unknown"])
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("TRUE", True), ("1", True), ("true", True), ("yes", False), ("False", False)],
+)
+def test_runner_spool_enabled(monkeypatch, value, expected):
+    # given
+    monkeypatch.setenv("SPOOL_ENABLED", value)
+    # when
+    settings = Runner._prepare(stage="test", install_root_handler=False)
+    # then: main.py 와 같은 규칙으로 읽고, getbool 이 실패하지 않는다
+    assert settings.getbool("SPOOL_ENABLED") is expected
+
+
+def test_spider_log_filter():
+    # given
+    log_filter = SpiderLogFilter("cuweb")
+    record = logging.LogRecord("scrapy", logging.INFO, "", 0, "msg", None, None)
+
+    # when & then
+    assert log_filter.filter(record) is False
+    record.spider = SimpleNamespace(name="gs25web")
+    assert log_filter.filter(record) is False
+    record.spider = SimpleNamespace(name="cuweb")
+    assert log_filter.filter(record) is True
+
+
+def test_request_budget():
+    # given
+    budget = RequestBudget(total=128)
+    crawlers = [make_crawler(), make_crawler(), make_crawler(16)]
+    for crawler in crawlers:
+        budget.add(crawler)
+
+    # when
+    budget.rebalance()
+    # then
+    totals = [c.engine.downloader.total_concurrency for c in crawlers]
+    assert totals == [42, 42, 16]
+
+    # when
+    budget.release(crawlers[0].spider)
+    # then
+    assert crawlers[1].engine.downloader.total_concurrency == 64
+    assert crawlers[2].engine.downloader.total_concurrency == 16
+
+
+def test_all_runner_order():
+    # given
+    history = {
+        "a": LogResult(collected_count=1, error_count=0, elapsed_sec=10),
+        "b": LogResult(collected_count=1, error_count=0, elapsed_sec=300),
+        "summary": LogResult(collected_count=2, error_count=0, elapsed_sec=300),
+    }
+    # when
+    res = AllRunner._order(["a", "b", "c"], history)
+    # then
+    assert res == ["c", "b", "a"]
+
+
+def test_all_runner_collect(monkeypatch):
+    # given
+    scripts = {
+        "ok": "pass",
+        "failed": "exit(3)",
+        "slow": "import time; time.sleep(30)",
+    }
+
+    def launch(cls, name, **kwargs):
+        return os.posix_spawn(
+            sys.executable, [sys.executable, "-c", scripts[name]], os.environ
+        )
+
+    monkeypatch.setattr(AllRunner, "_launch", classmethod(launch))
+    monkeypatch.setattr(AllRunner, "grace_sec", 5)
+
+    # when
+    res = asyncio.run(
+        AllRunner._collect(["slow", "ok", "failed"], workers=2, timeout=1, stage="test")
+    )
+
+    # then
+    res = {r.spider: r for r in res}
+    assert res["ok"].exit_code == 0 and not res["ok"].timed_out
+    assert res["failed"].exit_code == 3
+    assert res["slow"].timed_out and res["slow"].exit_code != 0
+    assert res["slow"].elapsed_sec < 10
+    assert all(r.max_rss > 0 for r in res.values())
+
+
+def test_fork_runner_preload_does_not_install_reactor():
+    # given
+    code = (
+        "import importlib, sys\n"
+        "from pyoniverse.runners.fork_runner import ForkRunner\n"
+        "for m in ForkRunner.preload_modules: importlib.import_module(m)\n"
+        "print('twisted.internet.reactor' in sys.modules)"
+    )
+    # when
+    res = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    # then
+    assert res.stdout.strip() == "False"
+
+
+@pytest.mark.parametrize("reason, expected", [("finished", 0), ("shutdown", 1)])
+def test_runner_exit_code_from_finish_reason(tmp_path, reason, expected):
+    # Reactor 가 필요하므로 별도 프로세스에서 실행한다(ForkRunner 는 Reactor 를 설치하기 전에 fork 한다)
+    script = f"""
+import os
+
+from scrapy import Spider, signals
+
+from pyoniverse.runners.fork_runner import ForkRunner
+from pyoniverse.runners.runner import Runner
+from pyoniverse.runners.single_runner import SingleRunner
+
+
+class ClosingSpider(Spider):
+    name = "closing"
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.opened, signals.spider_opened)
+        return spider
+
+    def opened(self, spider):
+        if {reason!r} != "finished":
+            self.crawler.engine.close_spider(self, {reason!r})
+
+    def start_requests(self):
+        return []
+
+
+def prepare(cls, *args, **kwargs):
+    settings = Runner._prepare.__func__(cls, *args, **kwargs)
+    settings.setdict(
+        {{
+            "ITEM_PIPELINES": {{}},
+            "EXTENSIONS": {{}},
+            "LOG_FILE": {str(tmp_path / "debug.json")!r},
+        }}
+    )
+    return settings
+
+
+ForkRunner._prepare = SingleRunner._prepare = classmethod(prepare)
+ForkRunner.settings = ForkRunner._prepare(
+    stage="test", loglevel="ERROR", install_root_handler=False
+)
+ForkRunner.parallel = 1
+_, status = os.waitpid(ForkRunner._launch(ClosingSpider), 0)
+print(os.waitstatus_to_exitcode(status))
+print(
+    SingleRunner.run(
+        spider=ClosingSpider, stage="test", loglevel="ERROR", install_root_handler=False
+    )
+)
+"""
+    # when
+    res = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, timeout=60
+    )
+    # then
+    assert res.returncode == 0, res.stderr
+    fork_code, single_result = res.stdout.split()
+    assert int(fork_code) == expected
+    assert single_result == str(expected == 0)
@@ -0,0 +1,92 @@
+import json
+import os
+
+from scrapy import Request
+from scrapy.http import HtmlResponse, TextResponse
+
+from pyoniverse.spiders.cuweb import CUWebSpider
+from pyoniverse.spiders.gs25web import Gs25WebSpider
+
+
+while "tests" not in os.listdir():
+    os.chdir("..")
+
+
+def gs25_event_page(body: str, **kwargs) -> TextResponse:
+    spider = Gs25WebSpider()
+    request = Request(spider.search_urls["event"], cb_kwargs=kwargs)
+    return TextResponse(
+        request.url, body=body.encode(), encoding="utf-8", request=request
+    )
+
+
+def test_gs25_rejected_token():
+    # given: Token 이 거절되면 JSON 이 아닌 페이지를 받는다
+    spider = Gs25WebSpider()
+    kwargs = {"type": "event", "page": 2, "csrf_token": "old"}
+    response = gs25_event_page("<html>점검 중</html>", **kwargs)
+    # when
+    (request,) = spider.parse_event(response, **kwargs)
+    # then: backoff 를 거쳐 새 Token 을 받고, 다시 받은 횟수를 센다
+    assert request.url == spider.start_urls["event"]
+    assert request.meta["backoff"]
+    assert request.cb_kwargs == {"type": "event", "page": 2, "rebootstrap": 1}
+
+    # when: 새 Token 으로 같은 page 를 요청한다
+    home = HtmlResponse(
+        request.url,
+        body=b'<form id="CSRFForm"><input value="new"/></form>',
+        request=request,
+    )
+    (page,) = spider.parse_event_home(home, **request.cb_kwargs)
+    # then
+    assert page.cb_kwargs == {
+        "type": "event",
+        "page": 2,
+        "rebootstrap": 1,
+        "csrf_token": "new",
+    }
+
+
+def test_gs25_rejected_token_give_up():
+    # given: max_rebootstrap 번 다시 받아도 거절된다
+    spider = Gs25WebSpider()
+    kwargs = {
+        "type": "event",
+        "page": 2,
+        "csrf_token": "old",
+        "rebootstrap": spider.max_rebootstrap,
+    }
+    response = gs25_event_page("<html>점검 중</html>", **kwargs)
+    # when
+    requests = list(spider.parse_event(response, **kwargs))
+    # then: 더 요청하지 않는다
+    assert requests == []
+
+
+def test_gs25_next_pages():
+    # given: 다시 받은 Token 으로 1 page 를 받았다
+    spider = Gs25WebSpider()
+    kwargs = {"type": "event", "page": 1, "csrf_token": "new", "rebootstrap": 2}
+    body = {
+        "pagination": {"numberOfPages": 3},
+        "results": [{"goodsNm": "상품", "price": "1000", "attFileNm": "/a/1.jpg"}],
+    }
+    response = gs25_event_page(json.dumps(body), **kwargs)
+    # when
+    pages = [
+        r for r in spider.parse_event(response, **kwargs) if isinstance(r, Request)
+    ]
+    # then: 나머지 page 는 같은 Token 으로 요청하고, 다시 받은 횟수는 새로 센다
+    assert [r.cb_kwargs for r in pages] == [
+        {"type": "event", "page": 2, "csrf_token": "new"},
+        {"type": "event", "page": 3, "csrf_token": "new"},
+    ]
+
+
+def test_cu_closed_before_start_requests():
+    # given: start_requests 를 실행하기 전에 종료된 spider
+    spider = CUWebSpider()
+    # when, then
+    spider.closed("shutdown")
+    assert spider.paginator is None